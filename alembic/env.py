@@ -7,7 +7,7 @@ from alembic import context
 from dotenv import load_dotenv
 import os
 from dbConfig.base import Base
-from models import credential_models
+from models import credential_models, outbox_models
 
 if os.getenv("RENDER") != "TRUE":
     load_dotenv(dotenv_path=".env.development")
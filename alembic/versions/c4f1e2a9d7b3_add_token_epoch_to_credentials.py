@@ -0,0 +1,28 @@
+"""add token_epoch to credentials
+
+Revision ID: c4f1e2a9d7b3
+Revises: a1a38bea287f
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f1e2a9d7b3'
+down_revision: Union[str, None] = 'a1a38bea287f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('credentials', sa.Column('token_epoch', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('credentials', 'token_epoch')
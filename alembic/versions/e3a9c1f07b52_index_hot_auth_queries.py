@@ -0,0 +1,42 @@
+"""index hot auth queries
+
+Revision ID: e3a9c1f07b52
+Revises: d7e2b5c8f014
+Create Date: 2026-10-18 18:05:33.214870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9c1f07b52'
+down_revision: Union[str, None] = 'd7e2b5c8f014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY doesn't lock credentials against writes while building, but
+    # can't run inside a transaction. The unique lower(email) index fails if
+    # two accounts only differ in case; those have to be merged first.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_credentials_email_lower', 'credentials', [sa.text('lower(email)')], unique=True,
+                        postgresql_concurrently=True)
+        op.drop_index('ix_credentials_email', table_name='credentials', postgresql_concurrently=True)
+        op.create_index('ix_credentials_locked_lock_until', 'credentials', ['lock_until'],
+                        postgresql_where=sa.text('is_locked'), postgresql_concurrently=True)
+        op.create_index('ix_verification_pins_created_at', 'verification_pins', ['created_at'],
+                        postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_verification_pins_created_at', table_name='verification_pins', postgresql_concurrently=True)
+        op.drop_index('ix_credentials_locked_lock_until', table_name='credentials', postgresql_concurrently=True)
+        op.create_index('ix_credentials_email', 'credentials', ['email'], unique=True, postgresql_concurrently=True)
+        op.drop_index('ix_credentials_email_lower', table_name='credentials', postgresql_concurrently=True)
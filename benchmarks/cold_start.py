@@ -0,0 +1,193 @@
+"""
+Import time per module and cold start of the app, in milliseconds.
+
+Every measurement runs in a fresh interpreter. Import times come from
+`python -X importtime` (cumulative time of the module, median of --runs).
+Cold start imports main, runs the startup hooks and sends the first
+requests through TestClient, once per STARTUP_MODE. Stand-ins keep it
+offline: SQLite instead of Postgres, a no-op Google certs refresh instead
+of Firebase, Datadog disabled and no password hashing processes.
+
+    python -m benchmarks.cold_start [--runs N] [--json] [--output FILE] [--compare FILE]
+
+--output writes the results (tagged with the git commit) as JSON;
+--compare prints them next to a previous --output file.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = [
+    "utils.security",
+    "utils.password_hasher",
+    "middleware.datadog_logger",
+    "externals.http_client",
+    "externals.notify_service",
+    "externals.user_service",
+    "routes.auth",
+    "routes.async_auth",
+    "main",
+]
+STARTUP_MODES = ["eager", "lazy"]
+CHILD_ENV = {
+    "STARTUP_MODE": "lazy", "DATADOG_API_KEY": "", "PASSWORD_HASH_WORKERS": "0",
+    # externals build their URLs at import
+    "URL_USERS": "http://users.invalid", "URL_NOTIFICATION": "http://notifications.invalid",
+}
+
+
+def run_python(args, env=None):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env={**os.environ, **CHILD_ENV, **(env or {})},
+                          capture_output=True, text=True, check=True)
+
+
+def parse_importtime(stderr: str) -> dict:
+    # "import time: self [us] | cumulative | imported package", indented by depth
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(cumulative) / 1000, depth)
+    return modules
+
+
+def measure_imports(runs: int) -> dict:
+    results = {}
+    for module in MODULES:
+        samples = []
+        for _ in range(runs):
+            timings = parse_importtime(run_python(["-X", "importtime", "-c", f"import {module}"]).stderr)
+            samples.append(timings[module][0])
+        results[module] = round(statistics.median(samples), 1)
+    return results
+
+
+def main_breakdown() -> dict:
+    # direct imports of main, i.e. what each top-level dependency costs
+    # (shared dependencies are charged to whichever module imports them first)
+    timings = parse_importtime(run_python(["-X", "importtime", "-c", "import main"]).stderr)
+    direct = {name: round(ms, 1) for name, (ms, depth) in timings.items() if depth == 1 and ms >= 1}
+    return dict(sorted(direct.items(), key=lambda item: -item[1]))
+
+
+def child():
+    started = time.perf_counter()
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+    import dbConfig.session as session
+    session.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    session.SessionLocal.configure(bind=session.engine)
+    from utils.google_tokens import google_tokens
+    google_tokens._refresh_certs = lambda: None
+
+    import main
+    imported = time.perf_counter()
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    client.__enter__()
+    ready = time.perf_counter()
+    client.get("/")
+    first_response = time.perf_counter()
+    client.get("/openapi.json")
+    openapi = time.perf_counter()
+    client.__exit__(None, None, None)
+
+    print(json.dumps({
+        "import_ms": round((imported - started) * 1000, 1),
+        "startup_hooks_ms": round((ready - imported) * 1000, 1),
+        "first_response_ms": round((first_response - ready) * 1000, 1),
+        "first_openapi_ms": round((openapi - first_response) * 1000, 1),
+        "time_to_first_response_ms": round((first_response - started) * 1000, 1),
+    }))
+
+
+def measure_startup(runs: int) -> dict:
+    results = {}
+    for mode in STARTUP_MODES:
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = run_python(["-m", "benchmarks.cold_start", "--child"], env={"STARTUP_MODE": mode}).stdout
+            sample = json.loads(output.strip().splitlines()[-1])
+            sample["process_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            samples.append(sample)
+        results[mode] = {key: round(statistics.median(sample[key] for sample in samples), 1) for key in samples[0]}
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(runs: int) -> dict:
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "runs": runs,
+        "imports_ms": measure_imports(runs),
+        "main_breakdown_ms": main_breakdown(),
+        "startup_ms": measure_startup(runs),
+    }
+
+
+def flatten(results: dict) -> dict:
+    rows = {f"import {module}": ms for module, ms in results["imports_ms"].items()}
+    for mode, timings in results["startup_ms"].items():
+        rows.update({f"{mode} {key}": ms for key, ms in timings.items()})
+    return rows
+
+
+def print_results(results: dict, baseline: dict = None):
+    rows = flatten(results)
+    if baseline is None:
+        for name, ms in rows.items():
+            print(f"{name:<40} {ms:>9}")
+        return
+    before = flatten(baseline)
+    print(f"{'':<40} {baseline.get('commit') or 'baseline':>9} {results.get('commit') or 'current':>9} {'delta':>9}")
+    for name, ms in rows.items():
+        old = before.get(name)
+        delta = "" if old is None else f"{ms - old:+.1f}"
+        print(f"{name:<40} {'' if old is None else old:>9} {ms:>9} {delta:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    results = run(args.runs)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
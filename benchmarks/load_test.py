@@ -0,0 +1,394 @@
+"""
+Mixed-workload load test of the routes in routes/auth.py, with local
+stand-ins for every dependency.
+
+Serves main:app with uvicorn on localhost and drives it with concurrent
+httpx clients for --duration seconds. Stand-ins:
+
+- users and notification services: in-process HTTP servers answering 200
+  after --downstream-latency-ms; the notification server keeps the last
+  PIN sent to each phone/email, which is how the harness verifies users
+  and completes password recovery like a real client would
+- Firebase: a verifier accepting "fake-google:<email>:<name>" tokens
+- Postgres: a SQLite file (WAL), or --database-url for a real database.
+  On SQLite, PINs go to the in-memory PIN store (PIN_STORE=cache) since
+  SQLite returns naive datetimes for verification_pins.created_at.
+
+For every endpoint it reports requests, RPS, p50/p95/p99 latency, failures
+(unexpected status codes) and database queries per request, taken from
+the X-DB-Queries header (DB_QUERY_HEADERS).
+
+    python -m benchmarks.load_test [--duration S] [--concurrency N] [--users N]
+                                   [--downstream-latency-ms MS] [--database-url URL] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# endpoint -> weight of the scenario that exercises it
+SCENARIOS = {
+    "login": 30,
+    "protected": 25,
+    "has_password": 5,
+    "list_users": 2,
+    "register": 6,
+    "resend": 3,
+    "notification": 3,
+    "recovery": 5,
+    "google_signup": 4,
+    "google_login": 6,
+    "block": 3,
+    "change_role": 3,
+}
+
+
+class FakeDownstreams:
+    """Users and notification services in one threaded HTTP server."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.pins = {}
+        self.requests = 0
+        downstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                downstream.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/notifications":
+                    downstream.pins[body["To"]] = body["Body"]
+                elif self.path == "/notifications/email":
+                    downstream.pins[body["receiver_email"]] = re.search(r"\n(\d+)\n", body["text"]).group(1)
+                elif self.path.startswith("/users/profile/") and self.command == "GET":
+                    body = {"id": self.path.rsplit("/", 1)[-1], "role": "student"}
+                time.sleep(downstream.latency)
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PATCH = do_PUT = _handle
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def fake_google_verify(token: str) -> dict:
+    _, email, name = token.split(":", 2)
+    return {"email": email, "name": name, "picture": None, "exp": time.time() + 3600}
+
+
+def configure_environment(args, downstreams: FakeDownstreams):
+    # read at import by externals, routes and dbConfig: set before importing the app
+    os.environ.update({
+        "URL_USERS": downstreams.url,
+        "URL_NOTIFICATION": downstreams.url,
+        "DATADOG_API_KEY": "",
+        "STARTUP_MODE": "lazy",
+        "DB_MODE": "sync",
+        "CACHE_URL": "memory://",
+        "SIDE_EFFECTS_MODE": "sync",
+        "DB_QUERY_HEADERS": "true",
+    })
+    if not args.database_url:
+        os.environ["PIN_STORE"] = "cache"
+    os.environ.setdefault("OPENAPI_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "openapi.yaml"))
+
+
+def build_app(args, workdir: str):
+    from sqlalchemy import create_engine, event
+    import dbConfig.session as session
+    from dbConfig.query_stats import QueryStats, instrument_engine
+
+    if args.database_url:
+        engine = create_engine(args.database_url, pool_size=args.concurrency, max_overflow=args.concurrency)
+    else:
+        from sqlalchemy.sql import sqltypes
+        # the API passes user ids as str, which psycopg2 accepts; the SQLite
+        # dialect only binds uuid.UUID, so coerce like the Postgres driver does
+        uuid_bind_processor = sqltypes.Uuid.bind_processor
+
+        def coerce_str_uuid(self, dialect):
+            process = uuid_bind_processor(self, dialect)
+            if process is None:
+                return None
+            return lambda value: process(uuid.UUID(value) if isinstance(value, str) else value)
+
+        sqltypes.Uuid.bind_processor = coerce_str_uuid
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'load_test.db')}", pool_size=args.concurrency,
+                               max_overflow=args.concurrency, connect_args={"check_same_thread": False, "timeout": 30})
+        event.listen(engine, "connect", lambda connection, record: connection.execute("PRAGMA journal_mode=WAL"))
+
+    session.engine = engine
+    session.SessionLocal.configure(bind=engine)
+    session.query_stats = instrument_engine(engine, QueryStats())
+
+    from utils.google_tokens import google_tokens
+    google_tokens._verify = fake_google_verify
+    google_tokens._refresh_certs = lambda: None
+
+    import main
+    from dbConfig.base import Base
+    Base.metadata.create_all(engine)
+    return main.app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+class LoadTest:
+    def __init__(self, client, downstreams: FakeDownstreams):
+        self.client = client
+        self.downstreams = downstreams
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.failures = defaultdict(int)
+        self.login_users = []
+        self.recovery_users = []
+        self.block_users = []
+
+    async def call(self, name: str, method: str, url: str, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            self.failures[name] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - started) * 1000)
+        if "x-db-queries" in response.headers:
+            self.queries[name].append(int(response.headers["x-db-queries"]))
+        if response.status_code not in expect:
+            self.failures[name] += 1
+        return response
+
+    async def create_user(self, record=True):
+        email = f"user-{uuid.uuid4().hex[:12]}@example.com"
+        phone = f"+54911{random.randint(10000000, 99999999)}"
+        password = "Secret123!"
+        call = self.call if record else self.call_unrecorded
+        response = await call("POST /auth/register", "POST", "/auth/register", json={
+            "email": email, "password": password, "name": "Load", "last_name": "Test", "role": "student", "phone": phone})
+        if response is None or response.status_code != 200:
+            return None
+        user_id = user_id_from_token(response.json()["access_token"])
+        await call("POST /auth/verification", "POST", "/auth/verification", json={"userId": user_id, "pin": self.downstreams.pins[phone]})
+        return {"id": user_id, "email": email, "phone": phone, "password": password}
+
+    async def call_unrecorded(self, name, method, url, expect=(200,), **kwargs):
+        return await self.client.request(method, url, **kwargs)
+
+    async def setup(self, users: int):
+        created = await asyncio.gather(*(self.create_user(record=False) for _ in range(users + 10)))
+        created = [user for user in created if user]
+        if len(created) < users + 10:
+            raise RuntimeError(f"setup created {len(created)} of {users + 10} users")
+        self.login_users = created[:users]
+        self.recovery_users = created[users:users + 5]
+        self.block_users = created[users + 5:]
+        for user in self.login_users:
+            response = await self.client.post("/auth/login", json={"email": user["email"], "password": user["password"]})
+            user["token"] = response.json()["access_token"]
+
+    async def login(self):
+        user = random.choice(self.login_users)
+        await self.call("POST /auth/login", "POST", "/auth/login", json={"email": user["email"], "password": user["password"]})
+
+    async def protected(self):
+        user = random.choice(self.login_users)
+        await self.call("GET /auth/protected", "GET", "/auth/protected", headers={"Authorization": f"Bearer {user['token']}"})
+
+    async def has_password(self):
+        user = random.choice(self.login_users)
+        await self.call("GET /auth/has-password/{user_email}", "GET", f"/auth/has-password/{user['email']}")
+
+    async def list_users(self):
+        await self.call("GET /auth", "GET", "/auth")
+
+    async def register(self):
+        await self.create_user()
+
+    async def resend(self):
+        user = await self.create_unverified_user()
+        if user:
+            await self.call("POST /auth/verification/resend", "POST", "/auth/verification/resend",
+                            json={"userId": user["id"], "phone": user["phone"]})
+
+    async def notification(self):
+        user = random.choice(self.login_users)
+        await self.call("POST /auth/notification", "POST", "/auth/notification",
+                        json={"email": user["email"], "to": user["phone"], "channel": "sms"})
+
+    async def create_unverified_user(self):
+        email = f"pending-{uuid.uuid4().hex[:12]}@example.com"
+        phone = f"+54911{random.randint(10000000, 99999999)}"
+        response = await self.call("POST /auth/register", "POST", "/auth/register", json={
+            "email": email, "password": "Secret123!", "name": "Load", "last_name": "Test", "role": "student", "phone": phone})
+        if response is None or response.status_code != 200:
+            return None
+        return {"id": user_id_from_token(response.json()["access_token"]), "phone": phone}
+
+    async def recovery(self):
+        # dedicated users: changing the password must not break concurrent logins
+        if not self.recovery_users:
+            return
+        user = self.recovery_users.pop()
+        try:
+            await self.call("POST /auth/recovery-password", "POST", "/auth/recovery-password", json={"userEmail": user["email"]})
+            pin = self.downstreams.pins.get(user["email"])
+            await self.call("POST /auth/recovery-password/verify-pin", "POST", "/auth/recovery-password/verify-pin",
+                            json={"userEmail": user["email"], "pin": pin})
+            await self.call("PATCH /auth/recovery-password/change-password", "PATCH", "/auth/recovery-password/change-password",
+                            json={"userEmail": user["email"], "new_password": "Changed123!"})
+        finally:
+            self.recovery_users.insert(0, user)
+
+    async def google_signup(self):
+        email = f"google-{uuid.uuid4().hex[:12]}@example.com"
+        token = f"fake-google:{email}:Load Test"
+        await self.call("POST /auth/check-google-user", "POST", "/auth/check-google-user", expect=(404,), json={"google_token": token})
+        await self.call("POST /auth/google", "POST", "/auth/google", json={"google_token": token, "role": "student"})
+        await self.call("PUT /auth/set-password", "PUT", "/auth/set-password", json={"userEmail": email, "new_password": "Secret123!"})
+
+    async def google_login(self):
+        user = random.choice(self.login_users)
+        await self.call("POST /auth/check-google-user", "POST", "/auth/check-google-user",
+                        json={"google_token": f"fake-google:{user['email']}:Load Test"})
+
+    async def block(self):
+        if not self.block_users:
+            return
+        user = self.block_users.pop()
+        try:
+            for block in (True, False):
+                await self.call("PATCH /auth/block/{user_id}", "PATCH", f"/auth/block/{user['id']}", json={"block": block})
+        finally:
+            self.block_users.insert(0, user)
+
+    async def change_role(self):
+        user = random.choice(self.login_users)
+        await self.call("PATCH /auth/rol/{user_id}", "PATCH", f"/auth/rol/{user['id']}", json={"role": random.choice(["student", "teacher"])})
+
+    async def worker(self, deadline: float):
+        names, weights = zip(*SCENARIOS.items())
+        while time.perf_counter() < deadline:
+            await getattr(self, random.choices(names, weights)[0])()
+
+    async def run(self, duration: float, concurrency: int):
+        started = time.perf_counter()
+        await asyncio.gather(*(self.worker(started + duration) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(self.latencies):
+            samples = sorted(self.latencies[name])
+            queries = self.queries[name]
+            endpoints[name] = {
+                "requests": len(samples),
+                "rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(samples, 50), 1),
+                "p95_ms": round(percentile(samples, 95), 1),
+                "p99_ms": round(percentile(samples, 99), 1),
+                "failures": self.failures[name],
+                "db_queries": round(statistics.mean(queries), 1) if queries else None,
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {"duration_s": round(elapsed, 1), "requests": total, "rps": round(total / elapsed, 1), "endpoints": endpoints}
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))]
+
+
+def user_id_from_token(token: str) -> str:
+    from jose import jwt
+    return jwt.get_unverified_claims(token)["user_id"]
+
+
+async def drive(args, base_url: str, downstreams: FakeDownstreams) -> dict:
+    import httpx
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        load_test = LoadTest(client, downstreams)
+        await load_test.setup(args.users)
+        elapsed = await load_test.run(args.duration, args.concurrency)
+        return load_test.report(elapsed)
+
+
+def print_report(results: dict):
+    print(f"{results['requests']} requests in {results['duration_s']}s, {results['rps']} req/s")
+    print(f"{'endpoint':<48} {'reqs':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'fail':>5} {'queries':>8}")
+    for name, row in results["endpoints"].items():
+        print(f"{name:<48} {row['requests']:>6} {row['rps']:>7} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} "
+              f"{row['failures']:>5} {'' if row['db_queries'] is None else row['db_queries']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--downstream-latency-ms", type=float, default=20)
+    parser.add_argument("--database-url", help="e.g. an ephemeral Postgres; SQLite in a temp dir by default")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    downstreams = FakeDownstreams(args.downstream_latency_ms)
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(args, downstreams)
+        app = build_app(args, workdir)
+        server, thread = start_server(app, free_port())
+        try:
+            results = asyncio.run(drive(args, f"http://127.0.0.1:{server.config.port}", downstreams))
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+            downstreams.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Per-request overhead of the Datadog request logger, in microseconds.
+
+Calls a minimal Starlette app directly through ASGI (no server, no network)
+and compares: no middleware, the previous BaseHTTPMiddleware logger
+(replayed here as the baseline) and the current ASGI middleware. Log
+entries go to a logger that discards them, so only the middleware cost is
+measured.
+
+    python -m benchmarks.middleware_overhead [--requests N] [--json]
+"""
+import argparse
+import asyncio
+import json
+import time
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from middleware.datadog_logger import DatadogLoggerMiddleware
+
+
+class DiscardingLogger:
+    async def log(self, message, status, attributes=None, tags=None):
+        pass
+
+
+class LegacyDatadogLoggerMiddleware(BaseHTTPMiddleware):
+    # Previous implementation, kept only as the baseline of this benchmark
+    def __init__(self, app, dd_logger):
+        super().__init__(app)
+        self.dd_logger = dd_logger
+
+    async def dispatch(self, request, call_next):
+        start_time = time.time()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            attributes = {
+                "request": {
+                    "method": request.method,
+                    "url": str(request.url),
+                    "headers": dict(request.headers),
+                    "client": request.client.host if request.client else None,
+                },
+                "response": {"status_code": status_code, "process_time_ms": round((time.time() - start_time) * 1000, 2)},
+            }
+            await self.dd_logger.log(f"{request.method} {request.url.path} - {status_code}",
+                                     "info" if status_code < 400 else "error", attributes,
+                                     [f"method:{request.method}", f"status_code:{status_code}"])
+        return response
+
+
+async def endpoint(request):
+    return JSONResponse({"message": "ok"})
+
+
+def build_app(middleware):
+    return Starlette(routes=[Route("/auth/protected", endpoint)], middleware=middleware)
+
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+    "path": "/auth/protected", "raw_path": b"/auth/protected", "query_string": b"", "root_path": "",
+    "server": ("testserver", 80), "client": ("10.0.0.1", 1234),
+    "headers": [(b"host", b"testserver"), (b"user-agent", b"benchmark"), (b"accept", b"*/*"),
+                (b"authorization", b"Bearer eyJhbGciOiJIUzI1NiJ9.e30.signature")],
+}
+
+
+async def measure(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(min(requests, 500)):
+        await app(dict(SCOPE), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(SCOPE), receive, send)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def run(requests: int) -> dict:
+    logger = DiscardingLogger()
+    baseline = await measure(build_app([]), requests)
+    legacy = await measure(build_app([Middleware(LegacyDatadogLoggerMiddleware, dd_logger=logger)]), requests)
+    current = await measure(build_app([Middleware(DatadogLoggerMiddleware, dd_logger=logger, include_paths=[],
+                                                  exclude_paths=[], sample_rates={})]), requests)
+    excluded = await measure(build_app([Middleware(DatadogLoggerMiddleware, dd_logger=logger, include_paths=[],
+                                                   exclude_paths=["/auth/protected"], sample_rates={})]), requests)
+    return {
+        "no_middleware_us": round(baseline, 1),
+        "legacy_overhead_us": round(legacy - baseline, 1),
+        "asgi_overhead_us": round(current - baseline, 1),
+        "asgi_excluded_path_overhead_us": round(excluded - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, value in results.items():
+        print(f"{name:<32} {value:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Database round trips per endpoint, repository layer only.
+
+Runs the repository calls each endpoint makes against an in-memory SQLite
+database and counts what reaches the driver: every statement plus every
+COMMIT/ROLLBACK (each one is a network round trip against Postgres).
+"legacy" replays the previous read-modify-write implementations (SELECT,
+mutate, COMMIT, refresh); "current" uses repositories.auth_repository.
+
+    python -m benchmarks.repository_round_trips [--json]
+"""
+import json
+import sys
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from dbConfig.base import Base
+from models.credential_models import Credential, VerificationPin
+from repositories import auth_repository as current
+
+
+class legacy:
+    # Previous implementations, kept only as the baseline of this benchmark
+
+    @staticmethod
+    def get_verification_pin(db, user_email):
+        return db.query(VerificationPin).filter(VerificationPin.email == user_email).first()
+
+    @staticmethod
+    def delete_verification_pin(db, verification_pin):
+        db.delete(verification_pin)
+        db.commit()
+
+    @staticmethod
+    def set_new_pin(db, user_email, new_pin, for_password_recovery):
+        pin_entry = db.query(VerificationPin).filter(VerificationPin.email == user_email).first()
+        pin_entry.pin = new_pin
+        pin_entry.created_at = datetime.now(timezone.utc)
+        pin_entry.is_valid = True
+        pin_entry.can_change = False
+        pin_entry.for_password_recovery = for_password_recovery
+        db.commit()
+        db.refresh(pin_entry)
+        return pin_entry
+
+    @staticmethod
+    def set_pin_invalid(db, user_email):
+        pin_entry = db.query(VerificationPin).filter(VerificationPin.email == user_email).first()
+        pin_entry.is_valid = False
+        db.commit()
+        db.refresh(pin_entry)
+
+    @staticmethod
+    def verify_user(db, user_email):
+        user = db.query(Credential).filter(Credential.email == user_email).first()
+        user.is_verified = True
+        db.commit()
+        db.refresh(user)
+
+    @staticmethod
+    def update_user_password(db, user_email, new_password):
+        user = db.query(Credential).filter(Credential.email == user_email).first()
+        user.hashed_password = new_password
+        user.token_epoch = (user.token_epoch or 0) + 1
+        db.commit()
+        db.refresh(user)
+
+    @staticmethod
+    def pin_can_change(db, verification_pin):
+        verification_pin.can_change = True
+        db.commit()
+        db.refresh(verification_pin)
+        return verification_pin
+
+    @staticmethod
+    def increase_incorrect_attempts(db, user_email):
+        pin_entry = db.query(VerificationPin).filter(VerificationPin.email == user_email).first()
+        pin_entry.incorrect_attempts += 1
+        db.commit()
+        db.refresh(pin_entry)
+        return pin_entry
+
+    @staticmethod
+    def block_user(db, user_id):
+        # block_user_service looked the user up first, then handed it over
+        user = db.query(Credential).filter(Credential.id == user_id).first()
+        user.is_blocked = True
+        user.token_epoch = (user.token_epoch or 0) + 1
+        db.commit()
+        db.refresh(user)
+
+
+# endpoint -> calls made by its service once the request is validated
+FLOWS = {
+    "POST /auth/verification/resend (pin exists)": lambda repo, db, ctx: (
+        repo.get_verification_pin(db, ctx["email"]),
+        repo.set_new_pin(db, ctx["email"], "654321", False),
+    ),
+    "POST /auth/verification (wrong pin)": lambda repo, db, ctx: (
+        repo.get_verification_pin(db, ctx["email"]),
+        repo.set_pin_invalid(db, ctx["email"]),
+    ),
+    "POST /auth/verification (ok)": lambda repo, db, ctx: (
+        repo.delete_verification_pin(db, repo.get_verification_pin(db, ctx["email"])),
+        repo.verify_user(db, ctx["email"]),
+    ),
+    "POST /auth/recovery-password/verify-pin (wrong pin)": lambda repo, db, ctx: (
+        repo.get_verification_pin(db, ctx["email"]),
+        repo.increase_incorrect_attempts(db, ctx["email"]),
+    ),
+    "POST /auth/recovery-password/verify-pin (ok)": lambda repo, db, ctx: (
+        repo.pin_can_change(db, repo.get_verification_pin(db, ctx["email"])),
+    ),
+    "PATCH /auth/recovery-password/change-password": lambda repo, db, ctx: (
+        repo.update_user_password(db, ctx["email"], "new-hash"),
+        repo.delete_verification_pin(db, repo.get_verification_pin(db, ctx["email"])),
+    ),
+    "PATCH /auth/block/{user_id}": lambda repo, db, ctx: (
+        repo.block_user(db, ctx["user_id"]),
+    ),
+}
+
+
+def count_round_trips(flow, repo) -> int:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    user_id = uuid.uuid4()
+    ctx = {"email": "bench@example.com", "user_id": user_id}
+    with Session() as db:
+        db.add(Credential(id=user_id, email=ctx["email"], hashed_password="hash", token_epoch=0))
+        db.add(VerificationPin(email=ctx["email"], pin="123456", created_at=datetime.now(timezone.utc), incorrect_attempts=0))
+        db.commit()
+
+    counter = {"round_trips": 0}
+
+    def on_statement(*args):
+        counter["round_trips"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_statement)
+    event.listen(engine, "commit", on_statement)
+    event.listen(engine, "rollback", on_statement)
+    with Session() as db:
+        flow(repo, db, ctx)
+    engine.dispose()
+    return counter["round_trips"]
+
+
+def main(argv):
+    results = {
+        name: {"legacy": count_round_trips(flow, legacy), "current": count_round_trips(flow, current)}
+        for name, flow in FLOWS.items()
+    }
+    if "--json" in argv:
+        print(json.dumps(results, indent=2))
+        return
+
+    width = max(len(name) for name in results)
+    print(f"{'endpoint':<{width}}  legacy  current")
+    for name, counts in results.items():
+        print(f"{name:<{width}}  {counts['legacy']:>6}  {counts['current']:>7}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,22 @@
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from dbConfig.session import DATABASE_URL, POOL_OPTIONS
+from dbConfig.pool_stats import PoolStats, instrumented_pool_class
+from dbConfig.query_stats import QueryStats, instrument_engine
+
+ASYNC_DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+async_pool_stats = PoolStats()
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, async_pool_stats), **POOL_OPTIONS
+)
+# expire_on_commit=False: expired attributes would need a lazy load, which async sessions can't do implicitly
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+async_query_stats = instrument_engine(async_engine.sync_engine, QueryStats())
+
+
+async def get_async_db():
+
+    async with AsyncSessionLocal() as db:
+        yield db
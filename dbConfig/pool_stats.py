@@ -0,0 +1,54 @@
+import time
+from sqlalchemy import exc
+from utils.metrics import LatencyHistogram
+
+
+class PoolStats:
+    """Checkout wait times and timeouts for one engine's connection pool."""
+
+    def __init__(self):
+        self.wait_time = LatencyHistogram()
+        self.timeouts = 0
+        self.pool = None
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        if pool is None:
+            return {"configured": False}
+        return {
+            "configured": True,
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout_s": pool.timeout(),
+            "timeouts": self.timeouts,
+            "wait_time": self.wait_time.snapshot(),
+        }
+
+
+def instrumented_pool_class(base, stats: PoolStats):
+    """
+    Subclass of the SQLAlchemy pool class `base` that records how long each
+    checkout waited into `stats`. The class (not the instance) carries the
+    stats, so they survive `engine.dispose()` recreating the pool.
+    """
+
+    class InstrumentedPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            stats.pool = self
+
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.wait_time.observe((time.perf_counter() - start) * 1000)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
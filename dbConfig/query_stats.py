@@ -0,0 +1,95 @@
+import contextvars
+import os
+import time
+from typing import Optional
+from sqlalchemy import event
+from utils.metrics import LatencyHistogram
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+
+class RequestQueries:
+    """Queries issued while serving one request and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.time_ms = 0.0
+
+    def as_dict(self) -> dict:
+        return {"queries": self.count, "time_ms": round(self.time_ms, 2)}
+
+
+# Holds a mutable RequestQueries so the counts made in the threadpool (sync
+# handlers) or in SQLAlchemy's greenlets (async engine) reach the middleware
+_request_queries: contextvars.ContextVar[Optional[RequestQueries]] = contextvars.ContextVar("request_queries", default=None)
+
+
+def start_request_queries():
+    return _request_queries.set(RequestQueries())
+
+
+def end_request_queries(token):
+    _request_queries.reset(token)
+
+
+def current_request_queries() -> Optional[RequestQueries]:
+    return _request_queries.get()
+
+
+def redact_parameters(parameters):
+    # keep the shape (names / positions) to tell statements apart, never the values
+    if isinstance(parameters, dict):
+        return {key: "?" for key in parameters}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"[{len(parameters)} parameter sets]"
+        return ["?"] * len(parameters)
+    return parameters
+
+
+class QueryStats:
+    """Execute times and slow statements of every query run by one engine."""
+
+    def __init__(self, slow_query_ms: float = SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self.execute_time = LatencyHistogram()
+        self.slow_queries = 0
+
+    def record(self, statement: str, parameters, elapsed_ms: float):
+        self.execute_time.observe(elapsed_ms)
+        request = current_request_queries()
+        if request is not None:
+            request.count += 1
+            request.time_ms += elapsed_ms
+        if elapsed_ms >= self.slow_query_ms:
+            self.slow_queries += 1
+            print(f"Slow query ({elapsed_ms:.1f}ms): {' '.join(statement.split())} parameters={redact_parameters(parameters)}")
+
+    def snapshot(self) -> dict:
+        return {
+            "slow_query_ms": self.slow_query_ms,
+            "slow_queries": self.slow_queries,
+            "execute_time": self.execute_time.snapshot(),
+        }
+
+
+def instrument_engine(engine, stats: QueryStats):
+    """Times every cursor execution of `engine` (the sync_engine of an AsyncEngine) into `stats`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats.record(statement, parameters, (time.perf_counter() - started) * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # failed statements never reach after_cursor_execute
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+
+    return stats
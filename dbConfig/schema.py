@@ -0,0 +1,50 @@
+import glob
+import os
+import re
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from dbConfig.base import Base
+
+ALEMBIC_VERSIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic", "versions")
+
+_REVISION = re.compile(r"^revision(?::[^=]*)?=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision(?::[^=]*)?=\s*(.+)$", re.MULTILINE)
+
+
+def alembic_heads(versions_dir: str = ALEMBIC_VERSIONS_DIR) -> set:
+    # Reads revision/down_revision straight from the migration files:
+    # loading alembic's ScriptDirectory costs ~0.5s of imports at startup.
+    revisions, parents = set(), set()
+    for path in glob.glob(os.path.join(versions_dir, "*.py")):
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        revision = _REVISION.search(source)
+        if not revision:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION.search(source)
+        if down_revision:
+            parents.update(re.findall(r"['\"]([^'\"]+)['\"]", down_revision.group(1)))
+    return revisions - parents
+
+
+def schema_is_current(engine, versions_dir: str = ALEMBIC_VERSIONS_DIR) -> bool:
+    heads = alembic_heads(versions_dir)
+    if not heads:
+        return False
+    try:
+        with engine.connect() as connection:
+            applied = {row[0] for row in connection.execute(text("SELECT version_num FROM alembic_version"))}
+    except DBAPIError:
+        # no alembic_version table: schema never migrated
+        return False
+    return applied == heads
+
+
+def ensure_schema(engine, versions_dir: str = ALEMBIC_VERSIONS_DIR) -> bool:
+    # create_all checks every table (one round trip each); when migrations
+    # are at head there is nothing to create, so a single query is enough
+    if schema_is_current(engine, versions_dir):
+        return False
+    Base.metadata.create_all(bind=engine)
+    return True
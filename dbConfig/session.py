@@ -1,8 +1,11 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
 from dotenv import load_dotenv
 from dbConfig.base import Base 
+from dbConfig.pool_stats import PoolStats, instrumented_pool_class
+from dbConfig.query_stats import QueryStats, instrument_engine
 
 
 if os.getenv("RENDER") != "TRUE":
@@ -13,10 +16,31 @@ load_dotenv()
 DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@" \
     f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 
-
-
-engine = create_engine(DATABASE_URL)
+# "sync" (default) serves the API with the blocking engine below,
+# "async" with the asyncpg engine from dbConfig.async_session
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# Pool settings are per process (per uvicorn worker): size them against the
+# replica count and Postgres max_connections. Recycle/pre-ping drop the
+# connections left dead by a failover instead of handing them to a request.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+pool_stats = PoolStats()
+engine = create_engine(DATABASE_URL, poolclass=instrumented_pool_class(QueuePool, pool_stats), **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+query_stats = instrument_engine(engine, QueryStats())
 
 
 def get_db():
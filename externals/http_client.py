@@ -0,0 +1,194 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Optional
+import httpx
+from utils.metrics import LatencyHistogram
+from externals.resilience import CircuitBreaker, CircuitOpenError, Bulkhead
+
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", 2))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", 5))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 2))
+HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", 0.1))
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class DownstreamClient:
+    """
+    Pooled keep-alive HTTP clients for one downstream service: an
+    httpx.Client for sync code and an httpx.AsyncClient for async code,
+    both with connect/read timeouts. Idempotent requests are retried with
+    jittered exponential backoff on transport errors and 502/503/504;
+    any request is retried when the connection could not be established
+    (nothing was sent). Latency is recorded per attempt.
+
+    Each call (retries included) goes through a circuit breaker and a
+    bulkhead; when either rejects it, DownstreamRejected is raised without
+    touching the network.
+    """
+
+    def __init__(self, name: str, connect_timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS,
+                 read_timeout: float = HTTP_READ_TIMEOUT_SECONDS, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 max_retries: int = HTTP_MAX_RETRIES, retry_backoff: float = HTTP_RETRY_BACKOFF_SECONDS,
+                 transport: Optional[httpx.BaseTransport] = None, async_transport: Optional[httpx.AsyncBaseTransport] = None,
+                 breaker: Optional[CircuitBreaker] = None, bulkhead: Optional[Bulkhead] = None):
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(name)
+        self.bulkhead = bulkhead or Bulkhead(name)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.transport = transport
+        self.async_transport = async_transport
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop = None
+        self._lock = threading.Lock()
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(timeout=self.timeout, limits=self.limits, transport=self.transport)
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # an AsyncClient's connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, transport=self.async_transport)
+            self._async_loop = loop
+        return self._async_client
+
+    def _should_retry(self, method: str, attempt: int, response: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+        if method.upper() not in IDEMPOTENT_METHODS:
+            return False
+        return error is not None or response.status_code in RETRYABLE_STATUS_CODES
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter
+        return random.uniform(0, self.retry_backoff * (2 ** attempt))
+
+    def _record(self, started: float, error: Optional[Exception]):
+        self.latency.observe((time.perf_counter() - started) * 1000)
+        self.requests += 1
+        if error is not None:
+            self.errors += 1
+
+    def _start_call(self):
+        self.bulkhead.acquire()
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.bulkhead.release()
+            raise
+
+    def _finish_call(self, response: Optional[httpx.Response]):
+        self.bulkhead.release()
+        self.breaker.record(response is not None and response.status_code < 500)
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        self._start_call()
+        response = None
+        try:
+            response = self._request(method, url, **kwargs)
+            return response
+        finally:
+            self._finish_call(response)
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        self._start_call()
+        response = None
+        try:
+            response = await self._arequest(method, url, **kwargs)
+            return response
+        finally:
+            self._finish_call(response)
+
+    def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                response = self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            self._record(started, error)
+            if not self._should_retry(method, attempt, response, error):
+                if error is not None:
+                    raise error
+                return response
+            self.retries += 1
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def _arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                response = await self.async_client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            self._record(started, error)
+            if not self._should_retry(method, attempt, response, error):
+                if error is not None:
+                    raise error
+                return response
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "latency": self.latency.snapshot(),
+            "circuit": self.breaker.stats(),
+            "bulkhead": self.bulkhead.stats(),
+        }
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+def fan_out_limit(client: DownstreamClient) -> int:
+    # Concurrency for background fan-out (outbox delivery, batch endpoints):
+    # half the bulkhead, so request traffic to the same downstream keeps its slots
+    return max(1, client.bulkhead.max_concurrent // 2)
+
+
+def idempotency_headers(idempotency_key):
+    return {"Idempotency-Key": idempotency_key} if idempotency_key else None
+
+
+users_client = DownstreamClient("users")
+notifications_client = DownstreamClient("notifications")
+DOWNSTREAMS = {client.name: client for client in (users_client, notifications_client)}
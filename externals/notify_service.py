@@ -1,6 +1,7 @@
-import requests
+import httpx
 from fastapi import HTTPException
 import os
+from externals.http_client import notifications_client, idempotency_headers
 
 prefix = os.getenv('URL_NOTIFICATION')
 NOTIFICATION_SERVICE_URL = prefix +"/notifications"
@@ -18,63 +19,75 @@ html_recovery_template = (
 )
 
 def send_notification(to: str, pin: str, channel: str):
-    payload = {
+    payload = notification_payload(to, pin, channel)
+    try:
+        response = notifications_client.request("POST", NOTIFICATION_SERVICE_URL, json=payload)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_notification_response(response, "Notification rejected by provider")
+
+async def send_notification_async(to: str, pin: str, channel: str, idempotency_key: str = None):
+    payload = notification_payload(to, pin, channel)
+    try:
+        response = await notifications_client.arequest("POST", NOTIFICATION_SERVICE_URL, json=payload,
+                                                       headers=idempotency_headers(idempotency_key))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_notification_response(response, "Notification rejected by provider")
+
+def notification_payload(to: str, pin: str, channel: str):
+    print(f"Sending notification to {to} via {channel} with body: {pin}")
+    return {
         "To": to,
         "Body": pin,
         "Channel": channel
     }
-    print(f"Sending notification to {to} via {channel} with body: {pin}")
+
+def send_email_recovery(to_email: str, body: str):
     try:
-        response = requests.post(NOTIFICATION_SERVICE_URL, json=payload)
-        print(f"Notification service response: {response.status_code}, {response.text}")
-        if response.status_code == 200:
-            return True
-        elif response.status_code == 404:
-            raise HTTPException(status_code=404, detail="Notification rejected by provider")
-        elif response.status_code == 400:
-            raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
+        response = notifications_client.request("POST", prefix + "/notifications/email", json=email_recovery_payload(to_email, body))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_notification_response(response, "Email rejected by provider")
 
-    except requests.RequestException as e:
+async def send_email_recovery_async(to_email: str, body: str):
+    try:
+        response = await notifications_client.arequest("POST", prefix + "/notifications/email", json=email_recovery_payload(to_email, body))
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
-    
+    return handle_notification_response(response, "Email rejected by provider")
 
-def send_email_recovery(to_email: str, body: str):
-    email_service_url = prefix + "/notifications/email"
-    payload = {
+def email_recovery_payload(to_email: str, body: str):
+    print(f"Sending email to {to_email} with body: {body}")
+    return {
         "receiver_email": to_email,
         "subject": "ClassConnect Password Recovery",
         "text": text_recovery_template.format(body),
         "html": html_recovery_template.format(body)
     }
-    print(f"Sending email to {to_email} with body: {body}")
-    try:
-        response = requests.post(email_service_url, json=payload)
-        print(f"Notification service response: {response.status_code}, {response.text}")
-        if response.status_code == 200:
-            return True
-        elif response.status_code == 404:
-            raise HTTPException(status_code=404, detail="Email rejected by provider")
-        elif response.status_code == 400:
-            raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
 
-    except requests.RequestException as e:
-        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
-    
 def create_notification_preferences(id: str, email: str):
-    NOTIFICATION_SERVICE_URL = prefix + "/notifications/preferences/" + id
-    payload = {
-        "email": email
-    }
     print(f"Creating notification preferences for user {id} with channel {email}")
     try:
-        response = requests.post(NOTIFICATION_SERVICE_URL, json=payload)
-        print(f"Notification service response: {response.status_code}, {response.text}")
-        if response.status_code == 200:
-            return True
-        elif response.status_code == 404:
-            raise HTTPException(status_code=404, detail="Notification preferences not found")
-        elif response.status_code == 400:
-            raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
+        response = notifications_client.request("POST", prefix + "/notifications/preferences/" + id, json={"email": email})
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_notification_response(response, "Notification preferences not found")
+
+async def create_notification_preferences_async(id: str, email: str, idempotency_key: str = None):
+    print(f"Creating notification preferences for user {id} with channel {email}")
+    try:
+        response = await notifications_client.arequest("POST", prefix + "/notifications/preferences/" + id, json={"email": email},
+                                                       headers=idempotency_headers(idempotency_key))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_notification_response(response, "Notification preferences not found")
 
-    except requests.RequestException as e:
-        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
\ No newline at end of file
+def handle_notification_response(response: httpx.Response, not_found_detail: str):
+    print(f"Notification service response: {response.status_code}, {response.text}")
+    if response.status_code == 200:
+        return True
+    elif response.status_code == 404:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+    elif response.status_code == 400:
+        raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
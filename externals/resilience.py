@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import deque
+import httpx
+
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", 0.5))
+CIRCUIT_WINDOW_SIZE = int(os.getenv("CIRCUIT_WINDOW_SIZE", 20))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", 10))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", 30))
+BULKHEAD_MAX_CONCURRENT = int(os.getenv("BULKHEAD_MAX_CONCURRENT", 10))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class DownstreamRejected(httpx.TransportError):
+    # Raised before anything is sent; subclasses TransportError so the
+    # externals' existing httpx error handling turns it into a 503.
+    pass
+
+
+def is_rejection(error: BaseException) -> bool:
+    # The externals turn DownstreamRejected into an HTTPException(503); the
+    # original exception is still reachable through the exception chain
+    while error is not None:
+        if isinstance(error, DownstreamRejected):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class CircuitOpenError(DownstreamRejected):
+    pass
+
+
+class BulkheadFullError(DownstreamRejected):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker over the last `window_size` calls. Opens
+    when at least `min_calls` were seen and the failure rate reaches
+    `failure_rate`; after `open_seconds` a single probe call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_rate: float = CIRCUIT_FAILURE_RATE, window_size: int = CIRCUIT_WINDOW_SIZE,
+                 min_calls: int = CIRCUIT_MIN_CALLS, open_seconds: float = CIRCUIT_OPEN_SECONDS, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window_size)
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"Circuit open for {self.name}")
+
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if success:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                self.probe_in_flight = False
+                return
+            if self.state == OPEN:
+                return
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.opened += 1
+        self.outcomes.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "window_calls": len(self.outcomes),
+                "window_failures": self.outcomes.count(False),
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class Bulkhead:
+    """
+    Caps concurrent calls to one downstream. A call over the limit is
+    rejected immediately instead of waiting, so a slow dependency can hold
+    at most `max_concurrent` threadpool workers (or coroutines).
+    """
+
+    def __init__(self, name: str, max_concurrent: int = BULKHEAD_MAX_CONCURRENT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                self.rejected += 1
+                raise BulkheadFullError(f"Too many concurrent calls to {self.name}")
+            self.in_flight += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": self.in_flight, "max_concurrent": self.max_concurrent, "rejected": self.rejected}
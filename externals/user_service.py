@@ -1,39 +1,68 @@
-import requests
+import httpx
 from fastapi import HTTPException
 import os
+from externals.http_client import users_client, idempotency_headers
 
 prefix = os.getenv('URL_USERS')
 
 def get_user_data(id: str):
     USER_SERVICE_URL = prefix + "/users/profile/" + id
-    #print(f"Getting user {id} data")
     try:
-        response = requests.get(USER_SERVICE_URL)
-        #print(f"User service response: {response.status_code}, {response.text}")
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 404:
-            raise HTTPException(status_code=404, detail="User not found")
-        elif response.status_code == 400:
-            raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
-
-    except requests.RequestException as e:
+        response = users_client.request("GET", USER_SERVICE_URL)
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_get_user_data(response)
+
+async def get_user_data_async(id: str):
+    USER_SERVICE_URL = prefix + "/users/profile/" + id
+    try:
+        response = await users_client.arequest("GET", USER_SERVICE_URL)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_get_user_data(response)
+
+def handle_get_user_data(response: httpx.Response):
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 404:
+        raise HTTPException(status_code=404, detail="User not found")
+    elif response.status_code == 400:
+        raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
 
 def update_user_data(id: str, data: dict):
     USER_SERVICE_URL = prefix + "/users/profile/" + id
-    #print(f"Updating user {id} data with {data}")
     try:
-        response = requests.patch(USER_SERVICE_URL, json=data)
-        #print(f"User service response: {response.status_code}, {response.text}")
-        if response.status_code == 200:
-            return True
-        elif response.status_code == 404:
-            raise HTTPException(status_code=404, detail="User not found")
-        elif response.status_code == 400:
-            raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
-        elif response.status_code == 422:
-            raise HTTPException(status_code=403, detail="User not authorized to update this data")
-
-    except requests.RequestException as e:
+        response = users_client.request("PATCH", USER_SERVICE_URL, json=data)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_update_user_data(response)
+
+async def update_user_data_async(id: str, data: dict):
+    USER_SERVICE_URL = prefix + "/users/profile/" + id
+    try:
+        response = await users_client.arequest("PATCH", USER_SERVICE_URL, json=data)
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    return handle_update_user_data(response)
+
+def handle_update_user_data(response: httpx.Response):
+    if response.status_code == 200:
+        return True
+    elif response.status_code == 404:
+        raise HTTPException(status_code=404, detail="User not found")
+    elif response.status_code == 400:
+        raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
+    elif response.status_code == 422:
+        raise HTTPException(status_code=403, detail="User not authorized to update this data")
+
+async def create_profile_async(profile_data: dict, idempotency_key: str = None):
+    try:
+        response = await users_client.arequest("POST", prefix + "/users/profile", json=profile_data,
+                                               headers=idempotency_headers(idempotency_key))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Users service unavailable: {str(e)}")
+    if response.is_success:
+        return True
+    if response.status_code < 500:
+        raise HTTPException(status_code=response.status_code, detail=f"Profile rejected by users service: {response.text}")
+    return False
@@ -1,19 +1,35 @@
+from utils.startup import startup_timer, STARTUP_MODE
 from fastapi import FastAPI
-from routes.auth import router as auth_router
-from dbConfig.base import Base
-from dbConfig.session import engine
+from models import credential_models, outbox_models  # registers the tables for ensure_schema
+from dbConfig.schema import ensure_schema
+from utils.openapi_spec import load_openapi, LazyOpenAPI
+from dbConfig.session import engine, DB_MODE, SessionLocal
 from middleware.datadog_logger import setup_datadog_logging
+from middleware.query_stats import QueryStatsMiddleware
+from utils.password_hasher import password_hasher
+from routes.admin import router as admin_router
+from externals.http_client import DOWNSTREAMS
+from utils.security import TOKEN_VALIDATION_MODE
+from utils.token_epochs import token_epochs
+from utils.google_tokens import google_tokens
+from services.outbox_dispatcher import SIDE_EFFECTS_MODE, outbox_dispatcher
+from repositories.pin_store import PIN_STORE, pin_sweeper
 import os
 from dotenv import load_dotenv
 
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI()
 
-import yaml
-with open("openapi.yaml", "r") as f:
-    custom_openapi = yaml.safe_load(f)
-app.openapi = lambda: custom_openapi
+if STARTUP_MODE == "lazy":
+    # schema check before serving, spec parsed on the first /docs hit
+    app.openapi = LazyOpenAPI()
+
+    @app.on_event("startup")
+    def create_schema():
+        ensure_schema(engine)
+else:
+    ensure_schema(engine)
+    custom_openapi = load_openapi()
+    app.openapi = lambda: custom_openapi
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -28,9 +44,68 @@ app.add_middleware(
 load_dotenv()
 datadog_api_key = os.getenv("DATADOG_API_KEY")
 dd_logger = setup_datadog_logging(app, datadog_api_key)
+# after Datadog: outermost, so the counts are there when the request is logged
+app.add_middleware(QueryStatsMiddleware)
 
+if DB_MODE == "async":
+    from routes.async_auth import router as auth_router
+else:
+    from routes.auth import router as auth_router
 app.include_router(auth_router)
+app.include_router(admin_router)
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+if SIDE_EFFECTS_MODE == "outbox":
+    @app.on_event("startup")
+    async def start_outbox_dispatcher():
+        outbox_dispatcher.start(SessionLocal)
+
+    # registered before close_downstream_clients so in-flight deliveries finish first
+    @app.on_event("shutdown")
+    async def stop_outbox_dispatcher():
+        await outbox_dispatcher.stop()
+
+@app.on_event("shutdown")
+async def close_downstream_clients():
+    for client in DOWNSTREAMS.values():
+        await client.aclose()
+
+@app.on_event("startup")
+def start_google_certs_refresh():
+    google_tokens.start_certs_refresh()
+
+@app.on_event("shutdown")
+def stop_google_certs_refresh():
+    google_tokens.stop_certs_refresh()
+
+if TOKEN_VALIDATION_MODE == "stateless":
+    @app.on_event("startup")
+    def start_token_epoch_sync():
+        token_epochs.start_sync(SessionLocal)
+
+    @app.on_event("shutdown")
+    def stop_token_epoch_sync():
+        token_epochs.stop_sync()
+
+if PIN_STORE == "database":
+    @app.on_event("startup")
+    def start_pin_sweeper():
+        pin_sweeper.start(SessionLocal)
+
+    @app.on_event("shutdown")
+    def stop_pin_sweeper():
+        pin_sweeper.stop()
 
 @app.get("/")
 def root():
     return {"message": "Servidor FastAPI funcionando 🚀"}
+
+# registered last: runs once every other startup hook is done
+@app.on_event("startup")
+def mark_ready():
+    startup_timer.ready()
+
+startup_timer.imported()
@@ -1,12 +1,16 @@
+import asyncio
+import gzip
 import json
 import socket
 import time
 import os
-from typing import Dict, List, Any, Optional
+import random
+from typing import Callable, Dict, List, Any, Optional
 import httpx
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from fastapi import FastAPI
+from starlette.datastructures import URL
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from dbConfig.query_stats import current_request_queries
 
 class LogEntry:
     def __init__(
@@ -41,14 +45,33 @@ class LogEntry:
             "attributes": self.attributes
         }
 
+DATADOG_QUEUE_SIZE = int(os.getenv("DATADOG_QUEUE_SIZE", 10000))
+DATADOG_BATCH_SIZE = int(os.getenv("DATADOG_BATCH_SIZE", 200))  # the v2 intake accepts up to 1000 entries per payload
+DATADOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("DATADOG_FLUSH_INTERVAL_SECONDS", 2))
+DATADOG_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("DATADOG_SHUTDOWN_TIMEOUT_SECONDS", 5))
+
+_STOP = object()
+
 class DatadogLogger:
+    """
+    Logging calls only enqueue the entry; a background task ships them in
+    gzip-compressed batches (array form of the v2 intake) every
+    `flush_interval` seconds or `batch_size` entries, whichever comes first.
+    When the queue is full new entries are dropped and counted instead of
+    slowing requests down. `close` flushes what is left.
+    """
+
     def __init__(
         self,
         api_key: str,
         source: str = "python",
         service: str = "classconnect-auth-api",
         hostname: Optional[str] = None,
-        site: Optional[str] = None
+        site: Optional[str] = None,
+        queue_size: int = DATADOG_QUEUE_SIZE,
+        batch_size: int = DATADOG_BATCH_SIZE,
+        flush_interval: float = DATADOG_FLUSH_INTERVAL_SECONDS,
+        shutdown_timeout: float = DATADOG_SHUTDOWN_TIMEOUT_SECONDS
     ):
         self.api_key = api_key
         self.source = source
@@ -56,6 +79,15 @@ class DatadogLogger:
         self.hostname = hostname or socket.gethostname()
         self.site = site or os.getenv("DATADOG_SITE", "us5.datadoghq.com")
         self.http_client = httpx.AsyncClient(timeout=5.0)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.shutdown_timeout = shutdown_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.failed_batches = 0
 
     async def info(self, message: str, attributes: Optional[Dict[str, Any]] = None, tags: Optional[List[str]] = None) -> None:
         await self.log(message, "info", attributes, tags)
@@ -76,70 +108,196 @@ class DatadogLogger:
             tags=tags,
             attributes=attributes
         )
-        await self.send_logs([entry])
+        self.enqueue(entry)
+
+    def enqueue(self, entry: LogEntry) -> bool:
+        self.start()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    def start(self):
+        # Lazily, so the queue and the task belong to the running event loop
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+            await self.send_logs(batch)
+            if stop:
+                return
 
     async def send_logs(self, logs: List[LogEntry]) -> None:
-        payload = json.dumps([log.to_dict() for log in logs])
-        print(f"Sending logs to Datadog: {payload}")
+        payload = gzip.compress(json.dumps([log.to_dict() for log in logs]).encode("utf-8"))
 
         url = f"https://http-intake.logs.{self.site}/api/v2/logs"
         headers = {
             "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
             "DD-API-KEY": self.api_key
         }
 
         try:
             response = await self.http_client.post(url, headers=headers, content=payload)
             response.raise_for_status()
+            self.sent += len(logs)
         except httpx.HTTPStatusError as e:
+            self.failed_batches += 1
             print(f"Error from Datadog API: status code {e.response.status_code}, body: {e.response.text}")
         except Exception as e:
+            self.failed_batches += 1
             print(f"Error sending logs: {str(e)}")
 
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+        }
+
     async def close(self):
+        if self._task is not None:
+            # FIFO: everything enqueued before the marker gets shipped
+            await self._queue.put(_STOP)
+            try:
+                await asyncio.wait_for(self._task, self.shutdown_timeout)
+            except asyncio.TimeoutError:
+                print(f"Datadog log flush timed out, {self._queue.qsize()} entries lost")
+            self._task = None
         await self.http_client.aclose()
 
-class DatadogLoggerMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, dd_logger: DatadogLogger):
-        super().__init__(app)
+DATADOG_LOG_INCLUDE_PATHS = os.getenv("DATADOG_LOG_INCLUDE_PATHS", "")
+DATADOG_LOG_EXCLUDE_PATHS = os.getenv("DATADOG_LOG_EXCLUDE_PATHS", "")
+# e.g. "2xx=0.1,3xx=0.1,4xx=1,5xx=1"; missing classes are always logged
+DATADOG_LOG_SAMPLE_RATES = os.getenv("DATADOG_LOG_SAMPLE_RATES", "")
+REDACTED_HEADERS = {"authorization", "proxy-authorization", "cookie", "x-admin-key"}
+
+def parse_paths(value: str) -> List[str]:
+    return [path.strip() for path in value.split(",") if path.strip()]
+
+def parse_sample_rates(value: str) -> Dict[int, float]:
+    rates = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        status_class, rate = item.split("=", 1)
+        rates[int(status_class.strip()[0])] = float(rate)
+    return rates
+
+def redact_headers(raw_headers) -> Dict[str, str]:
+    headers = {}
+    for key, value in raw_headers:
+        name = key.decode("latin-1")
+        headers[name] = "[REDACTED]" if name in REDACTED_HEADERS else value.decode("latin-1")
+    return headers
+
+class DatadogLoggerMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware task/stream per response).
+    Paths are matched by prefix: with an allow list only those are logged,
+    the deny list always wins. Responses are sampled per status class, and
+    the entry (URL, headers with credentials redacted) is only built for
+    requests that will actually be logged.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        dd_logger: DatadogLogger,
+        include_paths: Optional[List[str]] = None,
+        exclude_paths: Optional[List[str]] = None,
+        sample_rates: Optional[Dict[int, float]] = None,
+        sampler: Callable[[], float] = random.random
+    ):
+        self.app = app
         self.dd_logger = dd_logger
+        self.include_paths = tuple(parse_paths(DATADOG_LOG_INCLUDE_PATHS) if include_paths is None else include_paths)
+        self.exclude_paths = tuple(parse_paths(DATADOG_LOG_EXCLUDE_PATHS) if exclude_paths is None else exclude_paths)
+        self.sample_rates = parse_sample_rates(DATADOG_LOG_SAMPLE_RATES) if sample_rates is None else sample_rates
+        self.sampler = sampler
+
+    def should_log_path(self, path: str) -> bool:
+        if self.exclude_paths and path.startswith(self.exclude_paths):
+            return False
+        return not self.include_paths or path.startswith(self.include_paths)
+
+    def is_sampled(self, status_code: int) -> bool:
+        rate = self.sample_rates.get(status_code // 100, 1.0)
+        return rate >= 1.0 or (rate > 0 and self.sampler() < rate)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.should_log_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
         try:
-            response = await call_next(request)
-            status_code = response.status_code
-            status = "info" if status_code < 400 else "error"
-        except Exception as exc:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
             status_code = 500
-            status = "error"
-            raise exc
+            raise
         finally:
-            process_time = time.time() - start_time
-            
-            attributes = {
-                "request": {
-                    "method": request.method,
-                    "url": str(request.url),
-                    "headers": dict(request.headers),
-                    "client": request.client.host if request.client else None,
-                },
-                "response": {
-                    "status_code": status_code,
-                    "process_time_ms": round(process_time * 1000, 2)
-                }
+            if self.is_sampled(status_code):
+                await self.log_request(scope, status_code, time.perf_counter() - start_time)
+
+    async def log_request(self, scope: Scope, status_code: int, process_time: float) -> None:
+        method = scope["method"]
+        client = scope.get("client")
+        request_queries = current_request_queries()
+        attributes = {
+            "request": {
+                "method": method,
+                "url": str(URL(scope=scope)),
+                "headers": redact_headers(scope["headers"]),
+                "client": client[0] if client else None,
+            },
+            "response": {
+                "status_code": status_code,
+                "process_time_ms": round(process_time * 1000, 2)
             }
-            
-            # Log the request
-            await self.dd_logger.log(
-                message=f"{request.method} {request.url.path} - {status_code}",
-                status=status,
-                attributes=attributes,
-                tags=[f"method:{request.method}", f"status_code:{status_code}"]
-            )
-        
-        return response
+        }
+        if request_queries is not None:
+            attributes["db"] = request_queries.as_dict()
+
+        # Only enqueues: shipping happens in the background
+        await self.dd_logger.log(
+            message=f"{method} {scope['path']} - {status_code}",
+            status="info" if status_code < 400 else "error",
+            attributes=attributes,
+            tags=[f"method:{method}", f"status_code:{status_code}"]
+        )
 
 def setup_datadog_logging(app: FastAPI, api_key: str) -> DatadogLogger:
     if not api_key:
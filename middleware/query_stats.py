@@ -0,0 +1,39 @@
+import os
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from dbConfig.query_stats import start_request_queries, end_request_queries, current_request_queries
+
+# Headers are meant for development and load tests, not for production clients
+DB_QUERY_HEADERS = os.getenv("DB_QUERY_HEADERS", str(os.getenv("ENVIRONMENT") == "development")).lower() == "true"
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the queries of each request (see dbConfig.query_stats). Added
+    last so it wraps DatadogLoggerMiddleware, which logs the counts; with
+    `expose_headers` they are also returned as X-DB-Queries / X-DB-Time-Ms.
+    """
+
+    def __init__(self, app: ASGIApp, expose_headers: bool = DB_QUERY_HEADERS):
+        self.app = app
+        self.expose_headers = expose_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = start_request_queries()
+        request_queries = current_request_queries()
+
+        async def send_wrapper(message: Message) -> None:
+            if self.expose_headers and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(request_queries.count).encode()))
+                headers.append((b"x-db-time-ms", f"{request_queries.time_ms:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request_queries(token)
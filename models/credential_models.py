@@ -1,8 +1,5 @@
-from typing import Sequence, Union
-from alembic import op
-import sqlalchemy as sa
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, String, Integer, Boolean, DateTime
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Index, func, true
 from datetime import datetime, timezone
 
 from dbConfig.base import Base  
@@ -13,7 +10,7 @@ class Credential(Base):
      __tablename__ = "credentials"
  
      id = Column(UUID(as_uuid=True), primary_key=True)
-     email = Column(String, unique=True, index=True, nullable=False)
+     email = Column(String, nullable=False)
      hashed_password = Column(String, nullable=True)
      failed_attempts = Column(Integer, default=0)
      last_failed_login = Column(DateTime, nullable=True)
@@ -21,13 +18,24 @@ class Credential(Base):
      lock_until = Column(DateTime, nullable=True)
      is_verified = Column(Boolean, default=False)
      is_blocked = Column(Boolean, default=False)
+     # bumped on block, lock and password change; tokens carrying an older epoch are rejected
+     token_epoch = Column(Integer, nullable=False, default=0, server_default="0")
+
+     __table_args__ = (
+         # emails are unique and looked up case-insensitively (repositories.auth_repository.email_is)
+         Index("ix_credentials_email_lower", func.lower(email), unique=True),
+         # only the few locked accounts are indexed; SQLite compares booleans as
+         # "is_locked = 1", and the predicate must be written the way queries are
+         Index("ix_credentials_locked_lock_until", lock_until, postgresql_where=is_locked, sqlite_where=is_locked == true()),
+     )
 
 class VerificationPin(Base):
     __tablename__ = "verification_pins"
 
     email = Column(String, unique=True, nullable=False, primary_key=True)
     pin = Column(String, nullable=False)
-    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.now(timezone.utc))
+    # indexed for the expiry sweep (repositories.auth_repository.delete_expired_pins)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=datetime.now(timezone.utc), index=True)
     is_valid = Column(Boolean, default=True)
     can_change = Column(Boolean, default=False)
     for_password_recovery = Column(Boolean, default=False)
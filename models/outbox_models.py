@@ -0,0 +1,29 @@
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
+from dbConfig.base import Base
+
+
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class OutboxEvent(Base):
+    # Side effect recorded in the same transaction as the change that caused
+    # it and delivered later by services.outbox_dispatcher. The id doubles as
+    # the Idempotency-Key sent downstream, so redeliveries can be deduplicated.
+    __tablename__ = "outbox_events"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # next delivery attempt; pushed forward while an event is claimed (lease) or backing off
+    available_at = Column(DateTime, nullable=False, default=utc_now)
+    created_at = Column(DateTime, nullable=False, default=utc_now)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    __table_args__ = (Index("ix_outbox_events_status_available_at", "status", "available_at"),)
@@ -0,0 +1,176 @@
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.password_hasher import hash_password_async
+from models.credential_models import Credential, VerificationPin
+from utils.credential_cache import credential_cache
+from utils.token_epochs import token_epochs
+from datetime import datetime, timezone, timedelta
+from repositories.auth_repository import failed_login_update, reset_login_attempts_update, users_page_query, users_status_query
+from repositories.auth_repository import set_blocked_update, after_set_blocked, email_is, pin_email_is, normalize_email
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(Credential).where(email_is(email)))
+    return result.scalars().first()
+
+async def get_user_by_id(db: AsyncSession, user_id: str):
+    result = await db.execute(select(Credential).where(Credential.id == user_id))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, email: str, password: str):
+    user = Credential(email=email, hashed_password=await hash_password_async(password), is_verified=False)
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+async def delete_user(db: AsyncSession, user_id):
+    await db.rollback()
+    await db.execute(delete(Credential).where(Credential.id == user_id))
+    await db.commit()
+    credential_cache.invalidate(user_id)
+
+async def create_verification_pin(db: AsyncSession, user_email: str, pin: str, for_password_recovery: bool):
+    verification_pin = VerificationPin(email=normalize_email(user_email), pin=pin, created_at=datetime.now(timezone.utc), is_valid=True,
+                                       can_change=False, for_password_recovery=for_password_recovery)
+    db.add(verification_pin)
+    await db.commit()
+    await db.refresh(verification_pin)
+    return verification_pin
+
+async def get_verification_pin(db: AsyncSession, user_email: str):
+    result = await db.execute(select(VerificationPin).where(pin_email_is(user_email)))
+    return result.scalars().first()
+
+
+async def delete_verification_pin(db: AsyncSession, verification_pin: VerificationPin):
+    await db.delete(verification_pin)
+    await db.commit()
+
+async def delete_pin_by_email(db: AsyncSession, user_email: str):
+    await db.execute(delete(VerificationPin).where(pin_email_is(user_email)))
+    await db.commit()
+
+async def set_new_pin(db: AsyncSession, user_email: str, new_pin: str, for_password_recovery: bool):
+    pin_entry = (await db.execute(
+        update(VerificationPin)
+        .where(pin_email_is(user_email))
+        .values(pin=new_pin, created_at=datetime.now(timezone.utc), is_valid=True, can_change=False,
+                for_password_recovery=for_password_recovery, incorrect_attempts=0)
+        .returning(VerificationPin)
+    )).scalar_one_or_none()
+    if not pin_entry:
+        await db.rollback()
+        raise LookupError(f"No verification pin for {user_email}")
+    await db.commit()
+    return pin_entry
+
+async def set_pin_invalid(db: AsyncSession, user_email: str):
+    row = (await db.execute(
+        update(VerificationPin).where(pin_email_is(user_email)).values(is_valid=False).returning(VerificationPin.email)
+    )).first()
+    if not row:
+        await db.rollback()
+        raise LookupError(f"No verification pin for {user_email}")
+    await db.commit()
+
+async def verify_user(db: AsyncSession, user_email: str):
+    row = (await db.execute(
+        update(Credential).where(email_is(user_email)).values(is_verified=True).returning(Credential.id)
+    )).first()
+    if not row:
+        await db.rollback()
+        raise LookupError(f"No user with email {user_email}")
+    await db.commit()
+    credential_cache.invalidate(row.id)
+
+async def update_user_password(db: AsyncSession, user_email: str, new_password: str):
+    row = (await db.execute(
+        update(Credential)
+        .where(email_is(user_email))
+        .values(hashed_password=new_password, token_epoch=Credential.token_epoch + 1)
+        .returning(Credential.id, Credential.token_epoch)
+    )).first()
+    if not row:
+        await db.rollback()
+        raise LookupError(f"No user with email {user_email}")
+    await db.commit()
+    credential_cache.invalidate(row.id)
+    token_epochs.bump(row.id, row.token_epoch)
+
+async def pin_can_change(db: AsyncSession, verification_pin: VerificationPin):
+    await db.execute(update(VerificationPin).where(VerificationPin.email == verification_pin.email).values(can_change=True))
+    await db.commit()
+    return verification_pin
+
+async def increase_incorrect_attempts(db: AsyncSession, user_email: str):
+    # incremented in SQL so concurrent attempts can't overwrite each other
+    row = (await db.execute(
+        update(VerificationPin)
+        .where(pin_email_is(user_email))
+        .values(incorrect_attempts=VerificationPin.incorrect_attempts + 1)
+        .returning(VerificationPin.email, VerificationPin.incorrect_attempts)
+    )).first()
+    if not row:
+        await db.rollback()
+        raise LookupError(f"No verification pin for {user_email}")
+    await db.commit()
+    return row
+
+async def block_user(db: AsyncSession, user_id: str):
+    row = (await db.execute(
+        update(Credential)
+        .where(Credential.id == user_id)
+        .values(is_blocked=True, token_epoch=Credential.token_epoch + 1)
+        .returning(Credential.id, Credential.token_epoch)
+    )).first()
+    await db.commit()
+    if row:
+        credential_cache.invalidate(row.id)
+        token_epochs.bump(row.id, row.token_epoch)
+    return row
+
+async def unblock_user(db: AsyncSession, user_id: str):
+    row = (await db.execute(
+        update(Credential).where(Credential.id == user_id).values(is_blocked=False).returning(Credential.id, Credential.token_epoch)
+    )).first()
+    await db.commit()
+    if row:
+        credential_cache.invalidate(row.id)
+    return row
+
+async def record_failed_login(db: AsyncSession, user_id, now: datetime, max_attempts: int, lock_time: timedelta):
+    row = (await db.execute(failed_login_update(user_id, now, max_attempts, lock_time))).first()
+    await db.commit()
+    if row and row.is_locked:
+        credential_cache.invalidate(row.id)
+        token_epochs.bump(row.id, row.token_epoch)
+    return row
+
+async def reset_login_attempts(db: AsyncSession, user: Credential):
+    if not user.failed_attempts and not user.is_locked and user.last_failed_login is None:
+        return False
+    await db.execute(reset_login_attempts_update(user.id))
+    await db.commit()
+    if user.is_locked:
+        credential_cache.invalidate(user.id)
+    return True
+
+async def get_users_status(db: AsyncSession, user_ids):
+    result = await db.execute(users_status_query(db.get_bind().dialect.name, user_ids))
+    return result.all()
+
+async def set_users_blocked(db: AsyncSession, user_ids, block: bool):
+    rows = (await db.execute(set_blocked_update(db.get_bind().dialect.name, user_ids, block))).all()
+    await db.commit()
+    after_set_blocked(rows, block)
+    return rows
+
+async def get_users_page(db: AsyncSession, after=None, limit=None):
+    result = await db.execute(users_page_query(after, limit))
+    return result.all()
+
+async def stream_users(db: AsyncSession, after=None, batch_size: int = 1000):
+    result = await db.stream(users_page_query(after).execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        for row in partition:
+            yield row
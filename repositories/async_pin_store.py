@@ -0,0 +1,55 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from repositories import async_auth_repository
+from repositories import pin_store as pin_store_module
+
+# Async counterparts of repositories.pin_store. Cache calls may block on a
+# socket (Redis backend), so they run in the threadpool.
+
+async def get_verification_pin(db: AsyncSession, user_email: str):
+    store = pin_store_module.pin_store
+    if store is None:
+        return await async_auth_repository.get_verification_pin(db, user_email)
+    return await run_in_threadpool(store.get, user_email)
+
+async def create_verification_pin(db: AsyncSession, user_email: str, pin: str, for_password_recovery: bool):
+    store = pin_store_module.pin_store
+    if store is None:
+        return await async_auth_repository.create_verification_pin(db, user_email, pin, for_password_recovery)
+    return await run_in_threadpool(store.save, user_email, pin, for_password_recovery)
+
+async def set_new_pin(db: AsyncSession, user_email: str, new_pin: str, for_password_recovery: bool):
+    store = pin_store_module.pin_store
+    if store is None:
+        return await async_auth_repository.set_new_pin(db, user_email, new_pin, for_password_recovery)
+    return await run_in_threadpool(store.save, user_email, new_pin, for_password_recovery)
+
+async def set_pin_invalid(db: AsyncSession, user_email: str):
+    store = pin_store_module.pin_store
+    if store is None:
+        return await async_auth_repository.set_pin_invalid(db, user_email)
+    await run_in_threadpool(store.invalidate, user_email)
+
+async def increase_incorrect_attempts(db: AsyncSession, user_email: str):
+    store = pin_store_module.pin_store
+    if store is None:
+        return await async_auth_repository.increase_incorrect_attempts(db, user_email)
+    return await run_in_threadpool(store.increment_attempts, user_email)
+
+async def pin_can_change(db: AsyncSession, verification_pin):
+    store = pin_store_module.pin_store
+    if store is None:
+        return await async_auth_repository.pin_can_change(db, verification_pin)
+    return await run_in_threadpool(store.allow_change, verification_pin)
+
+async def delete_verification_pin(db: AsyncSession, verification_pin):
+    store = pin_store_module.pin_store
+    if store is None:
+        return await async_auth_repository.delete_verification_pin(db, verification_pin)
+    await run_in_threadpool(store.delete, verification_pin.email)
+
+async def delete_pin_by_email(db: AsyncSession, user_email: str):
+    store = pin_store_module.pin_store
+    if store is None:
+        return await async_auth_repository.delete_pin_by_email(db, user_email)
+    await run_in_threadpool(store.delete, user_email)
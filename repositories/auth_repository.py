@@ -1,10 +1,25 @@
+from sqlalchemy import select, insert, update, delete, case, and_, or_, not_, any_, bindparam, func
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 from sqlalchemy.orm import Session
 from utils.security import hash_password
 from models.credential_models import Credential, VerificationPin
+from utils.credential_cache import credential_cache, CREDENTIAL_STATUS_COLUMNS
+from utils.token_epochs import token_epochs
 from datetime import datetime, timezone, timedelta
 
+def normalize_email(email: str) -> str:
+    return email.lower()
+
+def email_is(email: str):
+    # case-insensitive, served by the unique index on lower(email)
+    return func.lower(Credential.email) == normalize_email(email)
+
+def pin_email_is(email: str):
+    # PINs are stored under the normalized email, so any casing finds them
+    return VerificationPin.email == normalize_email(email)
+
 def get_user_by_email(db: Session, email: str):
-    return db.query(Credential).filter(Credential.email == email).first()
+    return db.query(Credential).filter(email_is(email)).first()
 
 def get_user_by_id(db: Session, user_id: str):
     return db.query(Credential).filter(Credential.id == user_id).first()
@@ -16,8 +31,26 @@ def create_user(db: Session, email: str, password: str):
     db.refresh(user)
     return user
 
+def get_existing_emails(db: Session, emails) -> set:
+    # lowercased, like the unique index compares them
+    lower_email = func.lower(Credential.email)
+    return set(db.execute(select(lower_email).where(lower_email.in_([email.lower() for email in emails]))).scalars())
+
+def insert_credentials(db: Session, rows):
+    # Bulk import: one multi-row INSERT per batch (insertmanyvalues), no ORM
+    # objects; the caller commits together with the batch's outbox events
+    if rows:
+        db.execute(insert(Credential), rows)
+
+def delete_user(db: Session, user_id):
+    # compensation for a registration whose downstream steps failed
+    db.rollback()
+    db.execute(delete(Credential).where(Credential.id == user_id))
+    db.commit()
+    credential_cache.invalidate(user_id)
+
 def create_verification_pin(db: Session, user_email: str, pin: str, for_password_recovery: bool):
-    verification_pin = VerificationPin(email=user_email, pin=pin, created_at=datetime.now(timezone.utc), is_valid=True,
+    verification_pin = VerificationPin(email=normalize_email(user_email), pin=pin, created_at=datetime.now(timezone.utc), is_valid=True,
                                        can_change=False, for_password_recovery=for_password_recovery)
     db.add(verification_pin)
     db.commit()
@@ -25,81 +58,215 @@ def create_verification_pin(db: Session, user_email: str, pin: str, for_password
     return verification_pin
 
 def get_verification_pin(db: Session, user_email: str):
-    return db.query(VerificationPin).filter(VerificationPin.email == user_email).first()
+    return db.query(VerificationPin).filter(pin_email_is(user_email)).first()
 
 
 def delete_verification_pin(db: Session, verification_pin: VerificationPin):
     db.delete(verification_pin)
     db.commit()
 
+def delete_pin_by_email(db: Session, user_email: str):
+    db.execute(delete(VerificationPin).where(pin_email_is(user_email)))
+    db.commit()
+
 def set_new_pin(db: Session, user_email: str, new_pin: str, for_password_recovery: bool):
-    pin_entry = db.query(VerificationPin).filter(VerificationPin.email == user_email).first()
+    pin_entry = db.execute(
+        update(VerificationPin)
+        .where(pin_email_is(user_email))
+        .values(pin=new_pin, created_at=datetime.now(timezone.utc), is_valid=True, can_change=False,
+                for_password_recovery=for_password_recovery, incorrect_attempts=0)
+        .returning(VerificationPin)
+    ).scalar_one_or_none()
     if not pin_entry:
-        raise
-    
-    pin_entry.pin = new_pin
-    pin_entry.created_at = datetime.now(timezone.utc)
-    pin_entry.is_valid = True
-    pin_entry.can_change = False
-    pin_entry.for_password_recovery = for_password_recovery
-    db.commit()
-    db.refresh(pin_entry)
+        db.rollback()
+        raise LookupError(f"No verification pin for {user_email}")
+    db.commit()
     return pin_entry
 
 def set_pin_invalid(db: Session, user_email: str):
-    pin_entry = db.query(VerificationPin).filter(VerificationPin.email == user_email).first()
-    if not pin_entry:
-        raise
-    
-    pin_entry.is_valid = False
+    row = db.execute(
+        update(VerificationPin).where(pin_email_is(user_email)).values(is_valid=False).returning(VerificationPin.email)
+    ).first()
+    if not row:
+        db.rollback()
+        raise LookupError(f"No verification pin for {user_email}")
     db.commit()
-    db.refresh(pin_entry)
 
 def verify_user(db: Session, user_email: str):
-    user = get_user_by_email(db, user_email)
-    if not user:
-        raise
-    
-    user.is_verified = True
+    row = db.execute(
+        update(Credential).where(email_is(user_email)).values(is_verified=True).returning(Credential.id)
+    ).first()
+    if not row:
+        db.rollback()
+        raise LookupError(f"No user with email {user_email}")
     db.commit()
-    db.refresh(user)
+    credential_cache.invalidate(row.id)
 
 def update_user_password(db: Session, user_email: str, new_password: str):
-    user = db.query(Credential).filter(Credential.email == user_email).first()
-    if not user:
-        raise
-    
-    user.hashed_password = new_password
+    row = db.execute(
+        update(Credential)
+        .where(email_is(user_email))
+        .values(hashed_password=new_password, token_epoch=Credential.token_epoch + 1)
+        .returning(Credential.id, Credential.token_epoch)
+    ).first()
+    if not row:
+        db.rollback()
+        raise LookupError(f"No user with email {user_email}")
     db.commit()
-    db.refresh(user)
+    credential_cache.invalidate(row.id)
+    token_epochs.bump(row.id, row.token_epoch)
 
 def pin_can_change(db: Session, verification_pin: VerificationPin):
-    verification_pin.can_change = True
+    db.execute(update(VerificationPin).where(VerificationPin.email == verification_pin.email).values(can_change=True))
     db.commit()
-    db.refresh(verification_pin)
     return verification_pin
 
 def increase_incorrect_attempts(db: Session, user_email: str):
-    pin_entry = db.query(VerificationPin).filter(VerificationPin.email == user_email).first()
-    if not pin_entry:
-        raise
-    
-    pin_entry.incorrect_attempts += 1
+    # incremented in SQL so concurrent attempts can't overwrite each other
+    row = db.execute(
+        update(VerificationPin)
+        .where(pin_email_is(user_email))
+        .values(incorrect_attempts=VerificationPin.incorrect_attempts + 1)
+        .returning(VerificationPin.email, VerificationPin.incorrect_attempts)
+    ).first()
+    if not row:
+        db.rollback()
+        raise LookupError(f"No verification pin for {user_email}")
     db.commit()
-    db.refresh(pin_entry)
-    return pin_entry
+    return row
 
-def block_user(db: Session, user: Credential):
-    user.is_blocked = True
+def block_user(db: Session, user_id: str):
+    row = db.execute(
+        update(Credential)
+        .where(Credential.id == user_id)
+        .values(is_blocked=True, token_epoch=Credential.token_epoch + 1)
+        .returning(Credential.id, Credential.token_epoch)
+    ).first()
     db.commit()
-    db.refresh(user)
-    return user
+    if row:
+        credential_cache.invalidate(row.id)
+        token_epochs.bump(row.id, row.token_epoch)
+    return row
 
-def unblock_user(db: Session, user: Credential):
-    user.is_blocked = False
+def unblock_user(db: Session, user_id: str):
+    row = db.execute(
+        update(Credential).where(Credential.id == user_id).values(is_blocked=False).returning(Credential.id, Credential.token_epoch)
+    ).first()
     db.commit()
-    db.refresh(user)
-    return user
+    if row:
+        credential_cache.invalidate(row.id)
+    return row
+
+def failed_login_update(user_id, now: datetime, max_attempts: int, lock_time: timedelta):
+    """
+    One conditional UPDATE for a wrong password: an expired lock is cleared,
+    the counter incremented and the account locked when it reaches
+    `max_attempts` (bumping token_epoch). Rows under an active lock are left
+    untouched, so concurrent attempts can neither be lost nor extend the lock.
+    `now` is naive UTC, like every timestamp in credentials.
+    """
+    previous_attempts = case((Credential.is_locked, 0), else_=Credential.failed_attempts)
+    locks = previous_attempts + 1 >= max_attempts
+    active_lock = and_(Credential.is_locked, Credential.lock_until > now)
+    return (
+        update(Credential)
+        .where(Credential.id == user_id, or_(not_(active_lock), Credential.lock_until.is_(None)))
+        .values(
+            failed_attempts=previous_attempts + 1,
+            last_failed_login=now,
+            is_locked=locks,
+            lock_until=case((locks, now + lock_time), else_=None),
+            token_epoch=Credential.token_epoch + case((locks, 1), else_=0),
+        )
+        .returning(Credential.id, Credential.failed_attempts, Credential.is_locked, Credential.lock_until, Credential.token_epoch)
+    )
+
+def reset_login_attempts_update(user_id):
+    return (
+        update(Credential)
+        .where(Credential.id == user_id)
+        .values(failed_attempts=0, last_failed_login=None, is_locked=False, lock_until=None)
+    )
+
+def count_locked_users(db: Session, now: datetime) -> int:
+    # is_locked matches the partial index predicate, so only locked rows are read
+    return db.execute(
+        select(func.count()).select_from(Credential).where(Credential.is_locked, Credential.lock_until > now)
+    ).scalar_one()
+
+def delete_expired_pins(db: Session, created_before: datetime) -> int:
+    # PIN_STORE=database only: the cache store expires PINs by itself
+    result = db.execute(delete(VerificationPin).where(VerificationPin.created_at < created_before))
+    db.commit()
+    return result.rowcount
+
+def record_failed_login(db: Session, user_id, now: datetime, max_attempts: int, lock_time: timedelta):
+    """Returns the updated counters, or None when the account was already locked."""
+    row = db.execute(failed_login_update(user_id, now, max_attempts, lock_time)).first()
+    db.commit()
+    if row and row.is_locked:
+        credential_cache.invalidate(row.id)
+        token_epochs.bump(row.id, row.token_epoch)
+    return row
+
+def reset_login_attempts(db: Session, user: Credential):
+    # the common successful login finds nothing to reset and writes nothing
+    if not user.failed_attempts and not user.is_locked and user.last_failed_login is None:
+        return False
+    db.execute(reset_login_attempts_update(user.id))
+    db.commit()
+    if user.is_locked:
+        credential_cache.invalidate(user.id)
+    return True
+
+def users_page_query(after=None, limit=None):
+    # only the listed columns (never hashed_password), ordered by the keyset
+    query = select(Credential.id, Credential.is_locked).order_by(Credential.id)
+    if after is not None:
+        query = query.where(Credential.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def credential_id_in(dialect_name: str, user_ids):
+    if dialect_name == "postgresql":
+        # one array parameter: the same statement (and cached plan) whatever the number of ids
+        return Credential.id == any_(bindparam("user_ids", list(user_ids), type_=ARRAY(UUID(as_uuid=True))))
+    return Credential.id.in_(user_ids)
+
+def users_status_query(dialect_name: str, user_ids):
+    return select(Credential.id, *CREDENTIAL_STATUS_COLUMNS).where(credential_id_in(dialect_name, user_ids))
+
+def set_blocked_update(dialect_name: str, user_ids, block: bool):
+    # blocking revokes issued tokens like block_user does; unblocking doesn't need to
+    values = {"is_blocked": True, "token_epoch": Credential.token_epoch + 1} if block else {"is_blocked": False}
+    return (
+        update(Credential)
+        .where(credential_id_in(dialect_name, user_ids))
+        .values(**values)
+        .returning(Credential.id, Credential.token_epoch)
+    )
+
+def after_set_blocked(rows, block: bool):
+    credential_cache.invalidate_many(row.id for row in rows)
+    if block:
+        token_epochs.merge((row.id, row.token_epoch) for row in rows)
+
+def set_users_blocked(db: Session, user_ids, block: bool):
+    """Blocks or unblocks every user in `user_ids` with one UPDATE; returns the rows that exist."""
+    rows = db.execute(set_blocked_update(db.get_bind().dialect.name, user_ids, block)).all()
+    db.commit()
+    after_set_blocked(rows, block)
+    return rows
+
+def get_users_status(db: Session, user_ids):
+    return db.execute(users_status_query(db.get_bind().dialect.name, user_ids)).all()
+
+def get_users_page(db: Session, after=None, limit=None):
+    return db.execute(users_page_query(after, limit)).all()
 
-def get_all_users(db: Session):
-    return db.query(Credential).all()
\ No newline at end of file
+def stream_users(db: Session, after=None, batch_size: int = 1000):
+    # yield_per: server-side cursor, at most batch_size rows in memory
+    result = db.execute(users_page_query(after).execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield from partition
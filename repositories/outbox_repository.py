@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+from typing import Iterable
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.orm import Session
+from models.outbox_models import OutboxEvent
+
+def enqueue_event(db, kind: str, payload: dict) -> OutboxEvent:
+    # No commit: the event is written by the caller's commit, together with
+    # the change that produced it. Works with Session and AsyncSession alike.
+    event = OutboxEvent(kind=kind, payload=payload)
+    db.add(event)
+    return event
+
+def enqueue_events(db: Session, events: Iterable):
+    # (kind, payload) pairs written with one multi-row INSERT; no commit either
+    rows = [{"kind": kind, "payload": payload} for kind, payload in events]
+    if rows:
+        db.execute(insert(OutboxEvent), rows)
+
+def claim_events(db: Session, now: datetime, limit: int, lease: timedelta):
+    # Takes due events and pushes their available_at past the lease in one
+    # statement; SKIP LOCKED lets several instances dispatch side by side.
+    # An event whose lease expires (dispatcher died) is delivered again.
+    due = (
+        select(OutboxEvent.id)
+        .where(OutboxEvent.status == "pending", OutboxEvent.available_at <= now)
+        .order_by(OutboxEvent.available_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(due.scalar_subquery()))
+        .values(available_at=now + lease, attempts=OutboxEvent.attempts + 1)
+        .returning(OutboxEvent.id, OutboxEvent.kind, OutboxEvent.payload, OutboxEvent.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return rows
+
+def mark_events_sent(db: Session, event_ids: Iterable, now: datetime):
+    event_ids = list(event_ids)
+    if not event_ids:
+        return
+    db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(event_ids))
+        .values(status="sent", sent_at=now, last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def mark_events_failed(db: Session, failures: Iterable):
+    # failures: (event_id, retry_at, error); retry_at None gives up on the event
+    for event_id, retry_at, error in failures:
+        values = {"last_error": error[:500]}
+        if retry_at is None:
+            values["status"] = "failed"
+        else:
+            values["available_at"] = retry_at
+        db.execute(update(OutboxEvent).where(OutboxEvent.id == event_id).values(**values)
+                   .execution_options(synchronize_session=False))
+    db.commit()
+
+def defer_events(db: Session, event_ids: Iterable, retry_at: datetime):
+    # Events that were never sent (bulkhead full, circuit open): the claim's
+    # attempt is given back, so they don't run out of attempts while waiting
+    event_ids = list(event_ids)
+    if not event_ids:
+        return
+    db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(event_ids))
+        .values(available_at=retry_at, attempts=OutboxEvent.attempts - 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def count_events_by_status(db: Session) -> dict:
+    rows = db.execute(select(OutboxEvent.status, func.count()).group_by(OutboxEvent.status)).all()
+    return {status: count for status, count in rows}
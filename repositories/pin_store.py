@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+from repositories import auth_repository
+from utils.cache import CACHE_URL, CacheBackend, cache
+
+PIN_EXPIRATION_SECONDS = 60
+# once a recovery PIN is verified the user has this long to set the new password
+PIN_CHANGE_WINDOW_SECONDS = int(os.getenv("PIN_CHANGE_WINDOW_SECONDS", 600))
+# "cache" keeps PINs in the cache backend with native expiry, "database" in verification_pins.
+# Defaults to the cache only when it is shared, otherwise replicas wouldn't see each other's PINs.
+PIN_STORE = os.getenv("PIN_STORE", "cache" if CACHE_URL.startswith(("redis://", "valkey://")) else "database")
+# how often the verification_pins table is cleared of expired PINs (PIN_STORE=database)
+PIN_SWEEP_SECONDS = float(os.getenv("PIN_SWEEP_SECONDS", 300))
+
+
+@dataclass
+class StoredPin:
+    # Same attributes as models.credential_models.VerificationPin, so services treat both alike
+    email: str
+    pin: str
+    created_at: datetime
+    expires_at: float
+    is_valid: bool = True
+    can_change: bool = False
+    for_password_recovery: bool = False
+    incorrect_attempts: int = 0
+
+
+class CachePinStore:
+    """
+    Verification PINs as expiring cache entries: the key disappears when the
+    PIN expires, so no row has to be written, updated or cleaned up. Incorrect
+    attempts and the invalid flag live in keys of their own, so incrementing
+    or invalidating is a single write that can't overwrite a PIN resent in
+    the meantime; all three keys are read with a single multi-get.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = PIN_EXPIRATION_SECONDS,
+                 change_window_seconds: float = PIN_CHANGE_WINDOW_SECONDS, clock: Callable[[], float] = time.time):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.change_window_seconds = change_window_seconds
+        self._clock = clock
+
+    @staticmethod
+    def _keys(user_email: str):
+        # normalized like the verification_pins rows, so any casing finds the PIN
+        user_email = auth_repository.normalize_email(user_email)
+        return f"auth:pin:{user_email}", f"auth:pin-attempts:{user_email}", f"auth:pin-invalid:{user_email}"
+
+    def _write(self, verification_pin: StoredPin):
+        remaining = verification_pin.expires_at - self._clock()
+        if remaining <= 0:
+            return
+        record = asdict(verification_pin)
+        record.pop("incorrect_attempts")
+        record.pop("is_valid")
+        record["created_at"] = verification_pin.created_at.isoformat()
+        self.backend.set(self._keys(verification_pin.email)[0], json.dumps(record), ttl=remaining)
+
+    def get(self, user_email: str) -> Optional[StoredPin]:
+        raw, attempts, invalid = self.backend.get_many(self._keys(user_email))
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        record["created_at"] = datetime.fromisoformat(record["created_at"])
+        return StoredPin(**record, is_valid=invalid is None, incorrect_attempts=int(attempts or 0))
+
+    def save(self, user_email: str, pin: str, for_password_recovery: bool) -> StoredPin:
+        verification_pin = StoredPin(email=auth_repository.normalize_email(user_email), pin=pin, created_at=datetime.now(timezone.utc),
+                                     expires_at=self._clock() + self.ttl_seconds, for_password_recovery=for_password_recovery)
+        self._write(verification_pin)
+        # after the write: a read in between sees the new PIN as invalid, never the old one as valid
+        self.backend.delete(*self._keys(user_email)[1:])
+        return verification_pin
+
+    def invalidate(self, user_email: str):
+        # Outlives any PIN it can apply to; a flag left on an expired PIN is
+        # harmless, the next save clears it
+        self.backend.set(self._keys(user_email)[2], "1", ttl=max(self.ttl_seconds, self.change_window_seconds))
+
+    def increment_attempts(self, user_email: str) -> StoredPin:
+        verification_pin = self.get(user_email)
+        if not verification_pin:
+            raise LookupError(f"No verification pin for {user_email}")
+        # the returned count is authoritative: concurrent wrong guesses each see a distinct value
+        verification_pin.incorrect_attempts = self.backend.incr(self._keys(user_email)[1], ttl=self.ttl_seconds)
+        return verification_pin
+
+    def allow_change(self, verification_pin: StoredPin) -> StoredPin:
+        verification_pin.can_change = True
+        verification_pin.expires_at = self._clock() + self.change_window_seconds
+        self._write(verification_pin)
+        return verification_pin
+
+    def delete(self, user_email: str):
+        self.backend.delete(*self._keys(user_email))
+
+
+pin_store = CachePinStore(cache) if PIN_STORE == "cache" else None
+
+# Same signatures as the repository functions they replace; with PIN_STORE=database
+# they fall back to the verification_pins table.
+
+def get_verification_pin(db: Session, user_email: str):
+    if pin_store is None:
+        return auth_repository.get_verification_pin(db, user_email)
+    return pin_store.get(user_email)
+
+def create_verification_pin(db: Session, user_email: str, pin: str, for_password_recovery: bool):
+    if pin_store is None:
+        return auth_repository.create_verification_pin(db, user_email, pin, for_password_recovery)
+    return pin_store.save(user_email, pin, for_password_recovery)
+
+def set_new_pin(db: Session, user_email: str, new_pin: str, for_password_recovery: bool):
+    if pin_store is None:
+        return auth_repository.set_new_pin(db, user_email, new_pin, for_password_recovery)
+    return pin_store.save(user_email, new_pin, for_password_recovery)
+
+def set_pin_invalid(db: Session, user_email: str):
+    if pin_store is None:
+        return auth_repository.set_pin_invalid(db, user_email)
+    pin_store.invalidate(user_email)
+
+def increase_incorrect_attempts(db: Session, user_email: str):
+    if pin_store is None:
+        return auth_repository.increase_incorrect_attempts(db, user_email)
+    return pin_store.increment_attempts(user_email)
+
+def pin_can_change(db: Session, verification_pin):
+    if pin_store is None:
+        return auth_repository.pin_can_change(db, verification_pin)
+    return pin_store.allow_change(verification_pin)
+
+def delete_verification_pin(db: Session, verification_pin):
+    if pin_store is None:
+        return auth_repository.delete_verification_pin(db, verification_pin)
+    pin_store.delete(verification_pin.email)
+
+def delete_pin_by_email(db: Session, user_email: str):
+    if pin_store is None:
+        return auth_repository.delete_pin_by_email(db, user_email)
+    pin_store.delete(user_email)
+
+
+class ExpiredPinSweeper:
+    """
+    Background thread that deletes expired rows from verification_pins every
+    `interval` seconds; only needed with PIN_STORE=database. A recovery PIN
+    stays usable for the change window after it is verified, so rows are kept
+    for the longer of both periods.
+    """
+
+    def __init__(self, max_age_seconds: float = max(PIN_EXPIRATION_SECONDS, PIN_CHANGE_WINDOW_SECONDS)):
+        self.max_age = timedelta(seconds=max_age_seconds)
+        self.deleted = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sweep(self, session_factory: Callable) -> int:
+        with session_factory() as db:
+            deleted = auth_repository.delete_expired_pins(db, datetime.now(timezone.utc) - self.max_age)
+        self.deleted += deleted
+        return deleted
+
+    def _sweep_loop(self, session_factory: Callable, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.sweep(session_factory)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error sweeping expired pins: {e}")
+
+    def start(self, session_factory: Callable, interval: float = PIN_SWEEP_SECONDS):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sweep_loop, args=(session_factory, interval), name="pin-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+pin_sweeper = ExpiredPinSweeper()
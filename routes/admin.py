@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from dbConfig.session import pool_stats, query_stats, get_db
+from dbConfig.async_session import async_pool_stats, async_query_stats
+from utils.credential_cache import credential_cache
+from utils.token_epochs import token_epochs
+from utils.google_tokens import google_tokens
+from utils.startup import startup_timer
+from externals.http_client import DOWNSTREAMS
+from repositories.outbox_repository import count_events_by_status
+from repositories.auth_repository import count_locked_users
+from services.outbox_dispatcher import outbox_dispatcher
+from utils.security import require_admin_key
+
+# internals of the service: only for operators and jobs holding ADMIN_API_KEY
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_key)])
+
+
+@router.get("/db-pool")
+def get_db_pool_stats():
+    return {
+        "sync": pool_stats.snapshot(),
+        "async": async_pool_stats.snapshot(),
+    }
+
+
+@router.get("/db-queries")
+def get_db_query_stats():
+    return {
+        "sync": query_stats.snapshot(),
+        "async": async_query_stats.snapshot(),
+    }
+
+
+@router.get("/credential-cache")
+def get_credential_cache_stats():
+    return credential_cache.stats()
+
+
+@router.get("/token-epochs")
+def get_token_epoch_stats():
+    return token_epochs.stats()
+
+
+@router.get("/startup")
+def get_startup_stats():
+    return startup_timer.stats()
+
+
+@router.get("/google-tokens")
+def get_google_token_cache_stats():
+    return google_tokens.stats()
+
+
+@router.get("/downstreams")
+def get_downstream_stats():
+    return {name: client.stats() for name, client in DOWNSTREAMS.items()}
+
+
+@router.get("/outbox")
+def get_outbox_stats(db: Session = Depends(get_db)):
+    return {**outbox_dispatcher.stats(), "events": count_events_by_status(db)}
+
+
+@router.get("/locked-users")
+def get_locked_users(db: Session = Depends(get_db)):
+    return {"locked": count_locked_users(db, datetime.now(timezone.utc).replace(tzinfo=None))}
+
@@ -0,0 +1,271 @@
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas.auth_schemas import UserRegister, UserLogin, TokenResponse, BlockUserRequest, ChangeRoleRequest, UserStatusBatchRequest, UserStatusBatchResponse
+from schemas.auth_schemas import BlockUsersRequest, ChangeUsersRoleRequest, BatchResult
+from schemas.auth_schemas import PinRequest, NotificationRequest, ResendRequest, RecoveryRequest, ChangePasswordRequest, PinPasswordRequest
+from dbConfig.async_session import get_async_db, AsyncSessionLocal
+from models.credential_models import Credential
+from utils.security import create_access_token, get_current_user_async
+from utils.password_hasher import hash_password_async, verify_password_async
+from externals.http_client import users_client
+from repositories.async_auth_repository import get_user_by_email, get_user_by_id, record_failed_login, reset_login_attempts
+from services.outbox_dispatcher import SIDE_EFFECTS_MODE
+from services.auth_services import create_pin, profile_payload, run_registration_side_effects
+from services.async_auth_services import store_pin, undo_registration, register_with_outbox, verify_pin, notify_user, send_recovery_link, change_password, verify_recovery_user_pin, block_user_service, change_user_role_service, get_user_info, stream_user_info, get_users_status_service
+from services.async_auth_services import block_users_service, split_existing_users
+from services.auth_services import change_roles_in_profiles, batch_result
+from routes.auth import USERS_SERVICE_URL, MAX_FAILED_ATTEMPTS, LOCK_TIME, CHANNEL, USERS_PAGE_MAX_LIMIT, verify_google_token, utc_now, is_lock_active, raise_locked
+
+# Same API as routes.auth, served with async def handlers over an AsyncSession (DB_MODE=async)
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+
+@router.post("/register", response_model=TokenResponse)
+async def register(data: UserRegister, db: AsyncSession = Depends(get_async_db)):
+    if await get_user_by_email(db, data.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    if SIDE_EFFECTS_MODE == "outbox":
+        user = await register_with_outbox(db, data, await hash_password_async(data.password), CHANNEL)
+        token = create_access_token({"user_id": str(user.id), "email": user.email})
+        return {"access_token": token}
+
+    user_id = uuid.uuid4()
+    user = Credential(id=user_id, email=data.email, hashed_password=await hash_password_async(data.password))
+    db.add(user)
+    await db.commit()
+
+    pin = create_pin()
+    await store_pin(db, data.email, pin, False)
+    try:
+        await run_registration_side_effects(data.phone, pin, CHANNEL, profile_payload(user_id, data))
+    except Exception as e:
+        # compensate: without its profile or PIN the account can't be used
+        print(f"Registration of {data.email} failed, removing credential {user_id}: {e}")
+        await undo_registration(db, user_id, data.email)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+    token = create_access_token({"user_id": str(user_id), "email": data.email})
+    return {"access_token": token}
+
+@router.post("/login", response_model=TokenResponse)
+async def login(data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_by_email(db, data.email)
+    now = utc_now()
+
+    if not user:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid Email"
+        )
+
+    if not user.is_verified:
+        raise HTTPException(
+            status_code=401,
+            detail="User not verified"
+        )
+
+    if user.is_blocked:
+        raise HTTPException(
+            status_code=403,
+            detail="Your account is blocked."
+        )
+
+    if is_lock_active(user, now):
+        raise_locked(user.lock_until)
+
+    if not await verify_password_async(data.password, user.hashed_password):
+        if await record_failed_login(db, user.id, now, MAX_FAILED_ATTEMPTS, LOCK_TIME) is None:
+            # another request locked the account meanwhile; expire_on_commit=False
+            # keeps the stale row in the identity map, so reload it explicitly
+            await db.refresh(user)
+            raise_locked(user.lock_until)
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid password"
+        )
+
+    await reset_login_attempts(db, user)
+
+    token = create_access_token({"user_id": str(user.id), "user_email": user.email}, token_epoch=user.token_epoch)
+    return {"access_token": token}
+
+
+@router.post("/check-google-user")
+async def check_google_user(data: dict, db: AsyncSession = Depends(get_async_db)):
+    google_token = data.get("google_token")
+    if not google_token:
+        raise HTTPException(status_code=400, detail="Google token is required")
+
+    google_info = await run_in_threadpool(verify_google_token, google_token)
+    email = google_info.get("email")
+
+    user = await get_user_by_email(db, email)
+    if user:
+        token = create_access_token({"user_id": str(user.id), "user_email": user.email}, token_epoch=user.token_epoch)
+        return {"access_token": token}
+    else:
+        raise HTTPException(status_code=404, detail="User not found")
+
+@router.post("/google", response_model=TokenResponse)
+async def login_with_google(data: dict, db: AsyncSession = Depends(get_async_db)):
+    google_token = data.get("google_token")
+    role = data.get("role")
+
+    if not google_token:
+        raise HTTPException(status_code=400, detail="Google token is required")
+    if not role or role not in ["teacher", "student"]:
+        raise HTTPException(status_code=400, detail="Valid role is required")
+
+    google_info = await run_in_threadpool(verify_google_token, google_token)
+
+    email = google_info.get("email")
+    name = google_info.get("name")
+    picture = google_info.get("picture")
+
+    if not all([email, name]):
+        raise HTTPException(status_code=400, detail="Incomplete Google data")
+
+    name_parts = name.split(" ")
+    first_name = name_parts[0]
+    last_name = " ".join(name_parts[1:])
+
+    user = await get_user_by_email(db, email)
+    if not user:
+        try:
+            user_id = uuid.uuid4()
+            user = Credential(id=user_id, email=email, hashed_password=None, is_verified=True)
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+
+            profile_data = {
+                "id": str(user_id),
+                "email": email,
+                "name": first_name,
+                "last_name": last_name,
+                "role": role,
+                "phone": None,
+                "photo_url": picture
+            }
+            response = await users_client.arequest("POST", f"{USERS_SERVICE_URL}/users/google_profile", json=profile_data)
+            response.raise_for_status()
+
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
+
+    token = create_access_token({"user_id": str(user.id), "user_email": user.email}, token_epoch=user.token_epoch)
+    return {"access_token": token}
+
+@router.get("/protected")
+async def protected_route(current_user=Depends(get_current_user_async)):
+    if current_user["is_locked"]:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Cuenta bloqueada. Intenta nuevamente más tarde.",
+        )
+    return {"message": f"Hola {current_user['email']}, estás autenticado."}
+
+@router.post("/verification")
+async def verify_user(request: PinRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_by_id(db, request.userId)
+    await verify_pin(db, user.email, request.pin)
+    return {"message": "User verified successfully"}
+
+@router.post("/notification")
+async def notification_user(request: NotificationRequest, db: AsyncSession = Depends(get_async_db)):
+    await notify_user(db, request.email, request.to, request.channel)
+    return {"message": "Notification sent successfully"}
+
+@router.post("/verification/resend")
+async def resend_pin(request: ResendRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_by_id(db, request.userId)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if user.is_verified:
+        raise HTTPException(status_code=400, detail="User already verified")
+    await notify_user(db, user.email, request.phone, CHANNEL)
+    return {"message": "Verification code resent successfully"}
+
+@router.post("/recovery-password")
+async def recovery_password(request: RecoveryRequest, db: AsyncSession = Depends(get_async_db)):
+    await send_recovery_link(db, request.userEmail)
+    return {"message": "Password recovery link sent successfully"}
+
+@router.post("/recovery-password/verify-pin")
+async def verify_recovery_pin(request: PinPasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    await verify_recovery_user_pin(db, request.userEmail, request.pin)
+    return {"message": "Pin verified successfully"}
+
+@router.patch("/recovery-password/change-password")
+async def change_user_password(request: ChangePasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    await change_password(db, request.userEmail, request.new_password)
+    return {"message": "Password changed successfully"}
+
+@router.put("/set-password")
+async def set_password(request: ChangePasswordRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_by_email(db, request.userEmail)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if user.hashed_password:
+        raise HTTPException(status_code=400, detail="Password already set")
+
+    user.hashed_password = await hash_password_async(request.new_password)
+    await db.commit()
+
+    return {"message": "Password set successfully"}
+
+@router.patch("/block/{user_id}")
+async def block_user(user_id: str, request: BlockUserRequest, db: AsyncSession = Depends(get_async_db)):
+    await block_user_service(db, user_id, request.block)
+    return {"message": f"User {user_id} {'blocked' if request.block else 'unblocked'} successfully"}
+
+@router.patch("/rol/{user_id}")
+async def change_user_role(user_id: str, request: ChangeRoleRequest, db: AsyncSession = Depends(get_async_db)):
+    await change_user_role_service(db, user_id, request.role)
+    return {"message": f"User {user_id} role changed to {request.role} successfully"}
+
+@router.patch("/block:batch", response_model=BatchResult)
+async def block_users(request: BlockUsersRequest, db: AsyncSession = Depends(get_async_db)):
+    return await block_users_service(db, request.user_ids, request.block)
+
+@router.patch("/rol:batch", response_model=BatchResult)
+async def change_users_role(request: ChangeUsersRoleRequest, db: AsyncSession = Depends(get_async_db)):
+    user_ids, missing = await split_existing_users(db, request.user_ids)
+    changed = await change_roles_in_profiles(user_ids, request.role.value)
+    return batch_result(request.user_ids, changed + missing)
+
+@router.get("", status_code=200)
+async def get_users(response: Response, after: Optional[uuid.UUID] = None, limit: Optional[int] = Query(None, ge=1, le=USERS_PAGE_MAX_LIMIT),
+                    output: str = Query("json", alias="format", pattern="^(json|ndjson)$"), db: AsyncSession = Depends(get_async_db)):
+    if output == "ndjson":
+        return StreamingResponse(stream_user_info(AsyncSessionLocal, after), media_type="application/x-ndjson")
+    users = await get_user_info(db, after, limit)
+    if limit is not None and len(users) == limit:
+        response.headers["X-Next-Cursor"] = str(users[-1].id)
+    return users
+
+@router.post("/users/status:batch", response_model=UserStatusBatchResponse)
+async def get_users_status_batch(request: UserStatusBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    return await get_users_status_service(db, request.user_ids)
+
+
+@router.get("/has-password/{user_email}")
+async def check_password(user_email: str, db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_by_email(db, user_email)
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    has_password = bool(user.hashed_password and user.hashed_password.strip() != "")
+
+    return {"has_password": has_password}
@@ -3,22 +3,29 @@ from dotenv import load_dotenv
 from fastapi.responses import JSONResponse
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta, timezone
-import pytz
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, requests, status, Query
+from fastapi import APIRouter, Depends, HTTPException, requests, status, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from sqlalchemy.orm import Session
-from schemas.auth_schemas import UserRegister, UserLogin, TokenResponse, BlockUserRequest, ChangeRoleRequest
+from schemas.auth_schemas import UserRegister, UserLogin, TokenResponse, BlockUserRequest, ChangeRoleRequest, UserStatusBatchRequest, UserStatusBatchResponse
+from schemas.auth_schemas import BlockUsersRequest, ChangeUsersRoleRequest, BatchResult
 from schemas.auth_schemas import PinRequest, NotificationRequest, ResendRequest, RecoveryRequest, ChangePasswordRequest, PinPasswordRequest
 from dbConfig.session import get_db
 from models.credential_models import Credential
 from utils.security import decode_token
-from utils.security import hash_password, verify_password, create_access_token, get_current_user
+from utils.security import create_access_token, get_current_user
+from utils.password_hasher import hash_password, verify_password
+from externals.http_client import users_client
 from fastapi.security import OAuth2PasswordBearer
-from services.auth_services import verify_pin, notify_user, send_recovery_link, change_password, verify_recovery_user_pin, block_user_service, change_user_role_service, get_user_info
-from dbConfig.session import get_db
-import httpx
-import firebase_admin
-from firebase_admin import credentials, auth
+from repositories.auth_repository import get_user_by_email, record_failed_login, reset_login_attempts, email_is
+from services.outbox_dispatcher import SIDE_EFFECTS_MODE
+from services.auth_services import create_pin, store_pin, profile_payload, run_registration_side_effects, undo_registration
+from services.auth_services import register_with_outbox, verify_pin, notify_user, send_recovery_link, change_password, verify_recovery_user_pin, block_user_service, change_user_role_service, get_user_info, stream_user_info, get_users_status_service
+from services.auth_services import block_users_service, split_existing_users, change_roles_in_profiles, batch_result
+from dbConfig.session import get_db, SessionLocal
+import anyio
+from utils.google_tokens import google_tokens, InvalidGoogleTokenError
 from dotenv import load_dotenv
 import os
 
@@ -27,56 +34,48 @@ USERS_SERVICE_URL = os.getenv("URL_USERS", "http://localhost:8001")
 
 MAX_FAILED_ATTEMPTS = 3
 LOCK_TIME = timedelta(minutes=0.3)
+# Argentina has no DST, a fixed offset is enough to show lock times
+ARGENTINA_TZ = timezone(timedelta(hours=-3), "ART")
 CHANNEL = "sms"
+USERS_PAGE_MAX_LIMIT = 1000
 
-cred = credentials.Certificate("firebaseKeys.json")
-firebase_admin.initialize_app(cred)
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=TokenResponse)
 def register(data: UserRegister, db: Session = Depends(get_db)):
-    if db.query(Credential).filter(Credential.email == data.email).first():
+    if db.query(Credential).filter(email_is(data.email)).first():
         raise HTTPException(status_code=400, detail="Email already registered")
 
+    if SIDE_EFFECTS_MODE == "outbox":
+        user = register_with_outbox(db, data, hash_password(data.password), CHANNEL)
+        token = create_access_token({"user_id": str(user.id), "email": user.email})
+        return {"access_token": token}
+
+    user_id = uuid.uuid4()
+    user = Credential(id=user_id, email=data.email, hashed_password=hash_password(data.password))
+    db.add(user)
+    db.commit()
+
+    pin = create_pin()
+    store_pin(db, data.email, pin, False)
     try:
-        user_id = uuid.uuid4()
-        user = Credential(id=user_id, email=data.email, hashed_password=hash_password(data.password))
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-   
-        profile_data = {
-            "id": str(user_id),
-            "email": data.email,
-            "name": data.name,
-            "last_name": data.last_name,
-            "role": data.role,
-            "phone": data.phone,
-        }
-
-        if not notify_user(db, data.email, data.phone, CHANNEL):
-            raise HTTPException(status_code=500, detail="Error sending notification")
-
-        response = httpx.post(f"{USERS_SERVICE_URL}/users/profile", json=profile_data)
-        response.raise_for_status()
-
-    except httpx.HTTPStatusError as e:
-        print(f"Error creating profile: {e}")
-        db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error creating profile: {str(e)}")
+        # sync handlers run in the threadpool; the concurrent calls run on the event loop
+        anyio.from_thread.run(run_registration_side_effects, data.phone, pin, CHANNEL, profile_payload(user_id, data))
     except Exception as e:
-        print(f"Unexpected error: {e}")
-        db.rollback()
+        # compensate: without its profile or PIN the account can't be used
+        print(f"Registration of {data.email} failed, removing credential {user_id}: {e}")
+        undo_registration(db, user_id, data.email)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
-    token = create_access_token({"user_id": str(user.id), "email": user.email})
+    token = create_access_token({"user_id": str(user_id), "email": data.email})
     return {"access_token": token}
 
 @router.post("/login", response_model=TokenResponse)
 def login(data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(Credential).filter(Credential.email == data.email).first()
-    buenos_aires_tz = pytz.timezone('America/Argentina/Buenos_Aires')
-    now = datetime.now(buenos_aires_tz)
+    user = get_user_by_email(db, data.email)
+    now = utc_now()
 
     if not user:
         raise HTTPException(
@@ -90,66 +89,48 @@ def login(data: UserLogin, db: Session = Depends(get_db)):
             detail="User not verified"
         )
 
-    if user.lock_until and user.lock_until.tzinfo is None:
-        user.lock_until = buenos_aires_tz.localize(user.lock_until)
-   
-    if user.is_locked and user.lock_until and now > user.lock_until:
-        user.is_locked = False
-        user.failed_attempts = 0
-        user.lock_until = None
-        db.commit()
-
     if user.is_blocked:
         raise HTTPException(
             status_code=403,
-            detail=f"Your account is blocked."
+            detail="Your account is blocked."
         )
 
-    if user.failed_attempts >= MAX_FAILED_ATTEMPTS:
-        user.is_locked = True
-        user.lock_until = now + LOCK_TIME
-        db.commit()
-        db.refresh(user)
-
-        lock_until_arg = user.lock_until.strftime('%Y-%m-%d %H:%M:%S')
-
-        raise HTTPException(
-            status_code=401,
-            detail=f"Too many failed attempts. Your account has been locked until {lock_until_arg} (Argentina Time)."
-        )
+    if is_lock_active(user, now):
+        raise_locked(user.lock_until)
 
     if not verify_password(data.password, user.hashed_password):
-        user.failed_attempts += 1
-        user.last_failed_login = now
-
-        if user.failed_attempts >= MAX_FAILED_ATTEMPTS:
-            user.is_locked = True
-            user.lock_until = now + LOCK_TIME
-
-        db.commit()
-        db.refresh(user)
+        if record_failed_login(db, user.id, now, MAX_FAILED_ATTEMPTS, LOCK_TIME) is None:
+            # another request locked the account meanwhile
+            raise_locked(get_user_by_email(db, data.email).lock_until)
         raise HTTPException(
             status_code=401,
             detail="Invalid password"
         )
-   
-    user.failed_attempts = 0
-    user.last_failed_login = None
-    user.is_locked = False
-    user.lock_until = None
-    db.commit()
 
-    token = create_access_token({"user_id": str(user.id), "user_email": user.email})
+    reset_login_attempts(db, user)
+
+    token = create_access_token({"user_id": str(user.id), "user_email": user.email}, token_epoch=user.token_epoch)
     return {"access_token": token}
 
+def utc_now() -> datetime:
+    # credentials stores naive UTC timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def is_lock_active(user, now: datetime) -> bool:
+    return bool(user.is_locked and user.lock_until and user.lock_until > now)
+
+def raise_locked(lock_until: datetime):
+    lock_until_arg = lock_until.replace(tzinfo=timezone.utc).astimezone(ARGENTINA_TZ).strftime('%Y-%m-%d %H:%M:%S')
+    raise HTTPException(
+        status_code=401,
+        detail=f"Too many failed attempts. Your account has been locked until {lock_until_arg} (Argentina Time)."
+    )
+
 def verify_google_token(google_token: str) -> dict:
     try:
-        # Verifica el ID Token de Firebase
-        decoded_token = auth.verify_id_token(google_token)
-        # Imprime el token para ver qué datos trae
-        print("Token decodificado:", decoded_token)
-        return decoded_token
-    except auth.InvalidIdTokenError:
+        # Verifica el ID Token de Firebase (cacheado hasta su exp)
+        return google_tokens.verify(google_token)
+    except InvalidGoogleTokenError:
         raise HTTPException(status_code=401, detail="Invalid Google token")
     except Exception as e:
         raise HTTPException(
@@ -167,10 +148,10 @@ def check_google_user(data: dict, db: Session = Depends(get_db)):
     email = google_info.get("email")
     
     # Verificar si el usuario ya existe
-    user = db.query(Credential).filter(Credential.email == email).first()
+    user = db.query(Credential).filter(email_is(email)).first()
     if user:
         # Usuario existe, devolver token
-        token = create_access_token({"user_id": str(user.id), "user_email": user.email})
+        token = create_access_token({"user_id": str(user.id), "user_email": user.email}, token_epoch=user.token_epoch)
         return {"access_token": token}
     else:
         # Usuario no existe
@@ -199,7 +180,7 @@ def login_with_google(data: dict, db: Session = Depends(get_db)):
     first_name = name_parts[0]
     last_name = " ".join(name_parts[1:])
     
-    user = db.query(Credential).filter(Credential.email == email).first()
+    user = db.query(Credential).filter(email_is(email)).first()
     if not user:
         try:
             # Si el usuario no existe, lo creamos con el rol seleccionado
@@ -219,7 +200,7 @@ def login_with_google(data: dict, db: Session = Depends(get_db)):
                 "phone": None,
                 "photo_url": picture            
             }
-            response = httpx.post(f"{USERS_SERVICE_URL}/users/google_profile", json=profile_data)
+            response = users_client.request("POST", f"{USERS_SERVICE_URL}/users/google_profile", json=profile_data)
             response.raise_for_status()
             
         except Exception as e:
@@ -227,7 +208,7 @@ def login_with_google(data: dict, db: Session = Depends(get_db)):
             raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
     
     # Generar token
-    token = create_access_token({"user_id": str(user.id), "user_email": user.email})
+    token = create_access_token({"user_id": str(user.id), "user_email": user.email}, token_epoch=user.token_epoch)
     return {"access_token": token}
 
 @router.get("/protected")
@@ -279,7 +260,7 @@ def change_user_password(request: ChangePasswordRequest, db: Session = Depends(g
 
 @router.put("/set-password")
 def set_password(request: ChangePasswordRequest, db: Session = Depends(get_db)):
-    user = db.query(Credential).filter(Credential.email == request.userEmail).first()
+    user = db.query(Credential).filter(email_is(request.userEmail)).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -302,14 +283,39 @@ def change_user_role(user_id: str, request: ChangeRoleRequest, db: Session = Dep
     change_user_role_service(db, user_id, request.role)
     return {"message": f"User {user_id} role changed to {request.role} successfully"}
 
+@router.patch("/block:batch", response_model=BatchResult)
+def block_users(request: BlockUsersRequest, db: Session = Depends(get_db)):
+    # one UPDATE for the whole list; ids that don't exist are reported as not_found
+    return block_users_service(db, request.user_ids, request.block)
+
+@router.patch("/rol:batch", response_model=BatchResult)
+def change_users_role(request: ChangeUsersRoleRequest, db: Session = Depends(get_db)):
+    user_ids, missing = split_existing_users(db, request.user_ids)
+    # sync handlers run in the threadpool; the users service calls run concurrently on the event loop
+    changed = anyio.from_thread.run(change_roles_in_profiles, user_ids, request.role.value)
+    return batch_result(request.user_ids, changed + missing)
+
 @router.get("", status_code=200)
-def get_users(db: Session = Depends(get_db)):
-    return get_user_info(db)    
+def get_users(response: Response, after: Optional[uuid.UUID] = None, limit: Optional[int] = Query(None, ge=1, le=USERS_PAGE_MAX_LIMIT),
+              output: str = Query("json", alias="format", pattern="^(json|ndjson)$"), db: Session = Depends(get_db)):
+    # Keyset pagination on id: pass the X-Next-Cursor of a page as `after`.
+    # Without limit the whole listing comes back, as before
+    if output == "ndjson":
+        return StreamingResponse(stream_user_info(SessionLocal, after), media_type="application/x-ndjson")
+    users = get_user_info(db, after, limit)
+    if limit is not None and len(users) == limit:
+        response.headers["X-Next-Cursor"] = str(users[-1].id)
+    return users
+
+@router.post("/users/status:batch", response_model=UserStatusBatchResponse)
+def get_users_status_batch(request: UserStatusBatchRequest, db: Session = Depends(get_db)):
+    # lock/block/verified state of up to MAX_BATCH_SIZE users in one round trip
+    return get_users_status_service(db, request.user_ids)
 
  
 @router.get("/has-password/{user_email}")
 def check_password(user_email: str, db: Session = Depends(get_db)):
-    user = db.query(Credential).filter(Credential.email == user_email).first()
+    user = db.query(Credential).filter(email_is(user_email)).first()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr
+from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field
 from enum import Enum
 from datetime import datetime
 from uuid import UUID
@@ -70,4 +71,37 @@ class ChangeRoleRequest(BaseModel):
 
 class UserBasicInfo(BaseModel):
     id: UUID
-    is_locked: bool
\ No newline at end of file
+    is_locked: bool
+
+MAX_BATCH_SIZE = 1000
+
+class UserStatusBatchRequest(BaseModel):
+    user_ids: List[UUID] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class UserStatus(BaseModel):
+    id: UUID
+    is_locked: bool
+    is_blocked: bool
+    is_verified: bool
+
+class UserStatusBatchResponse(BaseModel):
+    users: List[UserStatus]
+    not_found: List[UUID]
+
+class BlockUsersRequest(BaseModel):
+    user_ids: List[UUID] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    block: bool
+
+class ChangeUsersRoleRequest(BaseModel):
+    user_ids: List[UUID] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    role: UserRole
+
+class BatchItemResult(BaseModel):
+    id: UUID
+    status: str  # blocked, unblocked, updated, not_found, failed
+    detail: Optional[str] = None
+
+class BatchResult(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
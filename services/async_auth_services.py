@@ -0,0 +1,250 @@
+import uuid
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from schemas.auth_schemas import UserRegister, UserLogin, TokenResponse, UserBasicInfo, BatchItemResult, BatchResult
+from repositories.async_auth_repository import get_user_by_email, create_user, delete_user, verify_user, update_user_password, get_user_by_id, block_user, unblock_user, get_users_page, stream_users, get_users_status, set_users_blocked
+from repositories.async_pin_store import get_verification_pin, delete_verification_pin, set_pin_invalid, create_verification_pin, set_new_pin, pin_can_change, increase_incorrect_attempts, delete_pin_by_email
+from utils.security import create_access_token
+from utils.password_hasher import hash_password_async, verify_password_async
+from datetime import datetime, timedelta, timezone
+from externals.notify_service import send_notification_async, send_email_recovery_async, create_notification_preferences_async
+from externals.user_service import get_user_data_async, update_user_data_async
+from models.credential_models import Credential
+from repositories.outbox_repository import enqueue_event
+from services.outbox_dispatcher import SIDE_EFFECTS_MODE, SEND_VERIFICATION_PIN, CREATE_PROFILE, CREATE_NOTIFICATION_PREFERENCES, outbox_dispatcher
+from services.auth_services import PIN_EXPIRATION_SECONDS, MAX_INCORRECT_ATTEMPTS, POSSIBLE_ROLES, USERS_STREAM_BATCH_SIZE
+from services.auth_services import assert_user_not_verified, assert_pin_is_valid, assert_pin_can_change, create_pin, profile_payload, user_info_line
+from services.auth_services import cached_user_statuses, users_status_response, role_profile_update, not_found_result, batch_result
+from utils.credential_cache import credential_cache, status_from_row
+
+# Async counterparts of services.auth_services for DB_MODE=async. Checks that
+# don't touch the database are shared with the sync module.
+
+async def register_user(data: UserRegister, db: AsyncSession) -> TokenResponse:
+    if await get_user_by_email(db, data.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    user = await create_user(db, data.email, data.password)
+    token = create_access_token({"user_email": user.email, "user_id": str(user.id)})
+    return TokenResponse(access_token=token)
+
+async def login_user(data: UserLogin, db: AsyncSession) -> TokenResponse:
+    user = await get_user_by_email(db, data.email)
+    if not user or not await verify_password_async(data.password, user.hashed_password):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    assert_user_not_verified(user)
+
+    token = create_access_token({"user_email": user.email, "user_id": str(user.id)}, token_epoch=user.token_epoch)
+    return TokenResponse(access_token=token)
+
+
+async def verify_pin(db: AsyncSession, user_email: str, pin: str):
+    await assert_user_already_verified(db, user_email)
+
+    verification_pin = await get_verification_pin(db, user_email)
+    if not verification_pin:
+        raise HTTPException(status_code=404, detail="Verification pin not found")
+
+    await assert_pin_is_correct(db, user_email, pin, verification_pin)
+    await assert_pin_not_expired(db, user_email, verification_pin)
+    assert_pin_is_valid(verification_pin)
+    await assert_pin_not_for_recovery(db, user_email, verification_pin)
+
+    await delete_verification_pin(db, verification_pin)
+    if SIDE_EFFECTS_MODE == "outbox":
+        user = await get_user_by_email(db, user_email)
+        # committed by make_user_verified, in the same transaction
+        enqueue_event(db, CREATE_NOTIFICATION_PREFERENCES, {"user_id": str(user.id), "email": user_email})
+        await make_user_verified(db, user_email)
+        outbox_dispatcher.wake()
+        return True
+
+    await make_user_verified(db, user_email)
+    user = await get_user_by_email(db, user_email)
+    await create_notification_preferences_async(str(user.id), user_email)
+    return True
+
+
+async def notify_user(db: AsyncSession, user_email: str, to: str, channel: str):
+    user = await get_user_by_email(db, user_email)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if SIDE_EFFECTS_MODE == "outbox":
+        await queue_verification_pin(db, user_email, to, channel)
+        await db.commit()
+        outbox_dispatcher.wake()
+        return True
+
+    pin = create_pin()
+    result = await send_notification_async(to, pin, channel)
+    if result:
+        await store_pin(db, user_email, pin, False)
+    return result
+
+async def queue_verification_pin(db: AsyncSession, user_email: str, to: str, channel: str):
+    enqueue_event(db, SEND_VERIFICATION_PIN, {"email": user_email, "to": to, "channel": channel})
+
+async def store_pin(db: AsyncSession, user_email: str, pin: str, for_password_recovery: bool):
+    if await get_verification_pin(db, user_email):
+        await set_new_pin(db, user_email, pin, for_password_recovery)
+    else:
+        await create_verification_pin(db, user_email, pin, for_password_recovery)
+
+async def undo_registration(db: AsyncSession, user_id, user_email: str):
+    await delete_user(db, user_id)
+    await delete_pin_by_email(db, user_email)
+
+async def register_with_outbox(db: AsyncSession, data: UserRegister, hashed_password: str, channel: str) -> Credential:
+    user = Credential(id=uuid.uuid4(), email=data.email, hashed_password=hashed_password)
+    await queue_verification_pin(db, data.email, data.phone, channel)
+    db.add(user)
+    enqueue_event(db, CREATE_PROFILE, profile_payload(user.id, data))
+    await db.commit()
+    outbox_dispatcher.wake()
+    return user
+
+async def send_recovery_link(db: AsyncSession, user_email: str):
+    user = await get_user_by_email(db, user_email)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    pin = create_pin()
+    result = await send_email_recovery_async(user_email, pin)
+    if result:
+        await store_pin(db, user_email, pin, True)
+    return user.id, user.email
+
+
+async def change_password(db: AsyncSession, user_email: str, new_password: str):
+    recovery_link = await get_verification_pin(db, user_email)
+    if not recovery_link:
+        raise HTTPException(status_code=404, detail="Verification pin not found")
+
+    await assert_pin_for_recovery(db, user_email, recovery_link)
+    assert_pin_is_valid(recovery_link)
+    assert_pin_can_change(recovery_link)
+
+    hashed_password = await hash_password_async(new_password)
+    await update_user_password(db, user_email, hashed_password)
+    await delete_verification_pin(db, recovery_link)
+    return True
+
+async def verify_recovery_user_pin(db: AsyncSession, user_email: str, pin: str):
+    verification_pin = await get_verification_pin(db, user_email)
+    if not verification_pin:
+        raise HTTPException(status_code=404, detail="Verification pin not found")
+
+    await assert_recovery_pin_is_correct(db, user_email, pin, verification_pin)
+    await assert_pin_not_expired(db, user_email, verification_pin)
+    assert_pin_is_valid(verification_pin)
+    await assert_pin_for_recovery(db, user_email, verification_pin)
+
+    await pin_can_change(db, verification_pin)
+    return True
+
+async def block_user_service(db: AsyncSession, user_id: str, block: bool):
+    if block:
+        user = await block_user(db, user_id)
+    else:
+        user = await unblock_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return True
+
+async def change_user_role_service(db: AsyncSession, user_id: str, new_role: str):
+    user = await get_user_by_id(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if new_role not in POSSIBLE_ROLES:
+        raise HTTPException(status_code=400, detail="Invalid role")
+
+    user_data = await get_user_data_async(user_id)
+    await update_user_data_async(user_id, role_profile_update(user_data, new_role))
+
+    return {"message": f"User {user_id} role changed to {new_role} successfully"}
+
+
+async def get_user_info(db: AsyncSession, after=None, limit=None):
+    profiles = await get_users_page(db, after, limit)
+    if not profiles and after is None:
+        raise HTTPException(status_code=404, detail="No user profiles found")
+    return [
+        UserBasicInfo(
+            id=u.id,
+            is_locked=u.is_locked,
+        )
+        for u in profiles
+    ]
+
+async def get_users_status_service(db: AsyncSession, user_ids):
+    user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+    statuses = cached_user_statuses(user_ids)
+    missing = [user_id for user_id in user_ids if user_id not in statuses]
+    if missing:
+        rows = await get_users_status(db, [uuid.UUID(user_id) for user_id in missing])
+        loaded = {str(row.id): status_from_row(row) for row in rows}
+        credential_cache.set_many(loaded)
+        statuses.update(loaded)
+    return users_status_response(user_ids, statuses)
+
+async def block_users_service(db: AsyncSession, user_ids, block: bool) -> BatchResult:
+    user_ids = list(dict.fromkeys(user_ids))
+    updated = {row.id for row in await set_users_blocked(db, user_ids, block)}
+    status = "blocked" if block else "unblocked"
+    return batch_result(user_ids, [
+        BatchItemResult(id=user_id, status=status) if user_id in updated else not_found_result(user_id)
+        for user_id in user_ids
+    ])
+
+async def split_existing_users(db: AsyncSession, user_ids):
+    user_ids = list(dict.fromkeys(user_ids))
+    existing = {row.id for row in await get_users_status(db, user_ids)}
+    return [user_id for user_id in user_ids if user_id in existing], [not_found_result(user_id) for user_id in user_ids if user_id not in existing]
+
+async def stream_user_info(session_factory, after=None):
+    async with session_factory() as db:
+        async for row in stream_users(db, after, USERS_STREAM_BATCH_SIZE):
+            yield user_info_line(row)
+
+########### UTILS ###########
+
+async def assert_user_already_verified(db, user_email):
+    user = await get_user_by_email(db, user_email)
+    if user and user.is_verified:
+        raise HTTPException(status_code=404, detail="User already verified")
+
+async def make_invalid_pin(db: AsyncSession, user_email: str):
+    await set_pin_invalid(db, user_email)
+
+async def make_user_verified(db: AsyncSession, user_email: str):
+    await verify_user(db, user_email)
+
+async def assert_pin_is_correct(db, user_email, pin, verification_pin):
+    if verification_pin.pin != pin:
+        await make_invalid_pin(db, user_email)
+        raise HTTPException(status_code=401, detail="Invalid verification pin")
+
+async def assert_pin_not_expired(db, user_email, verification_pin):
+    date_now = datetime.now(timezone.utc)
+    if verification_pin.created_at + timedelta(seconds=PIN_EXPIRATION_SECONDS) < date_now:
+        await make_invalid_pin(db, user_email)
+        raise HTTPException(status_code=410, detail="Verification pin expired")
+
+async def assert_recovery_pin_is_correct(db, user_email, pin, verification_pin):
+    if verification_pin.pin != pin:
+        if verification_pin.incorrect_attempts < MAX_INCORRECT_ATTEMPTS:
+            if (await increase_incorrect_attempts(db, user_email)).incorrect_attempts <= MAX_INCORRECT_ATTEMPTS:
+                raise HTTPException(status_code=401, detail="Verification pin is not correct, try again")
+        await make_invalid_pin(db, user_email)
+        raise HTTPException(status_code=401, detail="Invalid verification pin")
+
+async def assert_pin_for_recovery(db, user_email, verification_pin):
+    if not verification_pin.for_password_recovery:
+        await make_invalid_pin(db, user_email)
+        raise HTTPException(status_code=403, detail="Pin is not for password recovery")
+
+async def assert_pin_not_for_recovery(db, user_email, verification_pin):
+    if verification_pin.for_password_recovery:
+        await make_invalid_pin(db, user_email)
+        raise HTTPException(status_code=403, detail="Pin is for password recovery")
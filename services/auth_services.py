@@ -1,18 +1,37 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from schemas.auth_schemas import UserRegister, UserLogin, TokenResponse, UserBasicInfo
-from repositories.auth_repository import get_user_by_email, create_user, verify_user, update_user_password, increase_incorrect_attempts, get_user_by_id, block_user, unblock_user
-from repositories.auth_repository import get_verification_pin, delete_verification_pin, set_pin_invalid, create_verification_pin, set_new_pin, pin_can_change, get_all_users
-from utils.security import hash_password, verify_password, create_access_token
+from schemas.auth_schemas import UserRegister, UserLogin, TokenResponse, UserBasicInfo, UserStatus, UserStatusBatchResponse, BatchItemResult, BatchResult
+from repositories.auth_repository import get_user_by_email, create_user, delete_user, verify_user, update_user_password, get_user_by_id, block_user, unblock_user, get_users_page, stream_users, get_users_status, set_users_blocked
+from repositories.pin_store import get_verification_pin, delete_verification_pin, set_pin_invalid, create_verification_pin, set_new_pin, pin_can_change, increase_incorrect_attempts, delete_pin_by_email
+from repositories.pin_store import PIN_EXPIRATION_SECONDS
+from utils.security import create_access_token
+from utils.credential_cache import credential_cache, status_from_row
+from utils.password_hasher import hash_password, verify_password
 from datetime import datetime, timedelta, timezone
+import asyncio
+import json
+import os
 import random
 from externals.notify_service import send_notification, send_email_recovery, create_notification_preferences
-from externals.user_service import get_user_data, update_user_data
+from externals.notify_service import send_notification_async
+from externals.user_service import get_user_data, update_user_data, create_profile_async, get_user_data_async, update_user_data_async
+from externals.http_client import users_client, fan_out_limit
+from externals.resilience import is_rejection
+from models.credential_models import Credential
+from dbConfig.session import SessionLocal
+from starlette.concurrency import run_in_threadpool
+from repositories.outbox_repository import enqueue_event
+from services.outbox_dispatcher import SIDE_EFFECTS_MODE, SEND_VERIFICATION_PIN, CREATE_PROFILE, CREATE_NOTIFICATION_PREFERENCES, outbox_dispatcher
 import uuid
 
-PIN_EXPIRATION_SECONDS = 60
 MAX_INCORRECT_ATTEMPTS = 3
+REGISTER_STEP_TIMEOUT_SECONDS = float(os.getenv("REGISTER_STEP_TIMEOUT_SECONDS", 10))
 POSSIBLE_ROLES = ["student", "teacher"]
+USERS_STREAM_BATCH_SIZE = int(os.getenv("USERS_STREAM_BATCH_SIZE", 1000))
+# a batch call the users-service bulkhead rejects (request traffic holds its
+# slots) waits and tries again this many times before the user counts as failed
+ROLE_BATCH_REJECTION_RETRIES = 3
+ROLE_BATCH_REJECTION_BACKOFF_SECONDS = 0.1
 
 def register_user(data: UserRegister, db: Session) -> TokenResponse:
     if get_user_by_email(db, data.email):
@@ -29,7 +48,7 @@ def login_user(data: UserLogin, db: Session) -> TokenResponse:
     
     assert_user_not_verified(user)
 
-    token = create_access_token({"user_email": user.email, "user_id": str(user.id)})
+    token = create_access_token({"user_email": user.email, "user_id": str(user.id)}, token_epoch=user.token_epoch)
     return TokenResponse(access_token=token)
 
     
@@ -37,6 +56,8 @@ def verify_pin(db: Session, user_email: str, pin: str):
     assert_user_already_verified(db, user_email)
 
     verification_pin = get_verification_pin(db, user_email)
+    if not verification_pin:
+        raise HTTPException(status_code=404, detail="Verification pin not found")
 
     assert_pin_is_correct(db, user_email, pin, verification_pin)
     assert_pin_not_expired(db, user_email, verification_pin)
@@ -44,6 +65,14 @@ def verify_pin(db: Session, user_email: str, pin: str):
     assert_pin_not_for_recovery(db, user_email, verification_pin)
     
     delete_verification_pin(db, verification_pin)
+    if SIDE_EFFECTS_MODE == "outbox":
+        user = get_user_by_email(db, user_email)
+        # committed by make_user_verified, in the same transaction
+        enqueue_event(db, CREATE_NOTIFICATION_PREFERENCES, {"user_id": str(user.id), "email": user_email})
+        make_user_verified(db, user_email)
+        outbox_dispatcher.wake()
+        return True
+
     make_user_verified(db, user_email)
     user = get_user_by_email(db, user_email)
     create_notification_preferences(str(user.id), user_email)
@@ -54,15 +83,91 @@ def notify_user(db: Session, user_email: str, to: str, channel: str):
     user = get_user_by_email(db, user_email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    if SIDE_EFFECTS_MODE == "outbox":
+        queue_verification_pin(db, user_email, to, channel)
+        db.commit()
+        outbox_dispatcher.wake()
+        return True
+
     pin = create_pin()
     result = send_notification(to, pin, channel)
     if result:
-        if get_verification_pin(db, user_email):
-            set_new_pin(db, user_email, pin, False)
-        else:
-            create_verification_pin(db, user_email, pin, False)
+        store_pin(db, user_email, pin, False)
     return result
 
+def queue_verification_pin(db: Session, user_email: str, to: str, channel: str):
+    # Queues the PIN's delivery; the caller commits. The PIN itself is created
+    # by deliver_verification_pin, so it never sits in the outbox payload
+    enqueue_event(db, SEND_VERIFICATION_PIN, {"email": user_email, "to": to, "channel": channel})
+
+async def deliver_verification_pin(user_email: str, to: str, channel: str):
+    # SEND_VERIFICATION_PIN events: the PIN is created when it is sent, so it
+    # doesn't expire while the event waits (or backs off) in the outbox
+    pin = create_pin()
+    await run_in_threadpool(store_pin_in_new_session, user_email, pin)
+    return await send_notification_async(to, pin, channel)
+
+def store_pin_in_new_session(user_email: str, pin: str):
+    with SessionLocal() as db:
+        store_pin(db, user_email, pin, False)
+        db.commit()
+
+def store_pin(db: Session, user_email: str, pin: str, for_password_recovery: bool):
+    if get_verification_pin(db, user_email):
+        set_new_pin(db, user_email, pin, for_password_recovery)
+    else:
+        create_verification_pin(db, user_email, pin, for_password_recovery)
+
+def undo_registration(db: Session, user_id, user_email: str):
+    # compensation for a registration whose downstream steps failed: the PIN goes with the credential
+    delete_user(db, user_id)
+    delete_pin_by_email(db, user_email)
+
+def register_with_outbox(db: Session, data: UserRegister, hashed_password: str, channel: str) -> Credential:
+    # The credential and the SMS/profile calls commit together; the outbox
+    # dispatcher delivers them after the response is sent
+    user = Credential(id=uuid.uuid4(), email=data.email, hashed_password=hashed_password)
+    queue_verification_pin(db, data.email, data.phone, channel)
+    db.add(user)
+    enqueue_event(db, CREATE_PROFILE, profile_payload(user.id, data))
+    db.commit()
+    outbox_dispatcher.wake()
+    return user
+
+async def run_registration_side_effects(to: str, pin: str, channel: str, profile_data: dict):
+    # The PIN notification and the profile creation don't depend on each
+    # other, so they run concurrently: registration waits for the slower one
+    # instead of both. Both are awaited even when one fails, so nothing is
+    # still in flight when the caller removes the credential.
+    notification, profile = await asyncio.gather(
+        run_registration_step("Notification", send_notification_async(to, pin, channel)),
+        run_registration_step("Profile creation", create_profile_async(profile_data)),
+        return_exceptions=True,
+    )
+    for result in (notification, profile):
+        if isinstance(result, BaseException):
+            raise result
+    if not notification:
+        raise HTTPException(status_code=500, detail="Error sending notification")
+    if not profile:
+        raise HTTPException(status_code=500, detail="Error creating profile")
+
+async def run_registration_step(name: str, call):
+    try:
+        return await asyncio.wait_for(call, REGISTER_STEP_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"{name} timed out")
+
+def profile_payload(user_id, data: UserRegister) -> dict:
+    return {
+        "id": str(user_id),
+        "email": data.email,
+        "name": data.name,
+        "last_name": data.last_name,
+        "role": data.role,
+        "phone": data.phone,
+    }
+
 def send_recovery_link(db: Session, user_email: str):
     user = get_user_by_email(db, user_email)
     if not user:
@@ -70,10 +175,7 @@ def send_recovery_link(db: Session, user_email: str):
     pin = create_pin()
     result = send_email_recovery(user_email, pin)
     if result:
-        if get_verification_pin(db, user_email):
-            set_new_pin(db, user_email, pin, True)
-        else:
-            create_verification_pin(db, user_email, pin, True)
+        store_pin(db, user_email, pin, True)
     return user.id, user.email
 
 
@@ -105,14 +207,12 @@ def verify_recovery_user_pin(db: Session, user_email: str, pin: str):
     return True
 
 def block_user_service(db: Session, user_id: str, block: bool):
-    user = get_user_by_id(db, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     if block:
-        block_user(db, user)
+        user = block_user(db, user_id)
     else:
-        unblock_user(db, user)
+        user = unblock_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
     return True
 
 def change_user_role_service(db: Session, user_id: str, new_role: str):
@@ -124,17 +224,69 @@ def change_user_role_service(db: Session, user_id: str, new_role: str):
         raise HTTPException(status_code=400, detail="Invalid role")
 
     user_data = get_user_data(user_id)
-    user_data["role"] = new_role
-    user_data["bio"] = user_data.get("bio") or ""
-    user_data["location"] = user_data.get("location") or ""
-    update_user_data(user_id, user_data)
+    update_user_data(user_id, role_profile_update(user_data, new_role))
     
     return {"message": f"User {user_id} role changed to {new_role} successfully"}
 
-
-def get_user_info(db:Session):
-    profiles = get_all_users(db)
-    if not profiles:
+def role_profile_update(user_data: dict, new_role: str) -> dict:
+    return {**user_data, "role": new_role, "bio": user_data.get("bio") or "", "location": user_data.get("location") or ""}
+
+def block_users_service(db: Session, user_ids, block: bool) -> BatchResult:
+    user_ids = list(dict.fromkeys(user_ids))
+    updated = {row.id for row in set_users_blocked(db, user_ids, block)}
+    status = "blocked" if block else "unblocked"
+    return batch_result(user_ids, [
+        BatchItemResult(id=user_id, status=status) if user_id in updated else not_found_result(user_id)
+        for user_id in user_ids
+    ])
+
+def split_existing_users(db: Session, user_ids):
+    """(ids of existing users, not_found results for the rest), one query."""
+    user_ids = list(dict.fromkeys(user_ids))
+    existing = {row.id for row in get_users_status(db, user_ids)}
+    return [user_id for user_id in user_ids if user_id in existing], [not_found_result(user_id) for user_id in user_ids if user_id not in existing]
+
+async def change_roles_in_profiles(user_ids, new_role: str) -> list:
+    # The users service has no bulk endpoint: one GET + PATCH per user, with
+    # at most half the users-service bulkhead in use (fan_out_limit)
+    semaphore = asyncio.Semaphore(fan_out_limit(users_client))
+    return list(await asyncio.gather(*(change_role_in_profile(user_id, new_role, semaphore) for user_id in user_ids)))
+
+async def change_role_in_profile(user_id, new_role: str, semaphore: asyncio.Semaphore) -> BatchItemResult:
+    async with semaphore:
+        try:
+            if not await update_role_when_admitted(user_id, new_role):
+                return BatchItemResult(id=user_id, status="failed", detail="Users service error")
+        except HTTPException as e:
+            if e.status_code == 404:
+                return not_found_result(user_id)
+            return BatchItemResult(id=user_id, status="failed", detail=e.detail)
+    return BatchItemResult(id=user_id, status="updated")
+
+async def update_role_when_admitted(user_id, new_role: str) -> bool:
+    for attempt in range(ROLE_BATCH_REJECTION_RETRIES + 1):
+        try:
+            user_data = await get_user_data_async(str(user_id))
+            return bool(user_data) and bool(await update_user_data_async(str(user_id), role_profile_update(user_data, new_role)))
+        except HTTPException as e:
+            # only rejections are retried: nothing was sent, so the PATCH is never repeated
+            if not is_rejection(e) or attempt == ROLE_BATCH_REJECTION_RETRIES:
+                raise
+        await asyncio.sleep(ROLE_BATCH_REJECTION_BACKOFF_SECONDS * 2 ** attempt)
+
+def not_found_result(user_id) -> BatchItemResult:
+    return BatchItemResult(id=user_id, status="not_found", detail="User not found")
+
+def batch_result(user_ids, results) -> BatchResult:
+    order = {user_id: i for i, user_id in enumerate(user_ids)}
+    results = sorted(results, key=lambda result: order[result.id])
+    succeeded = sum(result.status not in ("not_found", "failed") for result in results)
+    return BatchResult(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+
+def get_user_info(db:Session, after=None, limit=None):
+    profiles = get_users_page(db, after, limit)
+    if not profiles and after is None:
         raise HTTPException(status_code=404, detail="No user profiles found")
     return [
         UserBasicInfo(
@@ -144,6 +296,47 @@ def get_user_info(db:Session):
         for u in profiles
     ]
 
+def get_users_status_service(db: Session, user_ids) -> UserStatusBatchResponse:
+    user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+    statuses = cached_user_statuses(user_ids)
+    missing = [user_id for user_id in user_ids if user_id not in statuses]
+    if missing:
+        loaded = {str(row.id): status_from_row(row) for row in get_users_status(db, [uuid.UUID(user_id) for user_id in missing])}
+        credential_cache.set_many(loaded)
+        statuses.update(loaded)
+    return users_status_response(user_ids, statuses)
+
+def cached_user_statuses(user_ids) -> dict:
+    # entries written before is_blocked/is_verified were cached only hold the lock state
+    return {user_id: status for user_id, status in credential_cache.get_many(user_ids).items() if "is_verified" in status}
+
+def users_status_response(user_ids, statuses: dict) -> UserStatusBatchResponse:
+    # is_locked is the effective lock: an expired lock_until no longer counts
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    users, not_found = [], []
+    for user_id in user_ids:
+        status = statuses.get(user_id)
+        if status is None:
+            not_found.append(user_id)
+            continue
+        users.append(UserStatus(
+            id=user_id,
+            is_locked=bool(status["is_locked"] and status["lock_until"] and status["lock_until"] > now),
+            is_blocked=bool(status["is_blocked"]),
+            is_verified=bool(status["is_verified"]),
+        ))
+    return UserStatusBatchResponse(users=users, not_found=not_found)
+
+def user_info_line(row) -> str:
+    return json.dumps({"id": str(row.id), "is_locked": bool(row.is_locked)}) + "\n"
+
+def stream_user_info(session_factory, after=None):
+    # Own session: the request's get_db session is closed before a
+    # StreamingResponse starts sending the body
+    with session_factory() as db:
+        for row in stream_users(db, after, USERS_STREAM_BATCH_SIZE):
+            yield user_info_line(row)
+
 ########### UTILS ###########
 
 def assert_user_not_verified(user):
@@ -167,6 +360,7 @@ def assert_pin_is_correct(db, user_email, pin, verification_pin):
         raise HTTPException(status_code=401, detail="Invalid verification pin")
 
 def assert_pin_not_expired(db, user_email, verification_pin):
+    # Only the verification_pins table needs this: cached PINs expire by themselves
     date_now = datetime.now(timezone.utc)
     if verification_pin.created_at + timedelta(seconds=PIN_EXPIRATION_SECONDS) < date_now:
         make_invalid_pin(db, user_email)
@@ -174,12 +368,12 @@ def assert_pin_not_expired(db, user_email, verification_pin):
 
 def assert_recovery_pin_is_correct(db, user_email, pin, verification_pin):
     if verification_pin.pin != pin:
+        # the count returned by the increment decides, so concurrent guesses can't exceed the limit
         if verification_pin.incorrect_attempts < MAX_INCORRECT_ATTEMPTS:
-            increase_incorrect_attempts(db, user_email)
-            raise HTTPException(status_code=401, detail="Verification pin is not correct, try again")
-        else:
-            make_invalid_pin(db, user_email)
-            raise HTTPException(status_code=401, detail="Invalid verification pin")
+            if increase_incorrect_attempts(db, user_email).incorrect_attempts <= MAX_INCORRECT_ATTEMPTS:
+                raise HTTPException(status_code=401, detail="Verification pin is not correct, try again")
+        make_invalid_pin(db, user_email)
+        raise HTTPException(status_code=401, detail="Invalid verification pin")
 
         
 def assert_pin_is_valid(verification_pin):
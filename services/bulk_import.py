@@ -0,0 +1,162 @@
+"""
+Bulk user import, for onboarding a whole institution at once.
+
+Reads users with the /auth/register fields (email, password, name, last_name,
+role, phone) from a CSV file or NDJSON (.ndjson/.jsonl) and imports them in
+batches: the passwords of a batch are hashed in parallel on the password
+hasher's process pool, the credentials go in with one multi-row INSERT and
+the profile creation / verification PIN of every user are queued in the
+outbox with another, all in one commit per batch. The running service's
+outbox dispatcher delivers them afterwards.
+
+The dispatcher only runs when the service is started with
+SIDE_EFFECTS_MODE=outbox (the default is sync). Queued events would never be
+delivered otherwise, so the import refuses to run unless SIDE_EFFECTS_MODE is
+"outbox" in its own environment too; --force skips the check, e.g. when the
+service's configuration lives elsewhere.
+
+After every commit the number of processed rows is saved to a checkpoint
+file, so an interrupted import resumes where it stopped. Emails that already
+exist are skipped as well, which makes re-running a finished file harmless.
+
+    SIDE_EFFECTS_MODE=outbox python -m services.bulk_import users.csv [--batch-size N] [--verified] [--rejects FILE] [--restart]
+"""
+import argparse
+import csv
+import json
+import os
+import time
+import uuid
+from itertools import islice
+from typing import Iterator, List
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from dbConfig.session import SessionLocal
+from schemas.auth_schemas import UserRegister
+from repositories.auth_repository import get_existing_emails, insert_credentials
+from repositories.outbox_repository import enqueue_events
+from services.auth_services import profile_payload
+from services.outbox_dispatcher import SIDE_EFFECTS_MODE, CREATE_PROFILE, CREATE_NOTIFICATION_PREFERENCES, SEND_VERIFICATION_PIN
+from utils.password_hasher import PasswordHasher
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    # Lazily, one row at a time: the file is never loaded whole
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.endswith((".ndjson", ".jsonl")):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+def read_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+def write_checkpoint(path: str, progress: dict):
+    # tmp + replace: a crash mid-write never leaves a truncated checkpoint
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(progress, file)
+    os.replace(tmp_path, path)
+
+def import_batch(db: Session, hasher: PasswordHasher, users: List[UserRegister], verified: bool, channel: str) -> int:
+    """Imports the users whose email is not taken yet and commits; returns how many were imported."""
+    existing = get_existing_emails(db, [user.email for user in users])
+    new_users = []
+    for user in users:
+        if user.email.lower() not in existing:
+            existing.add(user.email.lower())  # repeated inside the file
+            new_users.append(user)
+    if not new_users:
+        return 0
+
+    hashed_passwords = hasher.hash_many([user.password for user in new_users])
+    credentials, events = [], []
+    for user, hashed_password in zip(new_users, hashed_passwords):
+        user_id = uuid.uuid4()
+        credentials.append({"id": user_id, "email": user.email, "hashed_password": hashed_password, "is_verified": verified})
+        events.append((CREATE_PROFILE, profile_payload(user_id, user)))
+        if verified:
+            events.append((CREATE_NOTIFICATION_PREFERENCES, {"user_id": str(user_id), "email": user.email}))
+        else:
+            # The PIN is created on delivery: one made now would expire before the event is sent
+            events.append((SEND_VERIFICATION_PIN, {"email": user.email, "to": user.phone, "channel": channel}))
+    insert_credentials(db, credentials)
+    enqueue_events(db, events)
+    db.commit()
+    return len(new_users)
+
+def import_users(path: str, session_factory, hasher: PasswordHasher, batch_size: int = IMPORT_BATCH_SIZE, verified: bool = False,
+                 channel: str = "sms", checkpoint_path: str = None, restart: bool = False, rejects_path: str = None) -> dict:
+    checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+    progress = {"rows": 0, "imported": 0, "skipped": 0, "invalid": 0}
+    if not restart:
+        progress.update(read_checkpoint(checkpoint_path))
+    if progress["rows"]:
+        print(f"Resuming import of {path} after row {progress['rows']}")
+
+    rows = enumerate(islice(read_rows(path), progress["rows"], None), start=progress["rows"] + 1)
+    rejects = open(rejects_path, "a") if rejects_path else None
+    started_at, started_rows = time.monotonic(), progress["rows"]
+    try:
+        while batch := list(islice(rows, batch_size)):
+            users = []
+            for line, row in batch:
+                try:
+                    users.append(UserRegister(**row))
+                except (ValidationError, TypeError) as e:
+                    progress["invalid"] += 1
+                    if rejects:
+                        rejects.write(json.dumps({"row": line, "error": str(e)}) + "\n")
+            with session_factory() as db:
+                imported = import_batch(db, hasher, users, verified, channel)
+            progress["rows"] = batch[-1][0]
+            progress["imported"] += imported
+            progress["skipped"] += len(users) - imported
+            write_checkpoint(checkpoint_path, progress)
+            rate = (progress["rows"] - started_rows) / max(time.monotonic() - started_at, 1e-9)
+            print(f"Imported {progress['imported']} users ({progress['rows']} rows, {progress['skipped']} skipped, "
+                  f"{progress['invalid']} invalid, {rate:.0f} rows/s)")
+    finally:
+        if rejects:
+            rejects.close()
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="CSV with a header row, or NDJSON (.ndjson/.jsonl)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--verified", action="store_true", help="mark users verified and send no PIN")
+    parser.add_argument("--channel", default="sms")
+    parser.add_argument("--checkpoint", help="defaults to <path>.checkpoint")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first row")
+    parser.add_argument("--rejects", help="append invalid rows (number and error) to this file")
+    parser.add_argument("--force", action="store_true", help="import even if SIDE_EFFECTS_MODE is not outbox")
+    args = parser.parse_args()
+    if SIDE_EFFECTS_MODE != "outbox":
+        message = (f"SIDE_EFFECTS_MODE is {SIDE_EFFECTS_MODE!r}: the service doesn't run the outbox dispatcher, so imported "
+                   "users would never get a profile or a verification PIN. Start the service with SIDE_EFFECTS_MODE=outbox")
+        if not args.force:
+            raise SystemExit(f"{message} and set it here too, or pass --force.")
+        print(f"WARNING: {message}.")
+
+    hasher = PasswordHasher()
+    try:
+        progress = import_users(args.path, SessionLocal, hasher, args.batch_size, args.verified, args.channel,
+                                args.checkpoint, args.restart, args.rejects)
+    finally:
+        hasher.shutdown()
+    print(json.dumps(progress))
+
+
+if __name__ == "__main__":
+    main()
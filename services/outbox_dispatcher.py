@@ -0,0 +1,208 @@
+import asyncio
+import os
+from contextlib import nullcontext
+from datetime import timedelta
+from typing import Callable, Optional
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from models.outbox_models import utc_now
+from repositories.outbox_repository import claim_events, mark_events_sent, mark_events_failed, defer_events
+from externals.http_client import notifications_client, users_client, fan_out_limit
+from externals.resilience import is_rejection
+from externals.notify_service import send_notification_async, create_notification_preferences_async
+from externals.user_service import create_profile_async
+
+# "sync" (default) calls the notification and users services inside the
+# request, "outbox" records the calls in outbox_events and delivers them here
+SIDE_EFFECTS_MODE = os.getenv("SIDE_EFFECTS_MODE", "sync")
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 50))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", 1))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_RETRY_BACKOFF_SECONDS = float(os.getenv("OUTBOX_RETRY_BACKOFF_SECONDS", 2))
+OUTBOX_MAX_BACKOFF_SECONDS = 300
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", 60))
+
+SEND_NOTIFICATION = "send_notification"
+CREATE_PROFILE = "create_profile"
+CREATE_NOTIFICATION_PREFERENCES = "create_notification_preferences"
+SEND_VERIFICATION_PIN = "send_verification_pin"
+
+
+async def send_verification_pin(payload: dict, key: str):
+    # Late import: services.auth_services imports this module. No idempotency
+    # key on purpose: a redelivery stores a new PIN, and that one must be sent
+    from services.auth_services import deliver_verification_pin
+    return await deliver_verification_pin(payload["email"], payload["to"], payload["channel"])
+
+
+HANDLERS = {
+    # no longer queued (PINs go as SEND_VERIFICATION_PIN); kept to drain events queued before
+    SEND_NOTIFICATION: lambda payload, key: send_notification_async(payload["to"], payload["pin"], payload["channel"], idempotency_key=key),
+    CREATE_PROFILE: lambda payload, key: create_profile_async(payload, idempotency_key=key),
+    CREATE_NOTIFICATION_PREFERENCES: lambda payload, key: create_notification_preferences_async(payload["user_id"], payload["email"], idempotency_key=key),
+    SEND_VERIFICATION_PIN: send_verification_pin,
+}
+
+# Downstream each kind calls: deliveries to one downstream are capped at its fan_out_limit
+EVENT_DOWNSTREAMS = {
+    SEND_NOTIFICATION: notifications_client,
+    CREATE_PROFILE: users_client,
+    CREATE_NOTIFICATION_PREFERENCES: notifications_client,
+    SEND_VERIFICATION_PIN: notifications_client,
+}
+
+# _deliver outcomes besides None (delivered)
+RETRY = "retry"
+PERMANENT = "permanent"
+# rejected by the bulkhead or an open circuit before anything was sent
+DEFERRED = "deferred"
+
+
+class OutboxDispatcher:
+    """
+    Background asyncio worker that claims due outbox events in batches,
+    delivers them concurrently and records the outcome. Delivery is at
+    least once: each call carries the event id as Idempotency-Key. Failures
+    are retried with exponential backoff up to `max_attempts`; a 4xx answer
+    gives up right away since retrying won't change it.
+
+    Concurrent deliveries per downstream stay under its bulkhead; a call the
+    bulkhead or circuit breaker rejects anyway is retried later without
+    counting as an attempt.
+    """
+
+    def __init__(self, handlers: dict = HANDLERS, downstreams: dict = EVENT_DOWNSTREAMS, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_SECONDS, max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 retry_backoff: float = OUTBOX_RETRY_BACKOFF_SECONDS, lease_seconds: float = OUTBOX_LEASE_SECONDS,
+                 clock: Callable = utc_now):
+        self.handlers = handlers
+        self.downstreams = downstreams
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease = timedelta(seconds=lease_seconds)
+        self.clock = clock
+        self.session_factory: Optional[Callable] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.delivered = 0
+        self.retried = 0
+        self.deferred = 0
+        self.failed = 0
+        self.errors = 0
+
+    def start(self, session_factory: Callable):
+        self.session_factory = session_factory
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            print("Outbox dispatcher did not stop in time")
+        self._task = None
+
+    def wake(self):
+        # Called after a commit that queued events, possibly from a
+        # threadpool worker, so delivery doesn't wait for the next poll
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                claimed = await self.dispatch_once()
+            except Exception as e:
+                print(f"Outbox dispatch error: {e}")
+                self.errors += 1
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def dispatch_once(self) -> int:
+        events = await run_in_threadpool(self._claim)
+        if not events:
+            return 0
+        # new semaphores per batch: each asyncio.run (tests, scripts) has its own loop
+        limits = {client.name: asyncio.Semaphore(fan_out_limit(client)) for client in self.downstreams.values()}
+        outcomes = await asyncio.gather(*(self._deliver(event, limits) for event in events))
+
+        now = self.clock()
+        sent, failures, deferred = [], [], []
+        for event, error in zip(events, outcomes):
+            if error is None:
+                sent.append(event.id)
+                continue
+            outcome, message = error
+            if outcome == DEFERRED:
+                deferred.append(event.id)
+                self.deferred += 1
+            elif outcome == PERMANENT or event.attempts >= self.max_attempts:
+                failures.append((event.id, None, message))
+                self.failed += 1
+            else:
+                failures.append((event.id, now + self._backoff(event.attempts), message))
+                self.retried += 1
+        self.delivered += len(sent)
+        await run_in_threadpool(self._record, sent, failures, deferred, now)
+        return len(events)
+
+    def _claim(self):
+        with self.session_factory() as db:
+            return claim_events(db, self.clock(), self.batch_size, self.lease)
+
+    def _record(self, sent, failures, deferred, now):
+        with self.session_factory() as db:
+            mark_events_sent(db, sent, now)
+            mark_events_failed(db, failures)
+            defer_events(db, deferred, now + timedelta(seconds=self.retry_backoff))
+
+    async def _deliver(self, event, limits: dict):
+        # None when delivered, else (RETRY/PERMANENT/DEFERRED, error message)
+        handler = self.handlers.get(event.kind)
+        if handler is None:
+            return PERMANENT, f"Unknown outbox event kind: {event.kind}"
+        downstream = self.downstreams.get(event.kind)
+        try:
+            async with limits[downstream.name] if downstream else nullcontext():
+                if await handler(event.payload, str(event.id)):
+                    return None
+            return RETRY, "Downstream answered with an error"
+        except HTTPException as e:
+            if is_rejection(e):
+                return DEFERRED, str(e.detail)
+            return (PERMANENT if e.status_code < 500 else RETRY), str(e.detail)
+        except Exception as e:
+            return (DEFERRED if is_rejection(e) else RETRY), str(e)
+
+    def _backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(self.retry_backoff * (2 ** (attempts - 1)), OUTBOX_MAX_BACKOFF_SECONDS))
+
+    def stats(self) -> dict:
+        return {
+            "mode": SIDE_EFFECTS_MODE,
+            "running": self._task is not None and not self._task.done(),
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "deferred": self.deferred,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,42 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from dbConfig.base import Base
+from dbConfig.session import get_db
+from routes.auth import router
+from utils.credential_cache import credential_cache
+from utils.token_epochs import token_epochs
+
+
+@pytest.fixture
+def sqlite_engine():
+    # in-memory SQLite on one shared connection, so sessions opened from the
+    # threadpool or the outbox dispatcher see the same database
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(sqlite_engine):
+    # modules that need rows override this fixture and seed through it
+    credential_cache.clear()
+    token_epochs.clear()
+    yield sessionmaker(bind=sqlite_engine)
+    credential_cache.clear()
+    token_epochs.clear()
+
+@pytest.fixture
+def client(session_factory):
+    # the sync /auth routes over session_factory
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
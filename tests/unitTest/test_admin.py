@@ -0,0 +1,26 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import utils.security as security
+from routes.admin import router
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_admin_routes_require_the_admin_key(client, monkeypatch):
+    monkeypatch.setattr(security, "ADMIN_API_KEY", "secret-key")
+
+    assert client.get("/admin/credential-cache").status_code == 403
+    assert client.get("/admin/credential-cache", headers={"X-Admin-Key": "wrong"}).status_code == 403
+    assert client.get("/admin/credential-cache", headers={"X-Admin-Key": "secret-key"}).status_code == 200
+
+
+def test_admin_routes_are_closed_without_a_configured_key(client, monkeypatch):
+    monkeypatch.setattr(security, "ADMIN_API_KEY", None)
+
+    assert client.get("/admin/credential-cache", headers={"X-Admin-Key": ""}).status_code == 403
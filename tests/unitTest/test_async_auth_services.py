@@ -0,0 +1,98 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+import pytest
+from models.credential_models import Credential, VerificationPin
+from datetime import datetime, timezone, timedelta
+from services.async_auth_services import verify_pin, notify_user, change_password, block_user_service
+from repositories.async_auth_repository import get_user_by_email, set_pin_invalid
+
+
+def test_async_get_user_by_email_returns_first_row():
+    mock_db = MagicMock()
+    mock_user = Credential(email="found@example.com", hashed_password="hashed")
+    mock_db.execute = AsyncMock(return_value=MagicMock())
+    mock_db.execute.return_value.scalars.return_value.first.return_value = mock_user
+
+    result = asyncio.run(get_user_by_email(mock_db, "found@example.com"))
+
+    mock_db.execute.assert_awaited_once()
+    assert result.email == "found@example.com"
+
+def test_async_set_pin_invalid_commits():
+    mock_db = AsyncMock()
+    mock_db.execute = AsyncMock(return_value=MagicMock())
+    mock_db.execute.return_value.first.return_value = ("tesEmail@test.com",)
+
+    asyncio.run(set_pin_invalid(mock_db, "tesEmail@test.com"))
+
+    mock_db.execute.assert_awaited_once()
+    mock_db.commit.assert_awaited_once()
+    mock_db.refresh.assert_not_awaited()
+
+def test_async_expired_pin_raise_410_code():
+    mock_db = AsyncMock()
+    user_email = "testEmail@test.com"
+    expired_pin = VerificationPin(email=user_email, pin="123456", created_at=datetime.now(timezone.utc) - timedelta(minutes=15))
+
+    with patch("services.async_auth_services.assert_user_already_verified", AsyncMock(return_value=None)), \
+        patch("services.async_auth_services.get_verification_pin", AsyncMock(return_value=expired_pin)), \
+        patch("services.async_auth_services.make_invalid_pin", AsyncMock()) as mock_invalid_pin:
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(verify_pin(mock_db, user_email, "123456"))
+
+        assert exc.value.status_code == 410
+        mock_invalid_pin.assert_awaited_once_with(mock_db, user_email)
+
+def test_async_notify_user_creates_pin_entry():
+    mock_db = AsyncMock()
+    user_email = "testEmail@test.com"
+
+    with patch("services.async_auth_services.get_user_by_email", AsyncMock(return_value=Credential(email=user_email))), \
+        patch("services.async_auth_services.create_pin", return_value="123456"), \
+        patch("services.async_auth_services.send_notification_async", AsyncMock(return_value=True)) as mock_send, \
+        patch("services.async_auth_services.get_verification_pin", AsyncMock(return_value=None)), \
+        patch("services.async_auth_services.create_verification_pin", AsyncMock()) as mock_create_entry:
+        result = asyncio.run(notify_user(mock_db, user_email, "1234567890", "sms"))
+
+    mock_send.assert_called_once_with("1234567890", "123456", "sms")
+    mock_create_entry.assert_awaited_once_with(mock_db, user_email, "123456", False)
+    assert result is True
+
+def test_async_change_password_success():
+    mock_db = AsyncMock()
+    user_email = "testEmail@test.com"
+    verification_pin = VerificationPin(email=user_email, pin="123456", is_valid=True, can_change=True, for_password_recovery=True)
+
+    with patch("services.async_auth_services.get_verification_pin", AsyncMock(return_value=verification_pin)), \
+        patch("services.async_auth_services.hash_password_async", AsyncMock(return_value="hashedPassword")), \
+        patch("services.async_auth_services.update_user_password", AsyncMock()) as mock_update, \
+        patch("services.async_auth_services.delete_verification_pin", AsyncMock()) as mock_delete:
+        result = asyncio.run(change_password(mock_db, user_email, "newSecurePassword"))
+
+    mock_update.assert_awaited_once_with(mock_db, user_email, "hashedPassword")
+    mock_delete.assert_awaited_once_with(mock_db, verification_pin)
+    assert result is True
+
+def test_async_block_unknown_user_raise_404():
+    mock_db = AsyncMock()
+
+    with patch("services.async_auth_services.block_user", AsyncMock(return_value=None)):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(block_user_service(mock_db, "missing", True))
+
+    assert exc.value.status_code == 404
+
+def test_async_resend_in_outbox_mode_queues_the_pin_without_creating_it():
+    mock_db = AsyncMock()
+
+    with patch("services.async_auth_services.SIDE_EFFECTS_MODE", "outbox"), \
+        patch("services.async_auth_services.get_user_by_email", AsyncMock(return_value=Credential(email="testEmail@test.com"))), \
+        patch("services.async_auth_services.store_pin", AsyncMock()) as mock_store_pin, \
+        patch("services.async_auth_services.enqueue_event") as mock_enqueue, \
+        patch("services.async_auth_services.outbox_dispatcher"):
+        assert asyncio.run(notify_user(mock_db, "testEmail@test.com", "+5491100000000", "sms")) is True
+
+    mock_enqueue.assert_called_once_with(mock_db, "send_verification_pin", {"email": "testEmail@test.com", "to": "+5491100000000", "channel": "sms"})
+    mock_store_pin.assert_not_awaited()
+    mock_db.commit.assert_awaited_once()
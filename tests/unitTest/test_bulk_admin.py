@@ -0,0 +1,107 @@
+import asyncio
+import json
+import uuid
+import httpx
+import pytest
+import externals.user_service as user_service
+import services.auth_services as auth_services
+from externals.http_client import DownstreamClient, fan_out_limit, users_client
+from externals.resilience import Bulkhead
+from models.credential_models import Credential
+from utils.token_epochs import token_epochs
+
+USERS = sorted(uuid.uuid4() for _ in range(4))
+
+
+@pytest.fixture
+def session_factory(session_factory):
+    with session_factory() as db:
+        db.add_all(Credential(id=user_id, email=f"user{i}@example.com", is_verified=True) for i, user_id in enumerate(USERS))
+        db.commit()
+    return session_factory
+
+@pytest.fixture
+def users_service(monkeypatch):
+    # GET answers with the profile unless the id is in `fail`/`missing`, PATCH bodies are recorded
+    service = {"fail": set(), "missing": set(), "patched": {}}
+
+    def handler(request):
+        user_id = request.url.path.rsplit("/", 1)[-1]
+        if user_id in service["missing"]:
+            return httpx.Response(404)
+        if user_id in service["fail"]:
+            return httpx.Response(500)
+        if request.method == "PATCH":
+            service["patched"][user_id] = json.loads(request.content)
+            return httpx.Response(200)
+        return httpx.Response(200, json={"id": user_id, "role": "student", "bio": None})
+
+    monkeypatch.setattr(user_service, "prefix", "http://users.test")
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(user_service, "users_client", DownstreamClient("users", async_transport=transport, retry_backoff=0, max_retries=0))
+    return service
+
+def statuses(response):
+    return [(result["id"], result["status"]) for result in response.json()["results"]]
+
+
+def test_block_batch_blocks_existing_users_and_revokes_tokens(client, session_factory):
+    unknown = uuid.uuid4()
+
+    response = client.patch("/auth/block:batch", json={"user_ids": [str(USERS[1]), str(unknown), str(USERS[0])], "block": True})
+
+    assert statuses(response) == [(str(USERS[1]), "blocked"), (str(unknown), "not_found"), (str(USERS[0]), "blocked")]
+    assert (response.json()["succeeded"], response.json()["failed"]) == (2, 1)
+    with session_factory() as db:
+        assert {user.id for user in db.query(Credential).filter(Credential.is_blocked)} == {USERS[0], USERS[1]}
+    assert token_epochs.get(USERS[0]) == 1
+
+def test_unblock_batch_invalidates_cached_status(client):
+    client.patch("/auth/block:batch", json={"user_ids": [str(USERS[0])], "block": True})
+    client.post("/auth/users/status:batch", json={"user_ids": [str(USERS[0])]})
+
+    response = client.patch("/auth/block:batch", json={"user_ids": [str(USERS[0])], "block": False})
+
+    assert statuses(response) == [(str(USERS[0]), "unblocked")]
+    status = client.post("/auth/users/status:batch", json={"user_ids": [str(USERS[0])]}).json()
+    assert status["users"][0]["is_blocked"] is False
+
+def test_role_batch_reports_partial_failures(client, users_service):
+    users_service["fail"].add(str(USERS[1]))
+    users_service["missing"].add(str(USERS[2]))
+    unknown = uuid.uuid4()
+
+    response = client.patch("/auth/rol:batch", json={"user_ids": [str(user_id) for user_id in [*USERS, unknown]], "role": "teacher"})
+
+    assert statuses(response) == [
+        (str(USERS[0]), "updated"), (str(USERS[1]), "failed"), (str(USERS[2]), "not_found"), (str(USERS[3]), "updated"), (str(unknown), "not_found"),
+    ]
+    assert (response.json()["succeeded"], response.json()["failed"]) == (2, 3)
+    assert users_service["patched"][str(USERS[0])] == {"id": str(USERS[0]), "role": "teacher", "bio": "", "location": ""}
+    assert str(unknown) not in users_service["patched"]
+
+def test_batch_requests_are_validated(client):
+    assert client.patch("/auth/block:batch", json={"user_ids": [], "block": True}).status_code == 422
+    assert client.patch("/auth/rol:batch", json={"user_ids": [str(USERS[0])], "role": "admin"}).status_code == 422
+
+def test_role_batch_waits_for_bulkhead_slots(client, users_service, monkeypatch):
+    # a busy bulkhead (other requests hold the slots) delays batch items instead of failing them
+    handler = user_service.users_client.async_transport.handler
+
+    async def slow_handler(request):
+        await asyncio.sleep(0.005)
+        return handler(request)
+
+    busy = DownstreamClient("users", async_transport=httpx.MockTransport(slow_handler), retry_backoff=0, max_retries=0,
+                            bulkhead=Bulkhead("users", max_concurrent=1))
+    monkeypatch.setattr(user_service, "users_client", busy)
+    monkeypatch.setattr(auth_services, "ROLE_BATCH_REJECTION_RETRIES", 20)
+    monkeypatch.setattr(auth_services, "ROLE_BATCH_REJECTION_BACKOFF_SECONDS", 0.001)
+
+    response = client.patch("/auth/rol:batch", json={"user_ids": [str(user_id) for user_id in USERS], "role": "teacher"})
+
+    assert response.json()["succeeded"] == len(USERS)
+    assert busy.bulkhead.stats()["rejected"] > 0
+
+def test_role_batch_fan_out_stays_under_the_bulkhead():
+    assert fan_out_limit(users_client) < users_client.bulkhead.max_concurrent
@@ -0,0 +1,119 @@
+import asyncio
+import csv
+import json
+import sys
+import uuid
+from unittest.mock import AsyncMock, patch
+import pytest
+from sqlalchemy import select
+from models.credential_models import Credential, VerificationPin
+from models.outbox_models import OutboxEvent
+import services.bulk_import as bulk_import
+from services.bulk_import import import_users
+from services.outbox_dispatcher import HANDLERS, CREATE_PROFILE, CREATE_NOTIFICATION_PREFERENCES, SEND_VERIFICATION_PIN
+from utils.password_hasher import PasswordHasher
+from utils.security import pwd_context
+
+FIELDS = ["email", "password", "name", "last_name", "role", "phone"]
+
+
+def user_row(i, **overrides):
+    row = {"email": f"user{i}@example.com", "password": f"secret{i}", "name": "Ana", "last_name": "Diaz", "role": "student", "phone": f"+54911{i:06d}"}
+    row.update(overrides)
+    return row
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+@pytest.fixture
+def hasher():
+    return PasswordHasher(workers=0)
+
+def emails(session_factory):
+    with session_factory() as db:
+        return sorted(db.execute(select(Credential.email)).scalars())
+
+def event_kinds(session_factory):
+    with session_factory() as db:
+        return sorted(db.execute(select(OutboxEvent.kind)).scalars())
+
+
+def test_import_skips_invalid_duplicated_and_existing_users(tmp_path, session_factory, hasher):
+    with session_factory() as db:
+        db.add(Credential(id=uuid.uuid4(), email="user0@example.com", hashed_password="x"))
+        db.commit()
+    rows = [user_row(0), user_row(1), user_row(2, email="not-an-email"), user_row(3, role="admin"), user_row(1), user_row(4)]
+    path = write_csv(tmp_path / "users.csv", rows)
+
+    progress = import_users(path, session_factory, hasher, batch_size=2, rejects_path=str(tmp_path / "rejects.ndjson"))
+
+    assert progress == {"rows": 6, "imported": 2, "skipped": 2, "invalid": 2}
+    assert emails(session_factory) == ["user0@example.com", "user1@example.com", "user4@example.com"]
+    assert [json.loads(line)["row"] for line in open(tmp_path / "rejects.ndjson")] == [3, 4]
+    assert not (tmp_path / "users.csv.checkpoint").exists()
+
+def test_import_hashes_passwords_and_queues_side_effects(tmp_path, session_factory, hasher):
+    path = tmp_path / "users.ndjson"
+    path.write_text("\n".join(json.dumps(user_row(i)) for i in range(2)) + "\n")
+
+    import_users(str(path), session_factory, hasher)
+
+    with session_factory() as db:
+        user = db.execute(select(Credential).where(Credential.email == "user1@example.com")).scalar_one()
+        assert pwd_context.verify("secret1", user.hashed_password)
+        assert user.is_verified is False
+        pin_event = db.execute(select(OutboxEvent).where(OutboxEvent.kind == SEND_VERIFICATION_PIN, OutboxEvent.payload["email"].as_string() == user.email)).scalar_one()
+        assert pin_event.payload == {"email": user.email, "to": "+54911000001", "channel": "sms"}
+    assert event_kinds(session_factory) == [CREATE_PROFILE] * 2 + [SEND_VERIFICATION_PIN] * 2
+
+def test_verified_import_sends_no_pin(tmp_path, session_factory, hasher):
+    path = write_csv(tmp_path / "users.csv", [user_row(0)])
+
+    import_users(path, session_factory, hasher, verified=True)
+
+    assert event_kinds(session_factory) == [CREATE_NOTIFICATION_PREFERENCES, CREATE_PROFILE]
+
+def test_interrupted_import_resumes_from_the_checkpoint(tmp_path, session_factory, hasher):
+    path = write_csv(tmp_path / "users.csv", [user_row(i) for i in range(5)])
+    hash_many = hasher.hash_many
+    calls = []
+
+    def failing_hash_many(passwords):
+        calls.append(len(passwords))
+        if len(calls) == 2:
+            raise RuntimeError("worker died")
+        return hash_many(passwords)
+
+    with patch.object(hasher, "hash_many", failing_hash_many), pytest.raises(RuntimeError):
+        import_users(path, session_factory, hasher, batch_size=2)
+    assert json.load(open(f"{path}.checkpoint"))["rows"] == 2
+    assert emails(session_factory) == ["user0@example.com", "user1@example.com"]
+
+    with patch.object(hasher, "hash_many", failing_hash_many):
+        progress = import_users(path, session_factory, hasher, batch_size=2)
+
+    assert progress == {"rows": 5, "imported": 5, "skipped": 0, "invalid": 0}
+    assert calls == [2, 2, 2, 1]
+    assert emails(session_factory) == [f"user{i}@example.com" for i in range(5)]
+
+def test_verification_pin_is_created_when_the_event_is_delivered(session_factory):
+    with patch("services.auth_services.SessionLocal", session_factory), \
+         patch("services.auth_services.send_notification_async", AsyncMock(return_value=True)) as send:
+        asyncio.run(HANDLERS[SEND_VERIFICATION_PIN]({"email": "user0@example.com", "to": "+54911000000", "channel": "sms"}, "event-id"))
+
+    with session_factory() as db:
+        pin = db.get(VerificationPin, "user0@example.com")
+    send.assert_awaited_once_with("+54911000000", pin.pin, "sms")
+
+def test_cli_refuses_to_run_unless_side_effects_go_through_the_outbox(tmp_path, monkeypatch):
+    path = write_csv(tmp_path / "users.csv", [user_row(0)])
+    monkeypatch.setattr(bulk_import, "SIDE_EFFECTS_MODE", "sync")
+    monkeypatch.setattr(sys, "argv", ["bulk_import", path])
+
+    with patch.object(bulk_import, "import_users") as import_users_mock, pytest.raises(SystemExit, match="SIDE_EFFECTS_MODE=outbox"):
+        bulk_import.main()
+    import_users_mock.assert_not_called()
@@ -0,0 +1,138 @@
+import threading
+import time
+from unittest.mock import patch
+import fakeredis
+import pytest
+from utils.cache import CacheError, InMemoryCache, RedisCache, create_cache
+from utils.credential_cache import CredentialStatusCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_redis():
+    # one server shared by every client, like replicas pointing at the same Redis
+    return fakeredis.FakeServer()
+
+
+def redis_cache(server) -> RedisCache:
+    return RedisCache(client=fakeredis.FakeRedis(server=server, decode_responses=True))
+
+
+def test_in_memory_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = InMemoryCache(max_entries=10, clock=clock)
+    cache.set("key", "value", ttl=30)
+
+    clock.now = 29
+    assert cache.get("key") == "value"
+    clock.now = 31
+    assert cache.get("key") is None
+
+def test_in_memory_incr_keeps_the_expiry_of_the_first_increment():
+    clock = FakeClock()
+    cache = InMemoryCache(max_entries=10, clock=clock)
+
+    assert cache.incr("attempts", ttl=60) == 1
+    clock.now = 50
+    assert cache.incr("attempts", ttl=60) == 2
+    clock.now = 61
+    assert cache.get("attempts") is None
+
+def test_in_memory_get_many_returns_none_for_missing_keys():
+    cache = InMemoryCache(max_entries=10)
+    cache.set("a", "1")
+    cache.set("c", "3")
+
+    assert cache.get_many(["a", "b", "c"]) == ["1", None, "3"]
+
+def test_redis_cache_round_trips_values(fake_redis):
+    cache = redis_cache(fake_redis)
+
+    cache.set("a", "1", ttl=30)
+    cache.set("b", "2")
+    cache.delete("b")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+
+def test_redis_get_many_is_a_single_command(fake_redis):
+    cache = redis_cache(fake_redis)
+    cache.set("a", "1")
+    cache.set("c", "3")
+
+    with patch.object(cache.client, "execute_command", wraps=cache.client.execute_command) as execute_command:
+        assert cache.get_many(["a", "b", "c"]) == ["1", None, "3"]
+    assert [call.args[0] for call in execute_command.call_args_list] == ["MGET"]
+
+def test_redis_set_many_stores_every_key_with_ttl(fake_redis):
+    cache = redis_cache(fake_redis)
+
+    with patch.object(cache.client, "execute_command") as execute_command:
+        cache.set_many({"a": "1", "b": "2"}, ttl=30)
+
+    execute_command.assert_not_called()  # both SETs went out in one pipeline
+    assert cache.get_many(["a", "b"]) == ["1", "2"]
+    assert 0 < cache.client.pttl("a") <= 30000
+
+def test_redis_incr_sets_ttl_only_on_creation(fake_redis):
+    cache = redis_cache(fake_redis)
+
+    assert cache.incr("attempts", ttl=0.2) == 1
+    assert cache.incr("attempts", ttl=60) == 2
+    time.sleep(0.3)
+
+    assert cache.get("attempts") is None
+
+def test_redis_incr_is_atomic_across_threads(fake_redis):
+    cache = redis_cache(fake_redis)
+
+    def worker():
+        for _ in range(50):
+            cache.incr("counter", ttl=60)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.get("counter") == "200"
+
+def test_redis_unreachable_raises_cache_error():
+    cache = RedisCache(port=1, timeout=0.2)
+
+    with pytest.raises(CacheError):
+        cache.get("a")
+    assert cache.stats()["connection_errors"] == 1
+
+def test_create_cache_picks_backend_from_url():
+    assert isinstance(create_cache("memory://"), InMemoryCache)
+    cache = create_cache("redis://:secret@cache.internal:6380/2")
+    assert (cache.host, cache.port, cache.db, cache.password) == ("cache.internal", 6380, 2, "secret")
+    with pytest.raises(ValueError):
+        create_cache("memcached://localhost")
+
+def test_credential_status_is_shared_between_replicas(fake_redis):
+    replica_a = CredentialStatusCache(backend=redis_cache(fake_redis))
+    replica_b = CredentialStatusCache(backend=redis_cache(fake_redis))
+
+    replica_a.set("user-1", {"is_locked": False, "lock_until": None})
+    assert replica_b.get("user-1") == {"is_locked": False, "lock_until": None}
+
+    replica_b.invalidate("user-1")
+    assert replica_a.get("user-1") is None
+
+def test_credential_cache_treats_backend_errors_as_misses():
+    status_cache = CredentialStatusCache(backend=RedisCache(port=1, timeout=0.2))
+
+    status_cache.set("user-1", {"is_locked": False, "lock_until": None})
+
+    assert status_cache.get("user-1") is None
+    assert status_cache.stats()["errors"] == 2
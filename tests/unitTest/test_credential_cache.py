@@ -0,0 +1,87 @@
+from unittest.mock import MagicMock
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from utils.credential_cache import CredentialStatusCache, credential_cache
+from utils.security import create_access_token, get_current_user
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    credential_cache.clear()
+    yield
+    credential_cache.clear()
+
+
+def test_cache_hit_and_miss_are_counted():
+    cache = CredentialStatusCache(max_entries=10, ttl_seconds=30)
+
+    assert cache.get("user-1") is None
+    cache.set("user-1", {"is_locked": False, "lock_until": None})
+    assert cache.get("user-1") == {"is_locked": False, "lock_until": None}
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = CredentialStatusCache(max_entries=10, ttl_seconds=30, clock=clock)
+    cache.set("user-1", {"is_locked": False, "lock_until": None})
+
+    clock.now = 29
+    assert cache.get("user-1") is not None
+    clock.now = 31
+    assert cache.get("user-1") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CredentialStatusCache(max_entries=2, ttl_seconds=30)
+    cache.set("user-1", {"is_locked": False, "lock_until": None})
+    cache.set("user-2", {"is_locked": False, "lock_until": None})
+    cache.get("user-1")
+
+    cache.set("user-3", {"is_locked": False, "lock_until": None})
+
+    assert cache.get("user-2") is None
+    assert cache.get("user-1") is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_invalidate_removes_entry():
+    cache = CredentialStatusCache(max_entries=10, ttl_seconds=30)
+    cache.set("user-1", {"is_locked": False, "lock_until": None})
+
+    cache.invalidate("user-1")
+
+    assert cache.get("user-1") is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_get_current_user_queries_db_only_on_miss():
+    mock_db = MagicMock()
+    mock_db.query.return_value.filter.return_value.first.return_value = MagicMock(is_locked=False, lock_until=None, is_blocked=False, is_verified=True)
+    token = create_access_token({"user_id": "user-1", "email": "test@example.com"})
+
+    first = get_current_user(token, mock_db)
+    second = get_current_user(token, mock_db)
+
+    mock_db.query.assert_called_once()
+    assert first == second
+    assert second["is_locked"] is False
+
+def test_get_current_user_rejects_cached_lock():
+    mock_db = MagicMock()
+    credential_cache.set("user-1", {"is_locked": True, "lock_until": datetime.utcnow() + timedelta(minutes=5)})
+    token = create_access_token({"user_id": "user-1", "email": "test@example.com"})
+
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(token, mock_db)
+
+    assert exc.value.status_code == 401
+    mock_db.query.assert_not_called()
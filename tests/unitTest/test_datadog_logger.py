@@ -0,0 +1,172 @@
+import asyncio
+import gzip
+import json
+import httpx
+from middleware.datadog_logger import DatadogLogger, DatadogLoggerMiddleware, parse_sample_rates
+
+
+def make_logger(requests, **kwargs):
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(202)
+
+    dd_logger = DatadogLogger(api_key="test-key", hostname="test-host", **kwargs)
+    dd_logger.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return dd_logger
+
+def decode(request):
+    return json.loads(gzip.decompress(request.content))
+
+
+def test_logs_are_batched_and_gzipped():
+    requests = []
+
+    async def scenario():
+        dd_logger = make_logger(requests, batch_size=10, flush_interval=0.05)
+        for i in range(3):
+            await dd_logger.info(f"message {i}")
+        await asyncio.sleep(0.2)
+        await dd_logger.close()
+        return dd_logger
+
+    dd_logger = asyncio.run(scenario())
+
+    assert len(requests) == 1
+    assert requests[0].headers["Content-Encoding"] == "gzip"
+    assert requests[0].headers["DD-API-KEY"] == "test-key"
+    assert [entry["message"] for entry in decode(requests[0])] == ["message 0", "message 1", "message 2"]
+    assert dd_logger.stats()["sent"] == 3
+
+def test_batch_is_sent_when_full():
+    requests = []
+
+    async def scenario():
+        dd_logger = make_logger(requests, batch_size=2, flush_interval=60)
+        for i in range(4):
+            await dd_logger.info(f"message {i}")
+        await asyncio.sleep(0.05)
+        sent_before_close = len(requests)
+        await dd_logger.close()
+        return sent_before_close
+
+    assert asyncio.run(scenario()) == 2
+    assert [len(decode(request)) for request in requests] == [2, 2]
+
+def test_logging_does_not_wait_for_datadog():
+    requests = []
+
+    async def scenario():
+        dd_logger = make_logger(requests, flush_interval=60)
+        await dd_logger.info("message")
+        sent_before_close = len(requests)
+        await dd_logger.close()
+        return sent_before_close
+
+    assert asyncio.run(scenario()) == 0
+    assert len(requests) == 1
+
+def test_entries_over_queue_size_are_dropped():
+    requests = []
+
+    async def scenario():
+        dd_logger = make_logger(requests, queue_size=2, batch_size=10, flush_interval=60)
+        # enqueueing never yields, so the flusher can't drain in between
+        for i in range(5):
+            await dd_logger.info(f"message {i}")
+        await dd_logger.close()
+        return dd_logger
+
+    dd_logger = asyncio.run(scenario())
+
+    assert dd_logger.stats()["dropped"] == 3
+    assert sum(len(decode(request)) for request in requests) == 2
+
+def test_failed_batches_are_counted():
+    async def scenario():
+        dd_logger = DatadogLogger(api_key="test-key", hostname="test-host", flush_interval=0.01)
+        dd_logger.http_client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+        await dd_logger.error("message")
+        await dd_logger.close()
+        return dd_logger
+
+    assert asyncio.run(scenario()).stats()["failed_batches"] == 1
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.entries = []
+
+    async def log(self, message, status, attributes=None, tags=None):
+        self.entries.append({"message": message, "status": status, "attributes": attributes, "tags": tags})
+
+
+def run_request(middleware, path="/auth/login", status=200, headers=None):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    scope = {
+        "type": "http", "method": "POST", "scheme": "http", "path": path, "query_string": b"",
+        "root_path": "", "server": ("testserver", 80), "client": ("10.0.0.1", 1234),
+        "headers": headers or [(b"host", b"testserver")],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    middleware.app = app
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+
+def test_middleware_logs_request_and_redacts_authorization():
+    dd_logger = RecordingLogger()
+    middleware = DatadogLoggerMiddleware(None, dd_logger, include_paths=[], exclude_paths=[], sample_rates={})
+
+    sent = run_request(middleware, status=401, headers=[(b"host", b"testserver"), (b"authorization", b"Bearer secret")])
+
+    assert sent[0]["status"] == 401
+    entry = dd_logger.entries[0]
+    assert entry["message"] == "POST /auth/login - 401"
+    assert entry["status"] == "error"
+    assert entry["attributes"]["request"]["url"] == "http://testserver/auth/login"
+    assert entry["attributes"]["request"]["headers"]["authorization"] == "[REDACTED]"
+    assert entry["attributes"]["request"]["client"] == "10.0.0.1"
+
+def test_middleware_redacts_the_admin_key():
+    dd_logger = RecordingLogger()
+    middleware = DatadogLoggerMiddleware(None, dd_logger, include_paths=[], exclude_paths=[], sample_rates={})
+
+    run_request(middleware, path="/admin/db-pool", headers=[(b"host", b"testserver"), (b"x-admin-key", b"admin-secret")])
+
+    headers = dd_logger.entries[0]["attributes"]["request"]["headers"]
+    assert headers["x-admin-key"] == "[REDACTED]"
+    assert "admin-secret" not in str(dd_logger.entries[0])
+
+def test_middleware_skips_denied_and_not_allowed_paths():
+    dd_logger = RecordingLogger()
+    middleware = DatadogLoggerMiddleware(None, dd_logger, include_paths=["/auth"], exclude_paths=["/auth/protected"], sample_rates={})
+
+    run_request(middleware, path="/auth/protected")
+    run_request(middleware, path="/admin/db-pool")
+    run_request(middleware, path="/auth/login")
+
+    assert [entry["message"] for entry in dd_logger.entries] == ["POST /auth/login - 200"]
+
+def test_middleware_samples_per_status_class():
+    dd_logger = RecordingLogger()
+    middleware = DatadogLoggerMiddleware(None, dd_logger, include_paths=[], exclude_paths=[], sample_rates={2: 0.1, 4: 0},
+                                         sampler=lambda: 0.5)
+
+    run_request(middleware, status=200)
+    run_request(middleware, status=404)
+    run_request(middleware, status=500)
+
+    assert [entry["attributes"]["response"]["status_code"] for entry in dd_logger.entries] == [500]
+
+def test_sample_rates_are_parsed_from_env_format():
+    assert parse_sample_rates("2xx=0.1, 4xx=1,5xx=1") == {2: 0.1, 4: 1.0, 5: 1.0}
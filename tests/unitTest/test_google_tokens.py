@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from utils.google_tokens import GoogleTokenVerifier, CertsRefreshUnsupported, firebase_refresh_certs
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_verifier(clock, verify=None, **kwargs):
+    verify = verify or MagicMock(side_effect=lambda token: {"email": "user@example.com", "exp": clock.now + 60})
+    return GoogleTokenVerifier(verify=verify, refresh_certs=MagicMock(), clock=clock, **kwargs), verify
+
+
+def test_repeated_token_is_verified_once():
+    verifier, verify = make_verifier(FakeClock())
+
+    first = verifier.verify("token")
+    second = verifier.verify("token")
+
+    assert first == second == {"email": "user@example.com", "exp": first["exp"]}
+    verify.assert_called_once_with("token")
+    assert (verifier.stats()["hits"], verifier.stats()["misses"]) == (1, 1)
+
+def test_cached_token_expires_with_its_exp():
+    clock = FakeClock()
+    verifier, verify = make_verifier(clock, max_ttl=600)
+    verifier.verify("token")
+
+    clock.now += 61
+    verifier.verify("token")
+
+    assert verify.call_count == 2
+
+def test_ttl_is_capped():
+    clock = FakeClock()
+    verify = MagicMock(return_value={"email": "user@example.com", "exp": clock.now + 3600})
+    verifier, _ = make_verifier(clock, verify=verify, max_ttl=10)
+    verifier.verify("token")
+
+    clock.now += 11
+    verifier.verify("token")
+
+    assert verify.call_count == 2
+
+def test_failed_verification_is_not_cached():
+    verify = MagicMock(side_effect=ValueError("invalid"))
+    verifier, _ = make_verifier(FakeClock(), verify=verify)
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            verifier.verify("token")
+
+    assert verify.call_count == 2
+    assert verifier.stats()["entries"] == 0
+
+def test_certs_refresh_errors_are_counted():
+    verifier, _ = make_verifier(FakeClock())
+    verifier._refresh_certs.side_effect = RuntimeError("Google certs answered 503")
+
+    verifier.refresh_certs()
+
+    assert verifier.stats()["certs_refresh_errors"] == 1
+    assert verifier.stats()["last_certs_refresh"] is None
+
+def test_certs_refresh_stops_when_firebase_internals_are_missing():
+    verifier, _ = make_verifier(FakeClock())
+    verifier._refresh_certs.side_effect = CertsRefreshUnsupported("no certs session")
+
+    verifier.start_certs_refresh(interval=0.01)
+    verifier._thread.join(timeout=1)
+
+    assert not verifier._thread.is_alive()
+    verifier._refresh_certs.assert_called_once()
+    assert verifier.stats()["certs_refresh_disabled"] is True
+    assert verifier.stats()["certs_refresh_errors"] == 0
+
+def test_certs_refresh_is_unsupported_without_the_firebase_session():
+    # a client without the private _token_verifier, as after a firebase_admin upgrade
+    with patch("utils.google_tokens.init_firebase"), patch("firebase_admin.auth._get_client", return_value=object()):
+        with pytest.raises(CertsRefreshUnsupported):
+            firebase_refresh_certs()
@@ -0,0 +1,135 @@
+import uuid
+from datetime import datetime, timedelta
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from dbConfig.base import Base
+from models.credential_models import Credential
+from repositories.auth_repository import record_failed_login, reset_login_attempts
+from routes.auth import login
+from routes.async_auth import login as async_login
+from schemas.auth_schemas import UserLogin
+
+MAX_ATTEMPTS = 3
+LOCK_TIME = timedelta(seconds=18)
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def db():
+    # SQLite runs the real conditional UPDATE
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+@pytest.fixture
+def user_id(db):
+    user_id = uuid.uuid4()
+    db.add(Credential(id=user_id, email="test@example.com", hashed_password="hash", failed_attempts=0,
+                      is_locked=False, token_epoch=0))
+    db.commit()
+    return user_id
+
+
+def test_failed_attempts_lock_at_limit(db, user_id):
+    first = record_failed_login(db, user_id, NOW, MAX_ATTEMPTS, LOCK_TIME)
+    second = record_failed_login(db, user_id, NOW, MAX_ATTEMPTS, LOCK_TIME)
+    third = record_failed_login(db, user_id, NOW, MAX_ATTEMPTS, LOCK_TIME)
+
+    assert (first.failed_attempts, first.is_locked) == (1, False)
+    assert (second.failed_attempts, second.is_locked) == (2, False)
+    assert (third.failed_attempts, third.is_locked) == (3, True)
+    assert third.lock_until == NOW + LOCK_TIME
+    assert third.token_epoch == 1
+
+def test_attempts_during_active_lock_write_nothing(db, user_id):
+    for _ in range(MAX_ATTEMPTS):
+        record_failed_login(db, user_id, NOW, MAX_ATTEMPTS, LOCK_TIME)
+
+    result = record_failed_login(db, user_id, NOW + timedelta(seconds=5), MAX_ATTEMPTS, LOCK_TIME)
+
+    user = db.get(Credential, user_id)
+    db.refresh(user)
+    assert result is None
+    assert user.failed_attempts == MAX_ATTEMPTS
+    assert user.lock_until == NOW + LOCK_TIME
+
+def test_expired_lock_restarts_the_count(db, user_id):
+    for _ in range(MAX_ATTEMPTS):
+        record_failed_login(db, user_id, NOW, MAX_ATTEMPTS, LOCK_TIME)
+
+    result = record_failed_login(db, user_id, NOW + LOCK_TIME + timedelta(seconds=1), MAX_ATTEMPTS, LOCK_TIME)
+
+    assert (result.failed_attempts, result.is_locked, result.lock_until) == (1, False, None)
+
+def test_successful_login_with_clean_counters_does_not_write():
+    mock_db = MagicMock()
+    user = Credential(id=uuid.uuid4(), failed_attempts=0, is_locked=False, last_failed_login=None)
+
+    assert reset_login_attempts(mock_db, user) is False
+    mock_db.execute.assert_not_called()
+    mock_db.commit.assert_not_called()
+
+def test_successful_login_resets_previous_failures():
+    mock_db = MagicMock()
+    user = Credential(id=uuid.uuid4(), failed_attempts=2, is_locked=False, last_failed_login=NOW)
+
+    assert reset_login_attempts(mock_db, user) is True
+    mock_db.execute.assert_called_once()
+    mock_db.commit.assert_called_once()
+
+def test_login_while_locked_reports_argentina_time():
+    mock_db = MagicMock()
+    user = Credential(id=uuid.uuid4(), email="test@example.com", is_verified=True, is_blocked=False,
+                      is_locked=True, lock_until=datetime(2099, 1, 1, 15, 0, 0), failed_attempts=3)
+
+    with patch("routes.auth.get_user_by_email", return_value=user), \
+        patch("routes.auth.verify_password") as mock_verify:
+        with pytest.raises(HTTPException) as exc:
+            login(UserLogin(email="test@example.com", password="secret"), mock_db)
+
+    assert exc.value.status_code == 401
+    assert "2099-01-01 12:00:00 (Argentina Time)" in exc.value.detail
+    mock_verify.assert_not_called()
+    mock_db.commit.assert_not_called()
+
+def test_async_login_reports_lock_taken_by_a_concurrent_request():
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        # like AsyncSessionLocal: the loaded user stays in the identity map after commits
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        user_id = uuid.uuid4()
+        async with session_factory() as db:
+            db.add(Credential(id=user_id, email="test@example.com", hashed_password="hash", is_verified=True, is_blocked=False,
+                              failed_attempts=0, is_locked=False, token_epoch=0))
+            await db.commit()
+
+        async def wrong_password_while_another_request_locks(password, hashed_password):
+            async with session_factory() as other:
+                await other.execute(update(Credential).where(Credential.id == user_id)
+                                    .values(is_locked=True, lock_until=datetime(2099, 1, 1, 15, 0, 0), failed_attempts=3))
+                await other.commit()
+            return False
+
+        try:
+            async with session_factory() as db:
+                with patch("routes.async_auth.verify_password_async", AsyncMock(side_effect=wrong_password_while_another_request_locks)):
+                    await async_login(UserLogin(email="test@example.com", password="secret"), db)
+        finally:
+            await engine.dispose()
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(scenario())
+
+    assert exc.value.status_code == 401
+    assert "2099-01-01 12:00:00 (Argentina Time)" in exc.value.detail
@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from fastapi import HTTPException
+from sqlalchemy import select
+from externals.http_client import notifications_client, fan_out_limit
+from externals.resilience import BulkheadFullError
+from models.credential_models import Credential, VerificationPin
+from models.outbox_models import OutboxEvent
+from repositories.outbox_repository import enqueue_event, claim_events
+from schemas.auth_schemas import UserRegister
+from services.auth_services import register_with_outbox
+from services.outbox_dispatcher import OutboxDispatcher, SEND_NOTIFICATION, CREATE_PROFILE, SEND_VERIFICATION_PIN
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def add_event(session_factory, kind=SEND_NOTIFICATION, payload=None):
+    with session_factory() as db:
+        event = enqueue_event(db, kind, payload or {"to": "+5491100000000", "pin": "123456", "channel": "sms"})
+        event.available_at = NOW
+        db.commit()
+        return event.id
+
+def get_event(session_factory, event_id):
+    with session_factory() as db:
+        return db.get(OutboxEvent, event_id)
+
+def make_dispatcher(handler, **kwargs):
+    return OutboxDispatcher(handlers={SEND_NOTIFICATION: handler, CREATE_PROFILE: handler}, clock=lambda: NOW, **kwargs)
+
+def dispatch(dispatcher, session_factory):
+    dispatcher.session_factory = session_factory
+    return asyncio.run(dispatcher.dispatch_once())
+
+
+def test_claimed_events_are_leased(session_factory):
+    add_event(session_factory)
+
+    with session_factory() as db:
+        first = claim_events(db, NOW, 10, timedelta(seconds=60))
+        second = claim_events(db, NOW, 10, timedelta(seconds=60))
+        after_lease = claim_events(db, NOW + timedelta(seconds=61), 10, timedelta(seconds=60))
+
+    assert [row.attempts for row in first] == [1]
+    assert second == []
+    assert [row.attempts for row in after_lease] == [2]
+
+def test_delivered_events_are_marked_sent_with_idempotency_key(session_factory):
+    event_id = add_event(session_factory)
+    keys = []
+
+    async def handler(payload, key):
+        keys.append(key)
+        return True
+
+    dispatcher = make_dispatcher(handler)
+    assert dispatch(dispatcher, session_factory) == 1
+
+    event = get_event(session_factory, event_id)
+    assert (event.status, event.sent_at) == ("sent", NOW)
+    assert keys == [str(event_id)]
+    assert dispatcher.stats()["delivered"] == 1
+
+def test_unavailable_downstream_is_retried_with_backoff(session_factory):
+    event_id = add_event(session_factory)
+
+    async def handler(payload, key):
+        raise HTTPException(status_code=503, detail="Notification service unavailable")
+
+    dispatcher = make_dispatcher(handler, retry_backoff=2)
+    dispatch(dispatcher, session_factory)
+
+    event = get_event(session_factory, event_id)
+    assert (event.status, event.attempts) == ("pending", 1)
+    assert event.available_at == NOW + timedelta(seconds=2)
+    assert event.last_error == "Notification service unavailable"
+
+def test_rejected_event_is_not_retried(session_factory):
+    event_id = add_event(session_factory)
+
+    async def handler(payload, key):
+        raise HTTPException(status_code=400, detail="One or more fields are missing or invalid")
+
+    dispatch(make_dispatcher(handler), session_factory)
+
+    assert get_event(session_factory, event_id).status == "failed"
+
+def test_event_fails_after_max_attempts(session_factory):
+    event_id = add_event(session_factory)
+
+    async def handler(payload, key):
+        return False
+
+    dispatcher = make_dispatcher(handler, max_attempts=1)
+    dispatch(dispatcher, session_factory)
+
+    assert get_event(session_factory, event_id).status == "failed"
+    assert dispatcher.stats()["failed"] == 1
+
+
+def test_register_commits_credential_and_side_effects_together(session_factory):
+    data = UserRegister(email="new@example.com", password="secret123", name="Ana", last_name="Gomez",
+                        role="student", phone="+5491100000000")
+
+    with session_factory() as db, patch("services.auth_services.outbox_dispatcher") as mock_dispatcher:
+        user_id = register_with_outbox(db, data, "hash", "sms").id
+
+    with session_factory() as db:
+        events = db.execute(select(OutboxEvent.kind, OutboxEvent.payload).order_by(OutboxEvent.kind)).all()
+        assert db.get(Credential, user_id).email == "new@example.com"
+        # created on delivery, so retries never send an expired PIN
+        assert db.get(VerificationPin, "new@example.com") is None
+
+    assert [kind for kind, _ in events] == [CREATE_PROFILE, SEND_VERIFICATION_PIN]
+    assert events[0].payload["id"] == str(user_id)
+    assert events[1].payload == {"email": "new@example.com", "to": "+5491100000000", "channel": "sms"}
+    mock_dispatcher.wake.assert_called_once()
+
+def test_deliveries_stay_under_the_bulkhead(session_factory):
+    for _ in range(30):
+        add_event(session_factory)
+    in_flight, peak = 0, 0
+
+    async def handler(payload, key):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return True
+
+    dispatcher = make_dispatcher(handler)
+    assert dispatch(dispatcher, session_factory) == 30
+
+    assert peak == fan_out_limit(notifications_client) < notifications_client.bulkhead.max_concurrent
+    assert dispatcher.stats()["delivered"] == 30
+
+def test_bulkhead_rejection_does_not_use_an_attempt(session_factory):
+    event_id = add_event(session_factory)
+
+    async def handler(payload, key):
+        try:
+            raise BulkheadFullError("Too many concurrent calls to notifications")
+        except BulkheadFullError as e:
+            raise HTTPException(status_code=503, detail=f"Notification service unavailable: {e}")
+
+    dispatcher = make_dispatcher(handler, retry_backoff=2, max_attempts=1)
+    dispatch(dispatcher, session_factory)
+
+    event = get_event(session_factory, event_id)
+    assert (event.status, event.attempts) == ("pending", 0)
+    assert event.available_at == NOW + timedelta(seconds=2)
+    assert dispatcher.stats()["deferred"] == 1
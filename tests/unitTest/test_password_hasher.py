@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from utils.password_hasher import PasswordHasher
+
+
+@pytest.fixture(scope="module")
+def hasher():
+    pool_hasher = PasswordHasher(workers=2, max_pending=4)
+    yield pool_hasher
+    pool_hasher.shutdown()
+
+
+def test_hash_and_verify_on_process_pool(hasher):
+    hashed = hasher.hash("securepass")
+
+    assert hashed != "securepass"
+    assert hasher.verify("securepass", hashed) is True
+    assert hasher.verify("wrongpass", hashed) is False
+    assert hasher.pending == 0
+
+
+def test_async_hash_and_verify(hasher):
+    async def run():
+        hashed = await hasher.hash_async("securepass")
+        return await hasher.verify_async("securepass", hashed)
+
+    assert asyncio.run(run()) is True
+    assert hasher.pending == 0
+
+
+def test_inline_mode_when_no_workers():
+    inline_hasher = PasswordHasher(workers=0, max_pending=1)
+
+    hashed = inline_hasher.hash("securepass")
+
+    assert inline_hasher.verify("securepass", hashed) is True
+    assert inline_hasher._executor is None
+
+
+def test_rejects_with_503_when_queue_is_full():
+    full_hasher = PasswordHasher(workers=0, max_pending=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(password):
+        started.set()
+        release.wait(5)
+        return password
+
+    worker = threading.Thread(target=full_hasher._submit, args=(slow, "pass"))
+    worker.start()
+    started.wait(5)
+
+    with pytest.raises(HTTPException) as exc:
+        full_hasher.hash("other")
+
+    release.set()
+    worker.join()
+
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
+    assert full_hasher.rejected == 1
+    assert full_hasher.pending == 0
@@ -0,0 +1,165 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from dbConfig.base import Base
+from models.credential_models import VerificationPin
+from repositories import auth_repository
+from repositories.pin_store import CachePinStore, StoredPin, ExpiredPinSweeper
+from services.auth_services import verify_recovery_user_pin
+from utils.cache import InMemoryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def store(clock):
+    return CachePinStore(InMemoryCache(max_entries=100, clock=clock), ttl_seconds=60, change_window_seconds=600, clock=clock)
+
+
+def test_saved_pin_is_read_back(store):
+    store.save("test@example.com", "123456", True)
+
+    verification_pin = store.get("test@example.com")
+
+    assert verification_pin.pin == "123456"
+    assert verification_pin.is_valid is True
+    assert verification_pin.can_change is False
+    assert verification_pin.for_password_recovery is True
+    assert verification_pin.incorrect_attempts == 0
+
+def test_pin_expires_without_cleanup(store, clock):
+    store.save("test@example.com", "123456", False)
+
+    clock.now += 61
+
+    assert store.get("test@example.com") is None
+
+def test_invalidate_keeps_original_expiry(store, clock):
+    store.save("test@example.com", "123456", False)
+    clock.now += 30
+
+    store.invalidate("test@example.com")
+
+    assert store.get("test@example.com").is_valid is False
+    clock.now += 31
+    assert store.get("test@example.com") is None
+
+def test_increment_attempts_is_counted_per_call(store):
+    store.save("test@example.com", "123456", True)
+
+    assert store.increment_attempts("test@example.com").incorrect_attempts == 1
+    assert store.increment_attempts("test@example.com").incorrect_attempts == 2
+    assert store.get("test@example.com").incorrect_attempts == 2
+
+def test_new_pin_resets_attempts(store):
+    store.save("test@example.com", "123456", True)
+    store.increment_attempts("test@example.com")
+
+    store.save("test@example.com", "654321", True)
+
+    assert store.get("test@example.com").incorrect_attempts == 0
+
+def test_allow_change_extends_expiry_to_change_window(store, clock):
+    verification_pin = store.save("test@example.com", "123456", True)
+
+    store.allow_change(verification_pin)
+    clock.now += 300
+
+    assert store.get("test@example.com").can_change is True
+
+def test_invalidating_expired_pin_is_a_no_op(store, clock):
+    store.save("test@example.com", "123456", False)
+    clock.now += 61
+
+    store.invalidate("test@example.com")
+
+    assert store.get("test@example.com") is None
+
+def test_invalidate_never_rewrites_the_pin(store):
+    store.save("test@example.com", "123456", False)
+
+    # no read-modify-write: a PIN resent meanwhile can't be overwritten by the one read before it
+    with patch.object(store.backend, "get_many", side_effect=AssertionError("invalidate read the pin")):
+        store.invalidate("test@example.com")
+
+    verification_pin = store.get("test@example.com")
+    assert (verification_pin.pin, verification_pin.is_valid) == ("123456", False)
+
+def test_new_pin_is_valid_after_invalidation(store):
+    store.save("test@example.com", "123456", False)
+    store.invalidate("test@example.com")
+
+    store.save("test@example.com", "654321", False)
+
+    assert store.get("test@example.com").is_valid is True
+
+def test_incrementing_missing_pin_raises_lookup_error(store):
+    with pytest.raises(LookupError):
+        store.increment_attempts("test@example.com")
+
+def test_pin_is_found_whatever_the_email_casing(store):
+    store.save("Ana@Example.com", "123456", False)
+
+    store.increment_attempts("ANA@example.com")
+
+    verification_pin = store.get("ana@example.com")
+    assert (verification_pin.pin, verification_pin.incorrect_attempts) == ("123456", 1)
+
+def test_database_pin_is_found_whatever_the_email_casing():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        auth_repository.create_verification_pin(db, "Ana@Example.com", "123456", False)
+
+        auth_repository.set_pin_invalid(db, "ANA@example.com")
+
+        assert auth_repository.get_verification_pin(db, "ana@example.com").is_valid is False
+    engine.dispose()
+
+def test_sweeper_deletes_only_expired_database_pins():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        db.add_all([
+            VerificationPin(email="old@example.com", pin="123456", created_at=now - timedelta(seconds=120)),
+            VerificationPin(email="new@example.com", pin="123456", created_at=now - timedelta(seconds=30)),
+        ])
+        db.commit()
+
+    assert ExpiredPinSweeper(max_age_seconds=60).sweep(session_factory) == 1
+
+    with session_factory() as db:
+        assert [pin.email for pin in db.query(VerificationPin)] == ["new@example.com"]
+    engine.dispose()
+
+def test_recovery_pin_is_invalidated_when_concurrent_guess_exceeds_limit():
+    mock_db = MagicMock()
+    # read before another request incremented the counter to the limit
+    stale_pin = StoredPin(email="test@example.com", pin="123456", created_at=MagicMock(), expires_at=0,
+                          for_password_recovery=True, incorrect_attempts=2)
+    updated_pin = StoredPin(email="test@example.com", pin="123456", created_at=MagicMock(), expires_at=0,
+                            for_password_recovery=True, incorrect_attempts=4)
+
+    with patch("services.auth_services.get_verification_pin", return_value=stale_pin), \
+        patch("services.auth_services.increase_incorrect_attempts", return_value=updated_pin), \
+        patch("services.auth_services.make_invalid_pin") as mock_make_invalid:
+        with pytest.raises(HTTPException) as exc:
+            verify_recovery_user_pin(mock_db, "test@example.com", "000000")
+
+    mock_make_invalid.assert_called_once_with(mock_db, "test@example.com")
+    assert exc.value.detail == "Invalid verification pin"
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+from dbConfig.pool_stats import PoolStats, instrumented_pool_class
+from utils.metrics import LatencyHistogram
+
+
+@pytest.fixture
+def stats_and_engine(tmp_path):
+    stats = PoolStats()
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=instrumented_pool_class(QueuePool, stats),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    yield stats, engine
+    engine.dispose()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = LatencyHistogram(buckets_ms=(1, 10))
+
+    histogram.observe(0.5)
+    histogram.observe(5)
+    histogram.observe(50)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 3
+    assert snapshot["max_ms"] == 50
+    assert snapshot["buckets"] == {"le_1ms": 1, "le_10ms": 2, "le_inf": 3}
+
+def test_pool_stats_not_configured_before_first_engine():
+    assert PoolStats().snapshot() == {"configured": False}
+
+def test_checkout_is_recorded(stats_and_engine):
+    stats, engine = stats_and_engine
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        snapshot = stats.snapshot()
+        assert snapshot["checked_out"] == 1
+
+    snapshot = stats.snapshot()
+    assert snapshot["checked_out"] == 0
+    assert snapshot["size"] == 1
+    assert snapshot["wait_time"]["count"] == 1
+
+def test_checkout_timeout_is_counted(stats_and_engine):
+    stats, engine = stats_and_engine
+
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    snapshot = stats.snapshot()
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait_time"]["count"] == 2
+    assert snapshot["wait_time"]["max_ms"] >= 50
+
+def test_stats_survive_dispose(stats_and_engine):
+    stats, engine = stats_and_engine
+
+    with engine.connect():
+        pass
+    engine.dispose()
+    with engine.connect():
+        pass
+
+    assert stats.snapshot()["wait_time"]["count"] == 2
@@ -0,0 +1,162 @@
+"""
+Every repository query has to be served by an index. Each case runs repository
+functions against a seeded database, captures the statements they send and
+EXPLAINs them: every table access must be an index search (SQLite "SEARCH",
+a Postgres index scan with an Index Cond). Queries that read every row on
+purpose are listed in FULL_SCANS; they may walk a whole index, but still
+never the table itself.
+
+Runs on SQLite always; set TEST_DATABASE_URL to an empty Postgres database to
+check the Postgres plans as well (with enable_seqscan off, so a Seq Scan in
+the plan means no index could serve the query).
+"""
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from dbConfig.base import Base
+from models.credential_models import Credential, VerificationPin
+from models.outbox_models import OutboxEvent
+from repositories import auth_repository, outbox_repository
+from utils.credential_cache import credential_cache
+from utils.token_epochs import token_epochs
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+USERS = sorted(uuid.uuid4() for _ in range(200))
+NOW = datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def session_factory(request):
+    if request.param == "postgresql" and not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    if request.param == "sqlite":
+        engine = request.getfixturevalue("sqlite_engine")
+    else:
+        engine = create_engine(TEST_DATABASE_URL)
+        Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add_all(
+            Credential(id=user_id, email=f"user{i}@example.com", is_verified=i % 2 == 0,
+                       is_locked=i % 50 == 0, lock_until=NOW + timedelta(minutes=5) if i % 50 == 0 else None)
+            for i, user_id in enumerate(USERS)
+        )
+        db.add_all(VerificationPin(email=f"user{i}@example.com", pin="123456", created_at=NOW - timedelta(minutes=i)) for i in range(0, 200, 4))
+        db.add_all(OutboxEvent(kind="send_notification", payload={}, status="sent" if i % 3 else "pending") for i in range(100))
+        db.commit()
+    yield session_factory
+    if request.param == "postgresql":
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+    credential_cache.clear()
+    token_epochs.clear()
+
+
+@contextmanager
+def captured_statements(engine):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def postgres_plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from postgres_plan_nodes(child)
+
+
+def full_scans(engine, statement, parameters, index_walk_allowed=False):
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            # "SCAN t" reads the table, "SCAN t USING [COVERING] INDEX i" walks the whole index
+            return [line for line in plan if line.startswith("SCAN") and not (index_walk_allowed and "USING" in line)]
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        conn.rollback()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scans = []
+        for node in postgres_plan_nodes(plan[0]["Plan"]):
+            node_type = node["Node Type"]
+            if node_type == "Seq Scan" or ("Index" in node_type and "Index Cond" not in node and not index_walk_allowed):
+                scans.append(f"{node_type} on {node.get('Relation Name', node.get('Index Name'))}")
+        return scans
+
+
+def user_email(i):
+    return f"User{i}@Example.com"  # lookups ignore case
+
+
+def pin_round_trip(db):
+    pin = auth_repository.get_verification_pin(db, "user4@example.com")
+    auth_repository.increase_incorrect_attempts(db, pin.email)
+    auth_repository.pin_can_change(db, pin)
+    auth_repository.set_pin_invalid(db, pin.email)
+    auth_repository.set_new_pin(db, pin.email, "654321", False)
+    auth_repository.delete_verification_pin(db, auth_repository.get_verification_pin(db, pin.email))
+
+
+def outbox_round_trip(db):
+    claimed = outbox_repository.claim_events(db, NOW + timedelta(minutes=1), 10, timedelta(seconds=30))
+    outbox_repository.mark_events_sent(db, [row.id for row in claimed[:5]], NOW)
+    outbox_repository.mark_events_failed(db, [(row.id, NOW, "boom") for row in claimed[5:]])
+
+
+CASES = {
+    "get_user_by_email": lambda db: auth_repository.get_user_by_email(db, user_email(3)),
+    "get_user_by_id": lambda db: auth_repository.get_user_by_id(db, USERS[3]),
+    "get_existing_emails": lambda db: auth_repository.get_existing_emails(db, [user_email(1), "new@example.com"]),
+    "verify_user": lambda db: auth_repository.verify_user(db, user_email(1)),
+    "update_user_password": lambda db: auth_repository.update_user_password(db, user_email(1), "hash"),
+    "block_user": lambda db: (auth_repository.block_user(db, USERS[5]), auth_repository.unblock_user(db, USERS[5])),
+    "record_failed_login": lambda db: auth_repository.record_failed_login(db, USERS[7], NOW, 3, timedelta(minutes=5)),
+    "reset_login_attempts": lambda db: auth_repository.reset_login_attempts(db, auth_repository.get_user_by_id(db, USERS[0])),
+    "count_locked_users": lambda db: auth_repository.count_locked_users(db, NOW),
+    "delete_expired_pins": lambda db: auth_repository.delete_expired_pins(db, NOW - timedelta(minutes=150)),
+    "get_users_page": lambda db: auth_repository.get_users_page(db, USERS[10], 20),
+    "stream_users": lambda db: list(auth_repository.stream_users(db, USERS[10], batch_size=50)),
+    "get_users_status": lambda db: auth_repository.get_users_status(db, USERS[:5]),
+    "set_users_blocked": lambda db: auth_repository.set_users_blocked(db, USERS[:5], True),
+    "delete_user": lambda db: auth_repository.delete_user(db, USERS[9]),
+    "verification_pins": pin_round_trip,
+    "outbox": outbox_round_trip,
+    "count_events_by_status": outbox_repository.count_events_by_status,
+    "stream_all_users": lambda db: list(auth_repository.stream_users(db, batch_size=50)),
+}
+
+# Cases that read every row by design, with the reason
+FULL_SCANS = {
+    "count_events_by_status": "counts every event per status (admin stats)",
+    "stream_all_users": "the unbounded ndjson export of GET /auth",
+}
+
+
+@pytest.mark.parametrize("case", CASES)
+def test_repository_queries_use_indexes(session_factory, case):
+    engine = session_factory.kw["bind"]
+    with captured_statements(engine) as statements, session_factory() as db:
+        CASES[case](db)
+
+    assert statements
+    scans = {statement: full_scans(engine, statement, parameters, case in FULL_SCANS) for statement, parameters in statements}
+    assert {statement: plan for statement, plan in scans.items() if plan} == {}
+
+
+def test_emails_are_unique_regardless_of_case(sqlite_engine):
+    with sessionmaker(bind=sqlite_engine)() as db:
+        db.add_all([Credential(id=uuid.uuid4(), email="ana@example.com"), Credential(id=uuid.uuid4(), email="Ana@Example.com")])
+        with pytest.raises(Exception, match="UNIQUE"):
+            db.commit()
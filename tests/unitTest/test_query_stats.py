@@ -0,0 +1,76 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from dbConfig.query_stats import QueryStats, instrument_engine, redact_parameters
+from middleware.datadog_logger import DatadogLoggerMiddleware
+from middleware.query_stats import QueryStatsMiddleware
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.entries = []
+
+    async def log(self, message, status, attributes=None, tags=None):
+        self.entries.append(attributes)
+
+
+def make_app(engine, queries=3, slow_query_ms=1000, expose_headers=True):
+    stats = instrument_engine(engine, QueryStats(slow_query_ms=slow_query_ms))
+    app = FastAPI()
+
+    # sync handler: runs in the threadpool, like routes.auth
+    @app.get("/users/{email}")
+    def get_user(email: str):
+        with engine.connect() as connection:
+            for _ in range(queries):
+                connection.execute(text("SELECT :email"), {"email": email}).scalar()
+        return {"email": email}
+
+    dd_logger = RecordingLogger()
+    app.add_middleware(DatadogLoggerMiddleware, dd_logger=dd_logger, include_paths=[], exclude_paths=[], sample_rates={})
+    app.add_middleware(QueryStatsMiddleware, expose_headers=expose_headers)
+    return TestClient(app), stats, dd_logger
+
+
+def test_queries_are_counted_per_request(sqlite_engine):
+    client, stats, dd_logger = make_app(sqlite_engine, queries=3)
+
+    first = client.get("/users/a@example.com")
+    second = client.get("/users/b@example.com")
+
+    assert first.headers["x-db-queries"] == second.headers["x-db-queries"] == "3"
+    assert float(first.headers["x-db-time-ms"]) >= 0
+    assert [entry["db"]["queries"] for entry in dd_logger.entries] == [3, 3]
+    assert stats.snapshot()["execute_time"]["count"] == 6
+
+def test_headers_are_not_exposed_by_default(sqlite_engine):
+    client, _, dd_logger = make_app(sqlite_engine, expose_headers=False)
+
+    response = client.get("/users/a@example.com")
+
+    assert "x-db-queries" not in response.headers
+    assert dd_logger.entries[0]["db"]["queries"] == 3
+
+def test_slow_queries_are_logged_without_parameter_values(sqlite_engine, capsys):
+    client, stats, _ = make_app(sqlite_engine, queries=1, slow_query_ms=0)
+
+    client.get("/users/secret@example.com")
+
+    output = capsys.readouterr().out
+    assert "Slow query" in output and "SELECT ?" in output
+    assert "secret@example.com" not in output
+    assert stats.snapshot()["slow_queries"] == 1
+
+def test_parameters_keep_their_shape():
+    assert redact_parameters({"email": "a@example.com", "pin": "123456"}) == {"email": "?", "pin": "?"}
+    assert redact_parameters(("a@example.com", 1)) == ["?", "?"]
+    assert redact_parameters([("a", 1), ("b", 2)]) == "[2 parameter sets]"
+
+def test_queries_outside_requests_are_only_timed():
+    engine = create_engine("sqlite://")
+    stats = instrument_engine(engine, QueryStats())
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    assert stats.snapshot()["execute_time"]["count"] == 1
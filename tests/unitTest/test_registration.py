@@ -0,0 +1,64 @@
+import asyncio
+import time
+from unittest.mock import patch
+import pytest
+from fastapi import HTTPException
+from models.credential_models import Credential, VerificationPin
+from services.auth_services import run_registration_side_effects
+
+PROFILE = {"id": "123", "email": "new@example.com"}
+
+
+def slow(result, delay=0.2):
+    async def call(*args, **kwargs):
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return call
+
+
+def test_side_effects_run_concurrently():
+    with patch("services.auth_services.send_notification_async", slow(True)), \
+        patch("services.auth_services.create_profile_async", slow(True)):
+        started = time.perf_counter()
+        asyncio.run(run_registration_side_effects("+5491100000000", "123456", "sms", PROFILE))
+        elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35
+
+def test_failed_profile_creation_is_reported():
+    with patch("services.auth_services.send_notification_async", slow(True)), \
+        patch("services.auth_services.create_profile_async", slow(False)):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(run_registration_side_effects("+5491100000000", "123456", "sms", PROFILE))
+
+    assert exc.value.detail == "Error creating profile"
+
+def test_slow_step_times_out():
+    with patch("services.auth_services.send_notification_async", slow(True, delay=1)), \
+        patch("services.auth_services.create_profile_async", slow(True)), \
+        patch("services.auth_services.REGISTER_STEP_TIMEOUT_SECONDS", 0.05):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(run_registration_side_effects("+5491100000000", "123456", "sms", PROFILE))
+
+    assert (exc.value.status_code, exc.value.detail) == (504, "Notification timed out")
+
+
+@pytest.fixture
+def client(client):
+    with patch("routes.auth.SIDE_EFFECTS_MODE", "sync"), patch("routes.auth.hash_password", return_value="hash"):
+        yield client
+
+def test_failed_registration_removes_the_credential_and_pin(client, session_factory):
+    unavailable = HTTPException(status_code=503, detail="Notification service unavailable")
+
+    with patch("services.auth_services.send_notification_async", slow(unavailable, delay=0)), \
+        patch("services.auth_services.create_profile_async", slow(True, delay=0)):
+        response = client.post("/auth/register", json={"email": "New@Example.com", "password": "secret123", "name": "Ana",
+                                                        "last_name": "Gomez", "role": "student", "phone": "+5491100000000"})
+
+    assert response.status_code == 503
+    with session_factory() as db:
+        assert db.query(Credential).count() == 0
+        assert db.query(VerificationPin).count() == 0
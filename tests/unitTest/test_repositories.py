@@ -1,8 +1,9 @@
 # tests/unitTest/test_auth_repository.py
 
 from unittest.mock import MagicMock
+import pytest
 from repositories.auth_repository import create_user, get_user_by_email, verify_user
-from repositories.auth_repository import create_verification_pin, get_verification_pin, delete_verification_pin, set_pin_invalid
+from repositories.auth_repository import create_verification_pin, get_verification_pin, delete_verification_pin, set_pin_invalid, increase_incorrect_attempts
 from models.credential_models import Credential, VerificationPin
 from datetime import datetime, timezone
 
@@ -83,7 +84,7 @@ def test_create_verification_pin_returns_model():
     result = create_verification_pin(mock_db, user_email, pin, False)
 
     assert isinstance(result, VerificationPin)
-    assert result.email == user_email
+    assert result.email == user_email.lower()  # stored normalized
     assert result.pin == pin
     assert isinstance(result.created_at, datetime)
     assert result.created_at.tzinfo is not None
@@ -153,30 +154,49 @@ def test_change_is_valid_to_false():
     user_email = "tesEmail@test.com"
     pin = "123456"
 
-    pin_entry = VerificationPin(email=user_email, pin=pin, is_valid=True)
-
-    mock_query = mock_db.query.return_value
-    mock_filter = mock_query.filter.return_value
-    mock_filter.first.return_value = pin_entry
+    mock_db.execute.return_value.first.return_value = (user_email,)
 
     set_pin_invalid(mock_db, user_email)
 
-    assert pin_entry.is_valid is False
+    # un solo UPDATE ... RETURNING, sin SELECT previo ni refresh
+    statement = mock_db.execute.call_args.args[0]
+    assert statement.is_dml and statement.compile().params["is_valid"] is False
     mock_db.commit.assert_called_once()
-    mock_db.refresh.assert_called_once_with(pin_entry)
+    mock_db.query.assert_not_called()
+    mock_db.refresh.assert_not_called()
 
 def test_change_user_to_verified():
     mock_db = MagicMock()
     user_id = "1234567890"
 
-    user = Credential(id=user_id, email="test@example.com", hashed_password="fakehash", is_verified=False)
+    mock_db.execute.return_value.first.return_value = MagicMock(id=user_id)
 
-    # Simulamos la búsqueda del usuario
-    mock_db.query.return_value.filter.return_value.first.return_value = user
-
-    verify_user(mock_db, user_id)
+    verify_user(mock_db, "test@example.com")
 
     # Aserciones
-    assert user.is_verified is True
+    statement = mock_db.execute.call_args.args[0]
+    assert statement.compile().params["is_verified"] is True
     mock_db.commit.assert_called_once()
-    mock_db.refresh.assert_called_once_with(user)
\ No newline at end of file
+    mock_db.refresh.assert_not_called()
+
+
+def test_set_pin_invalid_without_pin_raises_lookup_error():
+    mock_db = MagicMock()
+    mock_db.execute.return_value.first.return_value = None
+
+    with pytest.raises(LookupError):
+        set_pin_invalid(mock_db, "tesEmail@test.com")
+
+    mock_db.rollback.assert_called_once()
+    mock_db.commit.assert_not_called()
+
+def test_increase_incorrect_attempts_increments_in_sql():
+    mock_db = MagicMock()
+    mock_db.execute.return_value.first.return_value = MagicMock(incorrect_attempts=2)
+
+    result = increase_incorrect_attempts(mock_db, "tesEmail@test.com")
+
+    statement = str(mock_db.execute.call_args.args[0].compile())
+    assert "incorrect_attempts=(verification_pins.incorrect_attempts +" in statement
+    assert "RETURNING" in statement
+    assert result.incorrect_attempts == 2
@@ -0,0 +1,128 @@
+import threading
+import httpx
+import pytest
+from fastapi import HTTPException
+import externals.notify_service as notify_service
+from externals.http_client import DownstreamClient
+from externals.resilience import CircuitBreaker, Bulkhead, CircuitOpenError, BulkheadFullError, CLOSED, OPEN, HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock):
+    return CircuitBreaker("notifications", failure_rate=0.5, window_size=4, min_calls=4, open_seconds=30, clock=clock)
+
+
+def test_breaker_opens_at_failure_rate():
+    breaker = make_breaker(FakeClock())
+    for success in (True, False, True):
+        breaker.record(success)
+    assert breaker.state == CLOSED
+
+    breaker.record(False)
+
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["rejected"] == 1
+
+def test_breaker_lets_one_probe_through_after_open_period():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record(False)
+
+    clock.now = 30
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+def test_failed_probe_reopens_the_circuit():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    for _ in range(4):
+        breaker.record(False)
+
+    clock.now = 30
+    breaker.before_call()
+    breaker.record(False)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+
+def test_bulkhead_rejects_over_limit():
+    bulkhead = Bulkhead("users", max_concurrent=2)
+    bulkhead.acquire()
+    bulkhead.acquire()
+
+    with pytest.raises(BulkheadFullError):
+        bulkhead.acquire()
+
+    bulkhead.release()
+    bulkhead.acquire()
+    assert bulkhead.stats() == {"in_flight": 2, "max_concurrent": 2, "rejected": 1}
+
+
+def test_open_circuit_fails_fast_without_calling_downstream():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    client = DownstreamClient("notifications", transport=httpx.MockTransport(handler), max_retries=0,
+                              breaker=make_breaker(FakeClock()))
+    for _ in range(4):
+        client.request("POST", "http://notifications/notifications")
+
+    with pytest.raises(CircuitOpenError):
+        client.request("POST", "http://notifications/notifications")
+
+    assert len(calls) == 4
+    assert client.stats()["circuit"]["state"] == OPEN
+    assert client.stats()["bulkhead"]["in_flight"] == 0
+
+def test_slow_downstream_is_capped_by_bulkhead():
+    release = threading.Event()
+    entered = threading.Event()
+
+    def handler(request):
+        entered.set()
+        release.wait(5)
+        return httpx.Response(200)
+
+    client = DownstreamClient("notifications", transport=httpx.MockTransport(handler), bulkhead=Bulkhead("notifications", 1))
+    worker = threading.Thread(target=client.request, args=("POST", "http://notifications/notifications"))
+    worker.start()
+    entered.wait(5)
+
+    with pytest.raises(BulkheadFullError):
+        client.request("POST", "http://notifications/notifications")
+
+    release.set()
+    worker.join()
+    assert client.stats()["bulkhead"]["rejected"] == 1
+
+def test_rejected_notification_maps_to_503(monkeypatch):
+    breaker = make_breaker(FakeClock())
+    for _ in range(4):
+        breaker.record(False)
+    client = DownstreamClient("notifications", transport=httpx.MockTransport(lambda request: httpx.Response(200)),
+                              breaker=breaker)
+    monkeypatch.setattr(notify_service, "notifications_client", client)
+
+    with pytest.raises(HTTPException) as exc:
+        notify_service.send_notification("+5491100000000", "123456", "sms")
+
+    assert exc.value.status_code == 503
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+from sqlalchemy import create_engine, text, inspect
+from dbConfig.schema import alembic_heads, schema_is_current, ensure_schema
+from utils.openapi_spec import load_openapi, LazyOpenAPI
+
+MIGRATION = '''"""{name}"""
+revision: str = '{revision}'
+down_revision: Union[str, None] = {down_revision}
+'''
+
+
+def write_migrations(tmp_path, *migrations):
+    for revision, down_revision in migrations:
+        (tmp_path / f"{revision}_migration.py").write_text(MIGRATION.format(name=revision, revision=revision, down_revision=down_revision))
+    return str(tmp_path)
+
+
+def test_alembic_heads_follow_down_revisions(tmp_path):
+    versions = write_migrations(tmp_path, ("aaa", "None"), ("bbb", "'aaa'"), ("ccc", "'aaa'"), ("ddd", "('bbb', 'ccc')"))
+
+    assert alembic_heads(versions) == {"ddd"}
+
+def test_create_all_is_skipped_at_head(tmp_path):
+    versions = write_migrations(tmp_path, ("aaa", "None"))
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        connection.execute(text("INSERT INTO alembic_version VALUES ('aaa')"))
+
+    assert schema_is_current(engine, versions)
+    assert ensure_schema(engine, versions) is False
+    assert "credentials" not in inspect(engine).get_table_names()
+
+def test_schema_is_created_without_migrations(tmp_path):
+    versions = write_migrations(tmp_path, ("aaa", "None"))
+    engine = create_engine("sqlite://")
+
+    assert ensure_schema(engine, versions) is True
+    assert "credentials" in inspect(engine).get_table_names()
+
+
+def test_parsed_spec_is_cached_as_json(tmp_path):
+    spec_path = tmp_path / "openapi.yaml"
+    spec_path.write_text("openapi: 3.0.0\npaths:\n  /auth/login: {}\n")
+
+    first = load_openapi(str(spec_path))
+    with patch("yaml.safe_load", side_effect=AssertionError("YAML parsed again")):
+        second = load_openapi(str(spec_path))
+
+    assert first == second == {"openapi": "3.0.0", "paths": {"/auth/login": {}}}
+
+def test_changed_spec_is_parsed_again(tmp_path):
+    spec_path = tmp_path / "openapi.yaml"
+    spec_path.write_text("openapi: 3.0.0\n")
+    load_openapi(str(spec_path))
+
+    spec_path.write_text("openapi: 3.1.0\n")
+
+    assert load_openapi(str(spec_path)) == {"openapi": "3.1.0"}
+
+def test_lazy_spec_loads_on_first_call(tmp_path):
+    spec_path = tmp_path / "openapi.yaml"
+    spec_path.write_text("openapi: 3.0.0\n")
+    openapi = LazyOpenAPI(str(spec_path))
+
+    assert openapi.spec is None
+    assert openapi() is openapi()
@@ -0,0 +1,83 @@
+from unittest.mock import MagicMock, patch
+import pytest
+from fastapi import HTTPException
+from repositories.auth_repository import block_user
+from utils.token_epochs import TokenEpochRegistry, token_epochs
+from utils.security import create_access_token, decode_token, get_current_user
+
+
+@pytest.fixture(autouse=True)
+def clear_epochs():
+    token_epochs.clear()
+    yield
+    token_epochs.clear()
+
+
+def test_unknown_user_accepts_epoch_zero():
+    registry = TokenEpochRegistry()
+
+    assert registry.is_current("user-1", 0) is True
+    assert registry.is_current("user-1", None) is True
+
+def test_bump_rejects_older_epochs():
+    registry = TokenEpochRegistry()
+
+    registry.bump("user-1", 2)
+
+    assert registry.is_current("user-1", 1) is False
+    assert registry.is_current("user-1", 2) is True
+
+def test_merge_never_lowers_an_epoch():
+    registry = TokenEpochRegistry()
+    registry.bump("user-1", 3)
+
+    registry.merge([("user-1", 2), ("user-2", 1)])
+
+    assert registry.get("user-1") == 3
+    assert registry.get("user-2") == 1
+
+def test_sync_reads_epochs_in_bulk_and_closes_session():
+    registry = TokenEpochRegistry()
+    mock_db = MagicMock()
+    mock_db.execute.return_value.all.return_value = [("user-1", 4)]
+
+    registry.sync(lambda: mock_db)
+
+    mock_db.execute.assert_called_once()
+    mock_db.close.assert_called_once()
+    assert registry.get("user-1") == 4
+    assert registry.last_synced_at is not None
+
+def test_token_carries_epoch_claim():
+    token = create_access_token({"user_id": "user-1"}, token_epoch=5)
+
+    assert decode_token(token)["token_epoch"] == 5
+
+def test_decode_rejects_revoked_token():
+    token = create_access_token({"user_id": "user-1"}, token_epoch=0)
+    token_epochs.bump("user-1", 1)
+
+    with pytest.raises(HTTPException) as exc:
+        decode_token(token)
+
+    assert exc.value.status_code == 401
+
+def test_block_user_revokes_existing_tokens():
+    mock_db = MagicMock()
+    mock_db.execute.return_value.first.return_value = MagicMock(id="user-1", token_epoch=1)
+
+    block_user(mock_db, "user-1")
+
+    assert "token_epoch=(credentials.token_epoch +" in str(mock_db.execute.call_args.args[0].compile())
+    assert token_epochs.get("user-1") == 1
+
+def test_stateless_mode_validates_without_db():
+    mock_db = MagicMock()
+    token = create_access_token({"user_id": "user-1", "email": "test@example.com"}, token_epoch=0)
+
+    with patch("utils.security.TOKEN_VALIDATION_MODE", "stateless"):
+        current_user = get_current_user(token, mock_db)
+
+    assert current_user["id"] == "user-1"
+    assert current_user["is_locked"] is False
+    mock_db.query.assert_not_called()
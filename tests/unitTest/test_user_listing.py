@@ -0,0 +1,57 @@
+import json
+import uuid
+from unittest.mock import patch
+import pytest
+from models.credential_models import Credential
+
+IDS = sorted(uuid.uuid4() for _ in range(5))
+
+
+@pytest.fixture
+def session_factory(session_factory):
+    with session_factory() as db:
+        db.add_all(Credential(id=user_id, email=f"user{i}@example.com", is_locked=i == 2) for i, user_id in enumerate(IDS))
+        db.commit()
+    return session_factory
+
+@pytest.fixture
+def client(client, session_factory):
+    # the ndjson export streams from its own session
+    with patch("routes.auth.SessionLocal", session_factory):
+        yield client
+
+
+def test_without_limit_every_user_is_listed(client):
+    response = client.get("/auth")
+
+    assert [user["id"] for user in response.json()] == [str(user_id) for user_id in IDS]
+    assert "x-next-cursor" not in response.headers
+
+def test_pages_follow_the_cursor(client):
+    pages = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/auth", params=params)
+        pages.append([user["id"] for user in response.json()])
+        if "x-next-cursor" not in response.headers:
+            break
+        params["after"] = response.headers["x-next-cursor"]
+
+    assert pages == [[str(IDS[0]), str(IDS[1])], [str(IDS[2]), str(IDS[3])], [str(IDS[4])]]
+
+def test_page_past_the_end_is_empty(client):
+    response = client.get("/auth", params={"after": str(IDS[-1]), "limit": 2})
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+def test_limit_is_bounded(client):
+    assert client.get("/auth", params={"limit": 0}).status_code == 422
+    assert client.get("/auth", params={"limit": 1001}).status_code == 422
+
+def test_ndjson_streams_one_user_per_line(client):
+    response = client.get("/auth", params={"format": "ndjson", "after": str(IDS[0])})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"id": str(user_id), "is_locked": user_id == IDS[2]} for user_id in IDS[1:]]
@@ -1,10 +1,13 @@
+import asyncio
 import os
 import pytest
 from fastapi import HTTPException
 from unittest.mock import patch, MagicMock
 import importlib
 
+import httpx
 import externals.user_service as user_service
+from externals.http_client import DownstreamClient
 
 @pytest.fixture(autouse=True)
 def set_env(monkeypatch):
@@ -12,80 +15,100 @@ def set_env(monkeypatch):
     # Reload module to update prefix
     importlib.reload(user_service)
 
+def mock_users_service(monkeypatch, handler):
+    # the same pooled client, with an in-process transport instead of the network
+    client = DownstreamClient("users", transport=httpx.MockTransport(handler), retry_backoff=0)
+    monkeypatch.setattr(user_service, "users_client", client)
+    return client
+
+def respond(status_code, json=None):
+    return lambda request: httpx.Response(status_code, json=json)
+
+def raise_connect_error(request):
+    raise httpx.ConnectError("Connection error", request=request)
+
 def test_get_user_data_success(monkeypatch):
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.json.return_value = {"id": "123", "name": "Test"}
-    monkeypatch.setattr(user_service.requests, "get", lambda url: mock_response)
+    mock_users_service(monkeypatch, respond(200, {"id": "123", "name": "Test"}))
     result = user_service.get_user_data("123")
     assert result == {"id": "123", "name": "Test"}
 
 def test_get_user_data_404(monkeypatch):
-    mock_response = MagicMock()
-    mock_response.status_code = 404
-    monkeypatch.setattr(user_service.requests, "get", lambda url: mock_response)
+    mock_users_service(monkeypatch, respond(404))
     with pytest.raises(HTTPException) as exc:
         user_service.get_user_data("notfound")
     assert exc.value.status_code == 404
     assert exc.value.detail == "User not found"
 
 def test_get_user_data_400(monkeypatch):
-    mock_response = MagicMock()
-    mock_response.status_code = 400
-    monkeypatch.setattr(user_service.requests, "get", lambda url: mock_response)
+    mock_users_service(monkeypatch, respond(400))
     with pytest.raises(HTTPException) as exc:
         user_service.get_user_data("bad")
     assert exc.value.status_code == 400
     assert exc.value.detail == "One or more fields are missing or invalid"
 
 def test_get_user_data_request_exception(monkeypatch):
-    def raise_exc(url):
-        raise user_service.requests.RequestException("Connection error")
-    monkeypatch.setattr(user_service.requests, "get", raise_exc)
+    mock_users_service(monkeypatch, raise_connect_error)
     with pytest.raises(HTTPException) as exc:
         user_service.get_user_data("123")
     assert exc.value.status_code == 503
     assert "Notification service unavailable" in exc.value.detail
 
 def test_update_user_data_success(monkeypatch):
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    monkeypatch.setattr(user_service.requests, "patch", lambda url, json: mock_response)
+    mock_users_service(monkeypatch, respond(200))
     result = user_service.update_user_data("123", {"name": "New"})
     assert result is True
 
 def test_update_user_data_404(monkeypatch):
-    mock_response = MagicMock()
-    mock_response.status_code = 404
-    monkeypatch.setattr(user_service.requests, "patch", lambda url, json: mock_response)
+    mock_users_service(monkeypatch, respond(404))
     with pytest.raises(HTTPException) as exc:
         user_service.update_user_data("notfound", {"name": "New"})
     assert exc.value.status_code == 404
     assert exc.value.detail == "User not found"
 
 def test_update_user_data_400(monkeypatch):
-    mock_response = MagicMock()
-    mock_response.status_code = 400
-    monkeypatch.setattr(user_service.requests, "patch", lambda url, json: mock_response)
+    mock_users_service(monkeypatch, respond(400))
     with pytest.raises(HTTPException) as exc:
         user_service.update_user_data("bad", {"name": "New"})
     assert exc.value.status_code == 400
     assert exc.value.detail == "One or more fields are missing or invalid"
 
 def test_update_user_data_422(monkeypatch):
-    mock_response = MagicMock()
-    mock_response.status_code = 422
-    monkeypatch.setattr(user_service.requests, "patch", lambda url, json: mock_response)
+    mock_users_service(monkeypatch, respond(422))
     with pytest.raises(HTTPException) as exc:
         user_service.update_user_data("unauth", {"name": "New"})
     assert exc.value.status_code == 403
     assert exc.value.detail == "User not authorized to update this data"
 
 def test_update_user_data_request_exception(monkeypatch):
-    def raise_exc(url, json):
-        raise user_service.requests.RequestException("Connection error")
-    monkeypatch.setattr(user_service.requests, "patch", raise_exc)
+    mock_users_service(monkeypatch, raise_connect_error)
     with pytest.raises(HTTPException) as exc:
         user_service.update_user_data("123", {"name": "New"})
     assert exc.value.status_code == 503
-    assert "Notification service unavailable" in exc.value.detail
\ No newline at end of file
+    assert "Notification service unavailable" in exc.value.detail
+
+def test_get_user_data_retries_transient_errors(monkeypatch):
+    responses = iter([httpx.Response(503), httpx.Response(200, json={"id": "123"})])
+    client = mock_users_service(monkeypatch, lambda request: next(responses))
+
+    assert user_service.get_user_data("123") == {"id": "123"}
+    assert client.stats()["retries"] == 1
+    assert client.stats()["latency"]["count"] == 2
+
+def test_update_user_data_is_not_retried_after_sending(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    mock_users_service(monkeypatch, handler)
+
+    user_service.update_user_data("123", {"name": "New"})
+
+    assert len(calls) == 1
+
+def test_get_user_data_async(monkeypatch):
+    client = DownstreamClient("users", async_transport=httpx.MockTransport(respond(200, {"id": "123"})))
+    monkeypatch.setattr(user_service, "users_client", client)
+
+    assert asyncio.run(user_service.get_user_data_async("123")) == {"id": "123"}
@@ -0,0 +1,74 @@
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytest
+from sqlalchemy.dialects import postgresql
+from models.credential_models import Credential
+from repositories.auth_repository import block_user, users_status_query
+import services.auth_services as auth_services
+
+ACTIVE, BLOCKED, LOCKED, LOCK_EXPIRED, UNVERIFIED = (uuid.uuid4() for _ in range(5))
+
+
+@pytest.fixture
+def session_factory(session_factory):
+    now = datetime.utcnow()
+    with session_factory() as db:
+        db.add_all([
+            Credential(id=ACTIVE, email="active@example.com", is_verified=True),
+            Credential(id=BLOCKED, email="blocked@example.com", is_verified=True, is_blocked=True),
+            Credential(id=LOCKED, email="locked@example.com", is_verified=True, is_locked=True, lock_until=now + timedelta(minutes=5)),
+            Credential(id=LOCK_EXPIRED, email="expired@example.com", is_verified=True, is_locked=True, lock_until=now - timedelta(minutes=5)),
+            Credential(id=UNVERIFIED, email="unverified@example.com", is_verified=False),
+        ])
+        db.commit()
+    return session_factory
+
+def batch(client, *user_ids):
+    return client.post("/auth/users/status:batch", json={"user_ids": [str(user_id) for user_id in user_ids]})
+
+
+def test_statuses_are_returned_in_request_order(client):
+    unknown = uuid.uuid4()
+
+    response = batch(client, UNVERIFIED, unknown, LOCK_EXPIRED, LOCKED, BLOCKED, ACTIVE)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "users": [
+            {"id": str(UNVERIFIED), "is_locked": False, "is_blocked": False, "is_verified": False},
+            {"id": str(LOCK_EXPIRED), "is_locked": False, "is_blocked": False, "is_verified": True},
+            {"id": str(LOCKED), "is_locked": True, "is_blocked": False, "is_verified": True},
+            {"id": str(BLOCKED), "is_locked": False, "is_blocked": True, "is_verified": True},
+            {"id": str(ACTIVE), "is_locked": False, "is_blocked": False, "is_verified": True},
+        ],
+        "not_found": [str(unknown)],
+    }
+
+def test_only_uncached_users_are_queried(client):
+    batch(client, ACTIVE, BLOCKED)
+
+    with patch("services.auth_services.get_users_status", wraps=auth_services.get_users_status) as get_users_status:
+        batch(client, ACTIVE, BLOCKED)
+        batch(client, ACTIVE, LOCKED, ACTIVE)
+
+    assert get_users_status.call_count == 1
+    assert get_users_status.call_args.args[1] == [LOCKED]
+
+def test_blocking_invalidates_the_cached_status(client, session_factory):
+    batch(client, ACTIVE)
+
+    with session_factory() as db:
+        block_user(db, ACTIVE)
+
+    assert batch(client, ACTIVE).json()["users"][0]["is_blocked"] is True
+
+def test_batch_size_is_bounded(client):
+    assert client.post("/auth/users/status:batch", json={"user_ids": []}).status_code == 422
+    assert batch(client, *(uuid.uuid4() for _ in range(1001))).status_code == 422
+    assert client.post("/auth/users/status:batch", json={"user_ids": ["not-a-uuid"]}).status_code == 422
+
+def test_postgres_query_binds_a_single_array():
+    sql = str(users_status_query("postgresql", [ACTIVE, BLOCKED]).compile(dialect=postgresql.dialect()))
+
+    assert "= ANY (%(user_ids)s::UUID[])" in sql
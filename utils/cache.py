@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+import redis
+
+# memory:// keeps everything in this process; redis://[:password@]host[:port][/db]
+# shares it between replicas (any server speaking the Redis protocol works)
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 50000))
+CACHE_TIMEOUT_SECONDS = float(os.getenv("CACHE_TIMEOUT_SECONDS", 0.5))
+
+
+class CacheError(Exception):
+    pass
+
+
+class CacheBackend:
+    """
+    Key/value store for short-lived auth state. Values are strings (callers
+    serialize), `ttl` is in seconds and None means no expiry.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None):
+        for key, value in items.items():
+            self.set(key, value, ttl)
+
+    def delete(self, *keys: str):
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add `amount`; a missing key starts at 0 and gets `ttl`, an existing one keeps its expiry."""
+        raise NotImplementedError
+
+    def expire(self, key: str, ttl: float) -> bool:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryCache(CacheBackend):
+    """Process-local backend: LRU-bounded dict with per-key expiry."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        return None if ttl is None else self._clock() + ttl
+
+    def _get_live(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: str, expires_at: Optional[float], value: str):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._get_live(key)
+            return None if entry is None else entry[1]
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        with self._lock:
+            return [None if (entry := self._get_live(key)) is None else entry[1] for key in keys]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._lock:
+            self._put(key, self._expires_at(ttl), value)
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            entry = self._get_live(key)
+            if entry is None:
+                expires_at, value = self._expires_at(ttl), amount
+            else:
+                expires_at, value = entry[0], int(entry[1]) + amount
+            self._put(key, expires_at, str(value))
+            return value
+
+    def expire(self, key: str, ttl: float) -> bool:
+        with self._lock:
+            entry = self._get_live(key)
+            if entry is None:
+                return False
+            self._put(key, self._expires_at(ttl), entry[1])
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "entries": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class RedisCache(CacheBackend):
+    """
+    Redis (or any server speaking its protocol) through redis-py's pooled
+    client. Multi-key operations are a single command or a pipeline, so a
+    multi-get or an increment-with-expiry costs one round trip.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 timeout: float = CACHE_TIMEOUT_SECONDS, client: Optional[redis.Redis] = None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.client = client or redis.Redis(host=host, port=port, db=db, password=password, socket_timeout=timeout,
+                                            socket_connect_timeout=timeout, decode_responses=True)
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisCache":
+        # parsed here rather than by redis.from_url, which doesn't know valkey://
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(host=parsed.hostname or "localhost", port=parsed.port or 6379, db=db, password=parsed.password, **kwargs)
+
+    @contextmanager
+    def _errors(self):
+        try:
+            yield
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            self.errors += 1
+            raise CacheError(f"Cache server unavailable: {e}") from e
+        except redis.RedisError as e:
+            raise CacheError(str(e)) from e
+
+    def get(self, key: str) -> Optional[str]:
+        with self._errors():
+            return self.client.get(key)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        with self._errors():
+            return self.client.mget(keys)
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return None if ttl is None else max(int(ttl * 1000), 1)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._errors():
+            self.client.set(key, value, px=self._px(ttl))
+
+    def set_many(self, items: Dict[str, str], ttl: Optional[float] = None):
+        # pipelined: one round trip whatever the number of keys
+        if not items:
+            return
+        with self._errors():
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(key, value, px=self._px(ttl))
+            pipe.execute()
+
+    def delete(self, *keys: str):
+        if keys:
+            with self._errors():
+                self.client.delete(*keys)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._errors():
+            if ttl is None:
+                return self.client.incrby(key, amount)
+            # SET NX only creates the key (with its expiry) when missing; MULTI keeps both steps atomic
+            pipe = self.client.pipeline(transaction=True)
+            pipe.set(key, 0, px=self._px(ttl), nx=True)
+            pipe.incrby(key, amount)
+            return pipe.execute()[1]
+
+    def expire(self, key: str, ttl: float) -> bool:
+        with self._errors():
+            return bool(self.client.pexpire(key, self._px(ttl)))
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "host": self.host, "port": self.port, "db": self.db, "connection_errors": self.errors}
+
+
+def create_cache(url: str = CACHE_URL) -> CacheBackend:
+    scheme = urlparse(url).scheme
+    if scheme in ("redis", "valkey"):
+        return RedisCache.from_url(url)
+    if scheme in ("memory", ""):
+        return InMemoryCache()
+    raise ValueError(f"Unsupported CACHE_URL scheme: {scheme}")
+
+
+cache = create_cache()
@@ -0,0 +1,138 @@
+import json
+import os
+import time
+from datetime import datetime
+from typing import Callable, Optional
+from utils.cache import CacheBackend, CacheError, InMemoryCache, cache
+from models.credential_models import Credential
+
+CREDENTIAL_CACHE_MAX_ENTRIES = int(os.getenv("CREDENTIAL_CACHE_MAX_ENTRIES", 10000))
+CREDENTIAL_CACHE_TTL_SECONDS = float(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", 30))
+CREDENTIAL_CACHE_PREFIX = "auth:credential-status:"
+CREDENTIAL_STATUS_COLUMNS = (Credential.is_locked, Credential.lock_until, Credential.is_blocked, Credential.is_verified)
+
+
+def status_from_row(row) -> dict:
+    """Cache entry for a row selected with CREDENTIAL_STATUS_COLUMNS."""
+    return {"is_locked": row.is_locked, "lock_until": row.lock_until, "is_blocked": row.is_blocked, "is_verified": row.is_verified}
+
+
+class CredentialStatusCache:
+    """
+    TTL cache of the account state (`is_locked`, `lock_until`,
+    `is_blocked`, `is_verified`) that get_current_user checks on every
+    authenticated request and POST /auth/users/status:batch returns.
+    Writers that change that state must call `invalidate`; the TTL only
+    bounds how stale an entry can get if one is missed.
+
+    Entries live in a CacheBackend: with the shared (Redis) backend an
+    invalidation on one replica is seen by all of them. Without a backend a
+    private LRU-bounded in-memory one is used. Backend failures count as
+    misses so the caller falls back to the database.
+    """
+
+    def __init__(self, max_entries: int = CREDENTIAL_CACHE_MAX_ENTRIES, ttl_seconds: float = CREDENTIAL_CACHE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic, backend: Optional[CacheBackend] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend if backend is not None else InMemoryCache(max_entries=max_entries, clock=clock)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @staticmethod
+    def _key(user_id) -> str:
+        return f"{CREDENTIAL_CACHE_PREFIX}{user_id}"
+
+    @staticmethod
+    def _dump(status: dict) -> str:
+        lock_until = status.get("lock_until")
+        return json.dumps({**status, "lock_until": lock_until.isoformat() if lock_until else None})
+
+    @staticmethod
+    def _load(raw: str) -> dict:
+        status = json.loads(raw)
+        if status["lock_until"]:
+            status["lock_until"] = datetime.fromisoformat(status["lock_until"])
+        return status
+
+    def get(self, user_id) -> Optional[dict]:
+        try:
+            raw = self.backend.get(self._key(user_id))
+        except CacheError as e:
+            self.errors += 1
+            print(f"Credential cache unavailable: {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._load(raw)
+
+    def get_many(self, user_ids) -> dict:
+        """Status of every cached user among `user_ids` (one backend round trip)."""
+        user_ids = [str(user_id) for user_id in user_ids]
+        try:
+            raws = self.backend.get_many([self._key(user_id) for user_id in user_ids])
+        except CacheError as e:
+            self.errors += 1
+            print(f"Credential cache unavailable: {e}")
+            raws = [None] * len(user_ids)
+        found = {user_id: self._load(raw) for user_id, raw in zip(user_ids, raws) if raw is not None}
+        self.hits += len(found)
+        self.misses += len(user_ids) - len(found)
+        return found
+
+    def set(self, user_id, status: dict):
+        try:
+            self.backend.set(self._key(user_id), self._dump(status), ttl=self.ttl_seconds)
+        except CacheError as e:
+            self.errors += 1
+            print(f"Credential cache unavailable: {e}")
+
+    def set_many(self, statuses: dict):
+        try:
+            self.backend.set_many({self._key(user_id): self._dump(status) for user_id, status in statuses.items()}, ttl=self.ttl_seconds)
+        except CacheError as e:
+            self.errors += 1
+            print(f"Credential cache unavailable: {e}")
+
+    def invalidate(self, user_id):
+        try:
+            self.backend.delete(self._key(user_id))
+            self.invalidations += 1
+        except CacheError as e:
+            # the entry expires by itself after ttl_seconds
+            self.errors += 1
+            print(f"Error invalidating credential cache for {user_id}: {e}")
+
+    def invalidate_many(self, user_ids):
+        keys = [self._key(user_id) for user_id in user_ids]
+        if not keys:
+            return
+        try:
+            self.backend.delete(*keys)
+            self.invalidations += len(keys)
+        except CacheError as e:
+            self.errors += 1
+            print(f"Error invalidating credential cache for {len(keys)} users: {e}")
+
+    def clear(self):
+        if isinstance(self.backend, InMemoryCache):
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            **self.backend.stats(),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+credential_cache = CredentialStatusCache(backend=None if isinstance(cache, InMemoryCache) else cache)
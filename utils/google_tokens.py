@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+from utils.cache import InMemoryCache
+
+GOOGLE_TOKEN_CACHE_SIZE = int(os.getenv("GOOGLE_TOKEN_CACHE_SIZE", 10000))
+GOOGLE_TOKEN_CACHE_MAX_TTL_SECONDS = float(os.getenv("GOOGLE_TOKEN_CACHE_MAX_TTL_SECONDS", 600))
+GOOGLE_CERTS_REFRESH_SECONDS = float(os.getenv("GOOGLE_CERTS_REFRESH_SECONDS", 3600))
+FIREBASE_CREDENTIALS_PATH = os.getenv("FIREBASE_CREDENTIALS_PATH", "firebaseKeys.json")
+
+_firebase_lock = threading.Lock()
+
+
+class InvalidGoogleTokenError(Exception):
+    pass
+
+
+class CertsRefreshUnsupported(Exception):
+    pass
+
+
+def init_firebase():
+    # Initialized on first use (or by the certs refresh thread right after
+    # startup) instead of when routes.auth is imported
+    import firebase_admin
+    from firebase_admin import credentials
+    with _firebase_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            return firebase_admin.initialize_app(credentials.Certificate(FIREBASE_CREDENTIALS_PATH))
+
+
+def firebase_verify(token: str) -> dict:
+    from firebase_admin import auth
+    init_firebase()
+    try:
+        return auth.verify_id_token(token)
+    except auth.InvalidIdTokenError as e:
+        raise InvalidGoogleTokenError(str(e)) from e
+
+
+def firebase_refresh_certs():
+    # firebase_admin keeps the Google certs in a CacheControl session and
+    # refetches them on the first verification after max-age. A no-cache
+    # request through that same session stores fresh certs ahead of time.
+    # The session isn't public API: if a firebase_admin upgrade moves it the
+    # refresh is turned off and certs are fetched on demand again.
+    import firebase_admin
+    from firebase_admin import auth
+    init_firebase()
+    try:
+        from firebase_admin._token_gen import ID_TOKEN_CERT_URI
+        request = auth._get_client(None)._token_verifier.request
+    except (ImportError, AttributeError) as e:
+        raise CertsRefreshUnsupported(f"firebase_admin {firebase_admin.__version__} doesn't expose its certs session: {e}") from e
+    response = request(ID_TOKEN_CERT_URI, method="GET", headers={"Cache-Control": "no-cache"})
+    if response.status != 200:
+        raise RuntimeError(f"Google certs answered {response.status}")
+
+
+class GoogleTokenVerifier:
+    """
+    Caches verified Firebase ID tokens in memory, keyed by the SHA-256 of
+    the token, until the token's own `exp` (capped at `max_ttl`). The
+    mobile app calls check-google-user and then google with the same token,
+    so the second call skips the signature check. Failed verifications are
+    never cached. A background thread refreshes Google's public certs so
+    fetching them never happens inside a login request.
+    """
+
+    def __init__(self, verify: Callable[[str], dict] = firebase_verify, refresh_certs: Callable[[], None] = firebase_refresh_certs,
+                 max_entries: int = GOOGLE_TOKEN_CACHE_SIZE, max_ttl: float = GOOGLE_TOKEN_CACHE_MAX_TTL_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        self._verify = verify
+        self._refresh_certs = refresh_certs
+        self.max_ttl = max_ttl
+        self.clock = clock
+        self.cache = InMemoryCache(max_entries, clock=clock)
+        self.hits = 0
+        self.misses = 0
+        self.last_certs_refresh: Optional[float] = None
+        self.certs_refresh_errors = 0
+        self.certs_refresh_disabled = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def verify(self, token: str) -> dict:
+        key = hashlib.sha256(token.encode()).hexdigest()
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return json.loads(cached)
+
+        self.misses += 1
+        claims = self._verify(token)
+        ttl = min(claims.get("exp", 0) - self.clock(), self.max_ttl)
+        if ttl > 0:
+            self.cache.set(key, json.dumps(claims), ttl=ttl)
+        return claims
+
+    def refresh_certs(self):
+        try:
+            self._refresh_certs()
+            self.last_certs_refresh = time.time()
+        except CertsRefreshUnsupported as e:
+            # retrying can't help: stop the loop instead of failing every interval
+            self.certs_refresh_disabled = True
+            self._stop.set()
+            print(f"Google certs refresh disabled: {e}")
+        except Exception as e:
+            self.certs_refresh_errors += 1
+            print(f"Error refreshing Google certs: {e}")
+
+    def _refresh_loop(self, interval: float):
+        self.refresh_certs()
+        while not self._stop.wait(interval):
+            self.refresh_certs()
+
+    def start_certs_refresh(self, interval: float = GOOGLE_CERTS_REFRESH_SECONDS):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, args=(interval,), name="google-certs-refresh", daemon=True)
+        self._thread.start()
+
+    def stop_certs_refresh(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            **self.cache.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "last_certs_refresh": self.last_certs_refresh,
+            "certs_refresh_errors": self.certs_refresh_errors,
+            "certs_refresh_disabled": self.certs_refresh_disabled,
+        }
+
+    def clear(self):
+        self.cache.clear()
+
+
+google_tokens = GoogleTokenVerifier()
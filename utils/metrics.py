@@ -0,0 +1,49 @@
+import threading
+from typing import Sequence
+
+DEFAULT_LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram in milliseconds, safe to share between threads."""
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(sorted(buckets_ms))
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        with self._lock:
+            self._count += 1
+            self._sum_ms += value_ms
+            self._max_ms = max(self._max_ms, value_ms)
+            for i, bound in enumerate(self.buckets_ms):
+                if value_ms <= bound:
+                    self._counts[i] += 1
+                    return
+            self._counts[-1] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets_ms) + 1)
+            self._count = 0
+            self._sum_ms = 0.0
+            self._max_ms = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(self.buckets_ms, self._counts):
+                cumulative += count
+                buckets[f"le_{bound}ms"] = cumulative
+            buckets["le_inf"] = self._count
+            return {
+                "count": self._count,
+                "avg_ms": round(self._sum_ms / self._count, 3) if self._count else 0.0,
+                "max_ms": round(self._max_ms, 3),
+                "buckets": buckets,
+            }
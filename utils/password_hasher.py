@@ -0,0 +1,134 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from fastapi import HTTPException, status
+
+from utils.security import pwd_context
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", max(PASSWORD_HASH_WORKERS, 1) * 8))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = 1
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain: str, hashed: str) -> bool:
+    return pwd_context.verify(plain, hashed)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a process pool so hashing scales with cores instead of
+    holding the GIL inside request handlers. At most `max_pending` jobs may be
+    queued or running; beyond that callers get a 503 right away.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs the threadpool is not safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many password operations in progress, try again later",
+                    headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+                )
+            self.pending += 1
+
+    def _release(self, *_):
+        with self._lock:
+            self.pending -= 1
+
+    def _submit(self, fn, *args):
+        self._acquire()
+        if self.workers <= 0:
+            try:
+                return None, fn(*args)
+            finally:
+                self._release()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future, None
+
+    def hash(self, password: str) -> str:
+        future, result = self._submit(_hash, password)
+        return future.result() if future else result
+
+    def verify(self, plain: str, hashed: str) -> bool:
+        future, result = self._submit(_verify, plain, hashed)
+        return future.result() if future else result
+
+    async def hash_async(self, password: str) -> str:
+        future, result = self._submit(_hash, password)
+        return await asyncio.wrap_future(future) if future else result
+
+    async def verify_async(self, plain: str, hashed: str) -> bool:
+        future, result = self._submit(_verify, plain, hashed)
+        return await asyncio.wrap_future(future) if future else result
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        # For batch jobs (bulk import), not requests: the whole list is spread
+        # over the pool at once, outside the max_pending limit
+        if self.workers <= 0:
+            return [_hash(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._get_executor().map(_hash, passwords, chunksize=chunksize))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+
+
+def hash_password(password: str) -> str:
+    return password_hasher.hash(password)
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    return password_hasher.verify(plain, hashed)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_hasher.hash_async(password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await password_hasher.verify_async(plain, hashed)
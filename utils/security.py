@@ -1,14 +1,20 @@
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+import hmac
 import os
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose.exceptions import ExpiredSignatureError
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from dbConfig.session import get_db
+from dbConfig.async_session import get_async_db
 
 from models.credential_models import Credential
+from utils.credential_cache import credential_cache, CREDENTIAL_STATUS_COLUMNS, status_from_row
+from utils.token_epochs import token_epochs
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -16,7 +22,13 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 200
+# "db": get_current_user reads the lock state (cached) from credentials.
+# "stateless": the token's epoch claim is trusted once it matches the
+# in-memory epoch map, so validating a token runs no query at all.
+TOKEN_VALIDATION_MODE = os.getenv("TOKEN_VALIDATION_MODE", "db")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Service credential for /admin (sent as X-Admin-Key). Unset: /admin answers 403 to everyone.
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -24,17 +36,20 @@ def hash_password(password: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
-def create_access_token(data: dict, expires_delta: timedelta = None):
+def require_admin_key(x_admin_key: str = Header(None)):
+    if not ADMIN_API_KEY or not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin key required")
+
+def create_access_token(data: dict, expires_delta: timedelta = None, token_epoch: int = 0):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "token_epoch": token_epoch or 0})
 
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except ExpiredSignatureError:
         raise HTTPException(
             status_code=401,
@@ -46,11 +61,35 @@ def decode_token(token: str):
             detail="Token inválido."
         )
 
+    user_id = payload.get("user_id")
+    if user_id is not None and not token_epochs.is_current(user_id, payload.get("token_epoch")):
+        raise HTTPException(
+            status_code=401,
+            detail="La sesión fue revocada. Por favor, inicia sesión de nuevo."
+        )
+    return payload
+
 
 def get_token_expiry():
     return timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
 
+# A token whose epoch is current was issued to an unlocked user and hasn't been revoked by a lock since
+STATELESS_CREDENTIAL_STATUS = {"is_locked": False, "lock_until": None}
+
+
+def _authenticated_user(user_id: str, payload: dict, credential_status: dict) -> dict:
+    lock_until = credential_status["lock_until"]
+    if credential_status["is_locked"] and lock_until and lock_until > datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Cuenta bloqueada. Intenta nuevamente más tarde.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return {"id": user_id, "email": payload.get("email"), "is_locked": credential_status["is_locked"], "lock_until": lock_until}
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,15 +104,18 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
 
         # Verificar si la cuenta está bloqueada
-        user = db.query(Credential).filter(Credential.id == user_id).first()
-        if user.is_locked and user.lock_until > datetime.utcnow():
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Cuenta bloqueada. Intenta nuevamente más tarde.",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+        if TOKEN_VALIDATION_MODE == "stateless":
+            return _authenticated_user(user_id, payload, STATELESS_CREDENTIAL_STATUS)
+
+        credential_status = credential_cache.get(user_id)
+        if credential_status is None:
+            row = db.query(*CREDENTIAL_STATUS_COLUMNS).filter(Credential.id == user_id).first()
+            if row is None:
+                raise credentials_exception
+            credential_status = status_from_row(row)
+            credential_cache.set(user_id, credential_status)
 
-        return {"id": user_id, "email": payload.get("email"), "is_locked": user.is_locked, "lock_until": user.lock_until}
+        return _authenticated_user(user_id, payload, credential_status)
 
     except ExpiredSignatureError:
         raise HTTPException(
@@ -82,4 +124,40 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
     except JWTError:
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token inválido",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    try:
+        payload = decode_token(token)
+        user_id: str = payload.get("user_id")
+        if user_id is None:
+            raise credentials_exception
+
+        if TOKEN_VALIDATION_MODE == "stateless":
+            return _authenticated_user(user_id, payload, STATELESS_CREDENTIAL_STATUS)
+
+        credential_status = credential_cache.get(user_id)
+        if credential_status is None:
+            result = await db.execute(select(*CREDENTIAL_STATUS_COLUMNS).where(Credential.id == user_id))
+            row = result.first()
+            if row is None:
+                raise credentials_exception
+            credential_status = status_from_row(row)
+            credential_cache.set(user_id, credential_status)
+
+        return _authenticated_user(user_id, payload, credential_status)
+
+    except ExpiredSignatureError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except JWTError:
+        raise credentials_exception
@@ -0,0 +1,39 @@
+import os
+import time
+
+# "eager" (default) checks the schema and parses openapi.yaml at import,
+# "lazy" checks the schema in a startup hook and loads the spec on first use
+STARTUP_MODE = os.getenv("STARTUP_MODE", "eager")
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", 1000))
+
+
+class StartupTimer:
+    """Import and startup-hook timings of this process, checked against a budget."""
+
+    def __init__(self, budget_ms: float = STARTUP_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.started_at = time.perf_counter()
+        self.imported_ms = None
+        self.ready_ms = None
+
+    def imported(self):
+        self.imported_ms = round((time.perf_counter() - self.started_at) * 1000, 1)
+
+    def ready(self):
+        self.ready_ms = round((time.perf_counter() - self.started_at) * 1000, 1)
+        if self.ready_ms > self.budget_ms:
+            print(f"Startup took {self.ready_ms}ms, over the {self.budget_ms}ms budget")
+        else:
+            print(f"Startup took {self.ready_ms}ms")
+
+    def stats(self) -> dict:
+        return {
+            "mode": STARTUP_MODE,
+            "import_ms": self.imported_ms,
+            "ready_ms": self.ready_ms,
+            "budget_ms": self.budget_ms,
+            "within_budget": self.ready_ms is not None and self.ready_ms <= self.budget_ms,
+        }
+
+
+startup_timer = StartupTimer()
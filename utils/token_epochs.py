@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from typing import Callable, Iterable, Optional, Tuple
+from sqlalchemy import select
+from models.credential_models import Credential
+
+TOKEN_EPOCH_SYNC_SECONDS = float(os.getenv("TOKEN_EPOCH_SYNC_SECONDS", 15))
+
+
+class TokenEpochRegistry:
+    """
+    In-memory map user id -> minimum accepted `token_epoch`.
+
+    Tokens are only issued to unlocked, unblocked users and carry the user's
+    epoch at issue time, so a token with the current epoch implies "not
+    locked, not blocked, password unchanged since issue". Blocking, locking
+    or changing the password bumps the epoch in the database, which revokes
+    every token issued before. Local bumps apply immediately; bumps made by
+    other replicas arrive with the next bulk sync. Only users whose epoch was
+    ever bumped are stored, which keeps the map small.
+    """
+
+    def __init__(self):
+        self._epochs = {}
+        self._lock = threading.Lock()
+        self.last_synced_at: Optional[float] = None
+        self.sync_errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self, user_id) -> int:
+        return self._epochs.get(str(user_id), 0)
+
+    def is_current(self, user_id, token_epoch) -> bool:
+        return (token_epoch or 0) >= self.get(user_id)
+
+    def bump(self, user_id, epoch: int):
+        key = str(user_id)
+        with self._lock:
+            if epoch > self._epochs.get(key, 0):
+                self._epochs[key] = epoch
+
+    def merge(self, rows: Iterable[Tuple[object, int]]):
+        # Epochs only grow, so a sync that raced with a local bump can't lower it
+        with self._lock:
+            for user_id, epoch in rows:
+                key = str(user_id)
+                if epoch > self._epochs.get(key, 0):
+                    self._epochs[key] = epoch
+
+    def sync(self, session_factory: Callable):
+        db = session_factory()
+        try:
+            rows = db.execute(select(Credential.id, Credential.token_epoch).where(Credential.token_epoch > 0)).all()
+        finally:
+            db.close()
+        self.merge(rows)
+        self.last_synced_at = time.time()
+
+    def _sync_loop(self, session_factory: Callable, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.sync(session_factory)
+            except Exception as e:
+                self.sync_errors += 1
+                print(f"Error syncing token epochs: {e}")
+
+    def start_sync(self, session_factory: Callable, interval: float = TOKEN_EPOCH_SYNC_SECONDS):
+        try:
+            self.sync(session_factory)
+        except Exception as e:
+            self.sync_errors += 1
+            print(f"Error syncing token epochs: {e}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sync_loop, args=(session_factory, interval), name="token-epoch-sync", daemon=True)
+        self._thread.start()
+
+    def stop_sync(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "tracked_users": len(self._epochs),
+            "last_synced_at": self.last_synced_at,
+            "sync_errors": self.sync_errors,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._epochs.clear()
+
+
+token_epochs = TokenEpochRegistry()